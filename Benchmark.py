@@ -0,0 +1,290 @@
+'''
+Scaling benchmark for Kirkpatrick point location.
+
+Sweeps site counts over several point distributions, building and querying one hierarchy per run,
+and writes the results as JSON so runs on different commits can be compared. Each run is its own
+optimized (-O) interpreter so its peak memory is its own. Every run is seeded from SEED, the
+distribution and the site count, so rerunning a sweep reproduces the same inputs and queries.
+
+    python Benchmark.py [--sizes 100,1000] [--distributions uniform] [--backends array] [--output bench.json]
+    python Benchmark.py --engines kirkpatrick,trapezoid,slab [--sizes 10000]
+    python Benchmark.py --top-faces none,16,64,256,1024,auto [--sizes 10000]
+    python Benchmark.py --memory 100000 [--backends object]
+    python Benchmark.py --profile --sizes 100000 --distributions clustered
+
+--engines runs every point location engine of PointLocator.ENGINES on each dataset, and picks the
+one answering batches fastest for each; 'background' is timed once its hierarchy answers, not its
+fallback grid. --top-faces does the same for Kirkpatrick hierarchies truncated at each top layer
+size (see KP_Layer.ProduceHierarchy), locating the crossover where a packed top layer scan stops
+paying for the layer hops it saves. --compact builds with compact Face labels (see
+DCEL.Face_Table); --memory reports the bytes per DCEL object and per Face label before and after
+compact mode, and the peak memory of one build with each labelling. --profile adds each build's
+KPProfile report (phase and layer timings, memory growth, predicate calls) to its run.
+'''
+import os
+import sys
+import time
+import json
+import resource
+import argparse
+import subprocess
+import numpy as np
+from scipy.spatial import Delaunay
+import DCEL
+import KirkPatrick
+import KPProfile
+import PointLocator
+
+SEED = 451
+SIZES = [10**2, 10**3, 10**4, 10**5, 10**6]
+DISTRIBUTIONS = ['uniform', 'clustered', 'collinear']
+BACKENDS = ['array', 'object']
+ENGINES = ['kirkpatrick']   # Keys of PointLocator.ENGINES
+SINGLE_QUERIES = 1000   # Timed one by one through Locate
+BATCH_QUERIES = 100000  # Timed in batches of BATCH_SIZE through the frozen index
+BATCH_SIZE = 1000
+PERCENTILES = [50, 90, 99]
+OUTPUT = 'benchmark.json'
+BACKEND_CLASSES = {'object': DCEL.Triangled_DCEL, 'array': DCEL.Array_DCEL}
+
+
+def UniformSites(n, rng):
+    return rng.uniform(1, KirkPatrick.BOXSIZE - 1, size=(n, 2))
+
+
+def ClusteredSites(n, rng):
+    'Gaussian clusters of varied spread around a few random centres'
+    k = max(1, int(np.sqrt(n) / 4))
+    centres = rng.uniform(0.1, 0.9, size=(k, 2)) * KirkPatrick.BOXSIZE
+    spreads = rng.uniform(0.002, 0.03, size=k) * KirkPatrick.BOXSIZE
+    which = rng.randint(k, size=n)
+    sites = centres[which] + rng.normal(size=(n, 2)) * spreads[which, np.newaxis]
+    return np.clip(sites, 1, KirkPatrick.BOXSIZE - 1)
+
+
+def CollinearSites(n, rng):
+    'Sites on or within a hair of a few lines, so many stars have flat or nearly flat ears'
+    k = max(1, int(np.log10(n)))
+    angles = rng.uniform(0, np.pi, size=k)
+    origins = rng.uniform(0.3, 0.7, size=(k, 2)) * KirkPatrick.BOXSIZE
+    which = rng.randint(k, size=n)
+    t = rng.uniform(-1, 1, size=n) * KirkPatrick.BOXSIZE
+    jitter = np.where(rng.rand(n) < 0.5, 0., rng.normal(scale=1e-6 * KirkPatrick.BOXSIZE, size=n))
+    direction = np.column_stack([np.cos(angles), np.sin(angles)])[which]
+    sites = origins[which] + direction * t[:, np.newaxis] + direction[:, ::-1] * [-1, 1] * jitter[:, np.newaxis]
+    inside = np.all((sites > 1) & (sites < KirkPatrick.BOXSIZE - 1), axis=1)
+    return sites[inside]
+
+
+GENERATORS = {'uniform': UniformSites, 'clustered': ClusteredSites, 'collinear': CollinearSites}
+
+
+def Percentiles(samples):
+    return dict(('p{}'.format(p), float(x)) for p, x in zip(PERCENTILES, np.percentile(samples, PERCENTILES)))
+
+
+def Run(distribution, n, backend, seed=SEED, compact=False, engine='kirkpatrick', top_faces=None, profile=False):
+    """Build and query one point location engine in this process, returning its measurements as a dict.
+    With profile, the DCEL and hierarchy builds run under a KPProfile.Build_Profile, reported as 'profile'.
+    """
+    rng = np.random.RandomState([seed, n, DISTRIBUTIONS.index(distribution)])
+    sites = np.unique(np.vstack([KirkPatrick.BBOX, GENERATORS[distribution](n, rng)]), axis=0)
+    tri = Delaunay(sites, qhull_options="Qbb Qc Qz")
+    result = {'distribution': distribution, 'sites': n, 'backend': backend, 'seed': seed, 'compact': compact,
+              'engine': engine, 'vertices': len(sites), 'omitted': len(tri.coplanar)}
+    if top_faces is not None:
+        result['top_faces'] = top_faces
+
+    profile = KPProfile.Build_Profile() if profile else None
+    if profile is not None:
+        profile.Start()
+    start = time.time()
+    dcel = BACKEND_CLASSES[backend].FromTriangles(sites, tri.simplices, tri.neighbors, KirkPatrick.BBOX,
+                                                  compact=compact, profile=profile)
+    result['dcel_seconds'] = time.time() - start
+    start = time.time()
+    if engine == 'kirkpatrick':
+        locator = KirkPatrick.KP_Layer(None, dcel).ProduceHierarchy(seed=seed, top_faces=top_faces, profile=profile)
+        result['hierarchy_seconds'] = time.time() - start
+        result['depth'] = locator.Depth()
+        result['top_layer_faces'] = len(locator.getFaceLabels() - set([None]))
+        freeze_start = time.time()
+        locator.Freeze()
+        result['freeze_seconds'] = time.time() - freeze_start
+    else:
+        locator = PointLocator.Build(engine, dcel, seed=seed)
+    result['build_seconds'] = time.time() - start
+    if engine == 'background':     # Time the hierarchy it turns into, not the grid answering until the swap
+        locator.Wait()
+        result['ready_seconds'] = time.time() - start
+    if profile is not None:
+        profile.Stop()
+        result['profile'] = profile.getReport()
+
+    queries = rng.uniform(0, KirkPatrick.BOXSIZE, size=(BATCH_QUERIES, 2))
+    single = []
+    for q_point in map(tuple, queries[:SINGLE_QUERIES].tolist()):
+        start = time.time()
+        locator.Locate(q_point)
+        single.append(time.time() - start)
+    result['single_query_seconds'] = Percentiles(single)
+    batches = []
+    for i in range(0, len(queries), BATCH_SIZE):
+        start = time.time()
+        locator.QueryBatch(queries[i:i + BATCH_SIZE])
+        batches.append(time.time() - start)
+    result['batch_size'] = BATCH_SIZE
+    result['batch_query_seconds'] = Percentiles(batches)
+    result['batch_queries_per_second'] = len(queries) / max(sum(batches), 1e-9)
+    if hasattr(locator, 'getStats'):
+        result['engine_stats'] = locator.getStats()
+    result['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+
+def RunIsolated(distribution, n, backend, seed=SEED, compact=False, engine='kirkpatrick', top_faces=None,
+                profile=False):
+    'Run in a fresh optimized interpreter; failures (e.g. running out of memory) are recorded, not raised'
+    child = subprocess.Popen([sys.executable, '-O', os.path.abspath(__file__), '--run', distribution, str(n), backend,
+                              '--seed', str(seed), '--engines', engine, '--top-faces', str(top_faces).lower()] +
+                             (['--compact'] if compact else []) + (['--profile'] if profile else []),
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = child.communicate()
+    if child.returncode != 0:
+        return {'distribution': distribution, 'sites': n, 'backend': backend, 'seed': seed, 'compact': compact,
+                'engine': engine,
+                'error': err.strip().splitlines()[-1:] or ['exit status {}'.format(child.returncode)]}
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def Commit():
+    'Current git commit of this tree, or None outside a repository'
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.STDOUT,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def Sweep(sizes=SIZES, distributions=DISTRIBUTIONS, backends=BACKENDS, seed=SEED, output=OUTPUT, compact=False,
+          engines=ENGINES, top_faces=[None], profile=False):
+    'Run every combination, rewriting output after each run so a long sweep keeps its partial results'
+    report = {'commit': Commit(), 'python': sys.version.split()[0], 'seed': seed, 'runs': []}
+    variants = [(engine, tf) for engine in engines for tf in (top_faces if engine == 'kirkpatrick' else [None])]
+    for distribution in distributions:
+        for n in sizes:
+            for backend in backends:
+                for engine, tf in variants:
+                    result = RunIsolated(distribution, n, backend, seed, compact, engine, tf, profile)
+                    report['runs'].append(result)
+                    if 'error' in result:
+                        print "{} {} {} {}: failed, {}".format(distribution, n, backend, Variant(result),
+                                                               result['error'])
+                    else:
+                        print "{} {} {} {}: DCEL {:.3f}s, build {:.3f}s, {} KB, {:.0f} batched queries/s, " \
+                            "median single query {:.1f} us".format(
+                                distribution, n, backend, Variant(result), result['dcel_seconds'],
+                                result['build_seconds'], result['peak_rss_kb'], result['batch_queries_per_second'],
+                                result['single_query_seconds']['p50'] * 1e6)
+                    report['choices'] = Choose(report['runs'])
+                    with open(output, 'w') as f:
+                        json.dump(report, f, indent=1, sort_keys=True)
+    if len(variants) > 1:
+        for dataset, engine in sorted(report['choices'].iteritems()):
+            print "{}: {}".format(dataset, engine)
+    return report
+
+
+def Variant(result):
+    'Engine of a run, with its top layer size if truncated'
+    if result.get('top_faces') is None:
+        return result['engine']
+    return "{} top_faces={}".format(result['engine'], result['top_faces'])
+
+
+def Choose(runs, key='batch_queries_per_second'):
+    'The Variant with the highest key for each dataset ("distribution sites backend") among the successful runs'
+    best = {}
+    for result in runs:
+        if 'error' not in result:
+            dataset = "{} {} {}".format(result['distribution'], result['sites'], result['backend'])
+            if dataset not in best or result[key] > best[dataset][key]:
+                best[dataset] = result
+    return dict((dataset, Variant(result)) for dataset, result in best.iteritems())
+
+
+def TopFaces(text):
+    'A --top-faces value: none, auto or a triangle count'
+    return None if text == 'none' else text if text == 'auto' else int(text)
+
+
+class Plain:
+    'Stand-in for the DCEL classes as they were before compact mode: old-style, attributes in a __dict__'
+
+
+def ObjectSizes():
+    """Bytes per Vertex, Edge and Face instance (their own storage, not what their attributes point to)
+    and per Face label: 'before' as a dict-based instance and a coordinate label of fresh tuples and floats,
+    'after' with __slots__ and an integer label with its Face_Table row.
+    """
+    v = DCEL.Vertex((1.5, 2.5))
+    sizes = {}
+    for obj in [v, DCEL.Edge(v), DCEL.Face(None)]:
+        plain = Plain()
+        for name in type(obj).__slots__:
+            setattr(plain, name, None)
+        sizes[type(obj).__name__] = {'before': sys.getsizeof(plain) + sys.getsizeof(plain.__dict__),
+                                     'after': sys.getsizeof(obj)}
+    label = ((1.5, 2.5), (3.5, 4.5), (5.5, 6.5))
+    sizes['Face label'] = {'before': sys.getsizeof(label) + sum(sys.getsizeof(pt) + sum(sys.getsizeof(x) for x in pt)
+                                                                for pt in label),
+                           'after': sys.getsizeof(10**6) + DCEL.Face_Table(1).tris_[0].nbytes}
+    return sizes
+
+
+def MemoryReport(n, distribution='uniform', backends=BACKENDS, seed=SEED):
+    'ObjectSizes, and a build of n sites on each backend with coordinate then compact labels'
+    report = {'commit': Commit(), 'objects': ObjectSizes(), 'runs': []}
+    for name, size in sorted(report['objects'].iteritems()):
+        print "{}: {} bytes before, {} bytes after.".format(name, size['before'], size['after'])
+    for backend in backends:
+        for compact in [False, True]:
+            result = RunIsolated(distribution, n, backend, seed, compact)
+            report['runs'].append(result)
+            print "{} {} {}, {} labels: {} KB peak.".format(distribution, n, backend,
+                                                            'compact' if compact else 'coordinate',
+                                                            result.get('peak_rss_kb', result.get('error')))
+    return report
+
+
+def IntList(text):
+    return [int(float(x)) for x in text.split(',')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Kirkpatrick point location scaling benchmark")
+    parser.add_argument('--sizes', type=IntList, default=SIZES, help="comma separated site counts")
+    parser.add_argument('--distributions', type=lambda x: x.split(','), default=DISTRIBUTIONS)
+    parser.add_argument('--backends', type=lambda x: x.split(','), default=BACKENDS)
+    parser.add_argument('--engines', type=lambda x: x.split(','), default=ENGINES,
+                        help="any of " + ",".join(sorted(PointLocator.ENGINES)))
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--output', default=OUTPUT)
+    parser.add_argument('--top-faces', type=lambda x: map(TopFaces, x.split(',')), default=[None],
+                        help="comma separated Kirkpatrick top layer sizes: none, auto or triangle counts")
+    parser.add_argument('--compact', action='store_true', help="label Faces by integer ids (see DCEL.Face_Table)")
+    parser.add_argument('--profile', action='store_true', help="profile each build (see KPProfile)")
+    parser.add_argument('--memory', type=int, metavar='SITES', help="report memory per object and per build")
+    parser.add_argument('--run', nargs=3, metavar=('DISTRIBUTION', 'SITES', 'BACKEND'),
+                        help="measure one run in this process and print it as JSON")
+    args = parser.parse_args()
+    if args.run is not None:
+        print json.dumps(Run(args.run[0], int(args.run[1]), args.run[2], args.seed, args.compact, args.engines[0],
+                             args.top_faces[0], args.profile))
+    elif args.memory is not None:
+        report = MemoryReport(args.memory, args.distributions[0], args.backends, args.seed)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+    else:
+        Sweep(args.sizes, args.distributions, args.backends, args.seed, args.output, args.compact, args.engines,
+              args.top_faces, args.profile)
@@ -3,26 +3,260 @@ Created on Jan 12, 2016
 
 @author: jonathanshor
 '''
-from COS451PS1 import CCW
+import copy
+import numpy as np
+import Predicates
+from Predicates import CCW
+
+EAR_BATCH_MIN = 32  # Smaller stars ear cut faster with scalar predicates than numpy's per-call overhead allows
+
+
+def Laps(profile):
+    'Lap method of profile (a KPProfile.Build_Profile) marking each construction phase; a no-op without one'
+    return profile.Lap if profile is not None else lambda name: None
 
 
 def Contains(point, poly):
-    'Is point(2-tuple) not outside poly(list of 2-tuples)?'
-    direction = CCW(poly[-1], poly[0], point)
-    for i in range(len(poly) - 1):
-        next_dir = CCW(poly[i], poly[i + 1], point)
-        if next_dir == 0:
-            continue
-        if next_dir != direction:
-            if direction == 0:
-                direction = next_dir
-            else:
+    'Is point(2-tuple) not outside poly(list of 2-tuples)? Exact, see Predicates.'
+    return Predicates.Contains(point, poly)
+
+
+def FirstContaining(points, tris, candidates):
+    """For each point, the first of its candidate triangles containing it.
+    candidates is an (m, K) array of indices into tris, -1 padded. Returns (m,) array, -1 where none contain.
+    """
+    inside = Predicates.ContainsBatch(points[:, np.newaxis, :], tris[candidates]) & (candidates >= 0)
+    first = inside.argmax(axis=1)
+    return np.where(inside.any(axis=1), candidates[np.arange(len(candidates)), first], -1).astype(np.int32)
+
+
+def OrientTriangles(points, simplices, neighbors=None):
+    'Return points, simplices and neighbors as arrays, every simplex reordered to CounterClockWise'
+    points = np.asarray(points)
+    simplices = np.array(simplices, dtype=np.int64).reshape(-1, 3)
+    corners = points[simplices].astype(np.float64)
+    area = (corners[:, 1, 0] - corners[:, 0, 0]) * (corners[:, 2, 1] - corners[:, 0, 1]) - \
+        (corners[:, 1, 1] - corners[:, 0, 1]) * (corners[:, 2, 0] - corners[:, 0, 0])
+    flip = area < 0
+    simplices[flip] = simplices[flip][:, [0, 2, 1]]
+    if neighbors is not None:
+        neighbors = np.array(neighbors, dtype=np.int64).reshape(-1, 3)
+        neighbors[flip] = neighbors[flip][:, [0, 2, 1]]
+    return points, simplices, neighbors
+
+
+def TriangleTwins(simplices, neighbors=None):
+    """Twin of every half edge 3 * s + i, which runs simplices[s, i] -> simplices[s, (i + 1) % 3]; -1 on the hull.
+    Read straight from neighbors (as scipy's: neighbors[s, j] is the simplex opposite simplices[s, j]) when given,
+    otherwise matched by one sort over (origin, destination) keys.
+    """
+    m = len(simplices)
+    twin = np.full(3 * m, -1, dtype=np.int64)
+    if neighbors is not None:
+        s = np.repeat(np.arange(m), 3)
+        t = neighbors[s, (np.tile(np.arange(3), m) + 2) % 3]
+        has = np.flatnonzero(t >= 0)
+        k = (neighbors[t[has]] == s[has, np.newaxis]).argmax(axis=1)
+        twin[has] = 3 * t[has] + (k + 1) % 3
+        return twin
+    origin = simplices.ravel()
+    dest = simplices[:, [1, 2, 0]].ravel()
+    n = int(simplices.max()) + 1 if m > 0 else 0
+    keys = origin * n + dest
+    order = np.argsort(keys)
+    pos = np.minimum(np.searchsorted(keys[order], dest * n + origin), max(3 * m - 1, 0))
+    match = np.flatnonzero(keys[order][pos] == dest * n + origin)
+    twin[match] = order[pos[match]]
+    return twin
+
+
+def TriangleLabels(points, simplices):
+    'Default Face labels: the coordinates of each simplex, as a 3-tuple of 2-tuples'
+    return [tuple(map(tuple, tri)) for tri in points[simplices].tolist()]
+
+
+def EarCut(v_pt, ring):
+    """Triangulate the star-polygon left by removing v_pt.
+    ring is the list of neighbor coordinates in CCW order around v_pt.
+    Returns list of (a, b, c) indices into ring; every triangle but the last is an ear
+    not containing v_pt, the last is the final triangle covering v_pt.
+    """
+    neighbors = range(len(ring))
+    tris = []
+    cur_neigh_i = 0
+    skipped = 0     # Corners passed over since the last cut
+    # Large stars test every corner in one batched evaluation; a corner is (re)tested on its own
+    # when first reached, or once a cut changed its neighbors
+    if len(ring) >= EAR_BATCH_MIN:
+        turns, blocked = Predicates.EarTests(v_pt, ring)
+        tested = [((i - 1) % len(ring), (i + 1) % len(ring)) for i in neighbors]
+    else:
+        turns, blocked, tested = [None] * len(ring), [None] * len(ring), [None] * len(ring)
+    while len(neighbors) > 3:
+        prev_neigh = neighbors[cur_neigh_i - 1]
+        cur_neigh = neighbors[cur_neigh_i]
+        next_neigh = neighbors[(cur_neigh_i + 1) % len(neighbors)]
+        if tested[cur_neigh] != (prev_neigh, next_neigh):
+            tested[cur_neigh] = (prev_neigh, next_neigh)
+            turns[cur_neigh] = CCW(ring[prev_neigh], ring[cur_neigh], ring[next_neigh])
+            blocked[cur_neigh] = Contains(v_pt, [ring[prev_neigh], ring[cur_neigh], ring[next_neigh]]) and \
+                CCW(ring[prev_neigh], ring[next_neigh], v_pt) not in (0, 2)
+        turn = turns[cur_neigh]
+        if turn == 2:   # ABC collinear
+            # Treat as convex corner, satisfies containment metrics for problem,
+            # but only once a full pass found no proper ear: flat faces breed degree 2 vertices
+            turn = -1 if skipped >= len(neighbors) else 1
+        if (turn != -1) and (turn != 1):
+            raise Exception("Turn == {}".format(turn))
+        if turn == -1:  # Convex neighbor, ear cutting time
+            # Ensure v not inside new face, otherwise skip for now
+            # v on the cutting diagonal itself is fine, it stays on the remaining polygon's boundary
+            if blocked[cur_neigh]:
+                cur_neigh_i = (cur_neigh_i + 1) % len(neighbors)
+                skipped += 1
+                continue
+            tris.append((prev_neigh, cur_neigh, next_neigh))
+            neighbors = neighbors[:cur_neigh_i] + neighbors[cur_neigh_i + 1:]
+            cur_neigh_i %= len(neighbors)
+            skipped = 0
+        else:  # Reflex point, skip for now
+            cur_neigh_i = (cur_neigh_i + 1) % len(neighbors)
+            skipped += 1
+
+    # Final 3 neighbors form final triangle
+    assert Contains(v_pt, [ring[x] for x in neighbors])
+    tris.append(tuple(neighbors))
+    return tris
+
+
+def EarCutStar(star):
+    'EarCut taking its arguments as one (v_pt, ring) tuple, for Pool.map'
+    return EarCut(*star)
+
+
+def StarLinks(tris, old):
+    """For the EarCut triangles of a star, the old faces each one overlaps.
+    old[i] is the old face between neighbors i and i + 1.
+    """
+    d = len(old)
+    links = []
+    for tri in tris[:-1]:   # An ear spans the sectors from its first to last corner
+        links.append([old[i % d] for i in range(tri[0], tri[0] + (tri[2] - tri[0]) % d)])
+    links.append(list(old))     # The final triangle covers the removed vertex
+    return links
+
+
+def InCircle(a, b, c, d):
+    'Is d strictly inside the circumcircle of CounterClockWise triangle abc? Exact, see Predicates.'
+    return Predicates.InCircle(a, b, c, d) > 0
+
+
+def Overlaps(tri_a, tri_b):
+    'Might triangles tri_a and tri_b (3-tuples of 2-tuples) share interior? False only if an edge line separates them.'
+    for tri, other in ((tri_a, tri_b), (tri_b, tri_a)):
+        inside = CCW(tri[0], tri[1], tri[2])    # Turn towards the interior
+        for i in range(3):
+            if all(CCW(tri[i - 1], tri[i], pt) != inside for pt in other):
                 return False
     return True
 
 
-class Vertex:
+def DelaunayStar(v_pt, ring):
+    """Triangulate the star-polygon left by removing v_pt as the Delaunay triangulation of ring:
+    EarCut, then Lawson flips of its diagonals. Returns triangles as EarCut does, so applyRemoval takes them.
+    """
+    tris = [list(tri) for tri in EarCut(v_pt, ring)]
+    flipped = True
+    while flipped:
+        flipped = False
+        sides = dict(((tri[i], tri[(i + 1) % 3]), t) for t, tri in enumerate(tris) for i in range(3))
+        for (a, b), t in sides.iteritems():
+            if (b, a) not in sides:
+                continue
+            c = tris[t][(tris[t].index(b) + 1) % 3]
+            u = sides[(b, a)]
+            d = tris[u][(tris[u].index(a) + 1) % 3]
+            # Flip ab to cd when d is in abc's circle and the quad a, d, b, c is strictly convex
+            if InCircle(ring[a], ring[b], ring[c], ring[d]) and \
+                    CCW(ring[c], ring[a], ring[d]) == -1 and CCW(ring[d], ring[b], ring[c]) == -1:
+                tris[t] = [c, a, d]
+                tris[u] = [d, b, c]
+                flipped = True
+                break
+
+    # Peel ears off the ring in EarCut's form, leaving a triangle covering v_pt for last
+    polygon = range(len(ring))
+    ears = []
+    while len(tris) > 1:
+        for t, tri in enumerate(tris):
+            for i in range(3):
+                prev_neigh, cur_neigh, next_neigh = tri[i - 1], tri[i], tri[(i + 1) % 3]
+                j = polygon.index(cur_neigh)
+                if polygon[j - 1] == prev_neigh and polygon[(j + 1) % len(polygon)] == next_neigh and \
+                        (not Contains(v_pt, [ring[x] for x in tri]) or
+                         CCW(ring[prev_neigh], ring[next_neigh], v_pt) in (0, 2)):
+                    break
+            else:
+                continue
+            break
+        else:
+            raise Exception("No ear to peel in {}".format(tris))
+        ears.append((prev_neigh, cur_neigh, next_neigh))
+        polygon.remove(cur_neigh)
+        del tris[t]
+    return ears + [tuple(polygon)]
+
+
+def Corners(label, table=None):
+    'Corner coordinates of the triangle Face label names: the label itself, or with a Face_Table its row there'
+    return label if table is None else table.getCorners(label)
+
+
+class Face_Table(object):
+    """Compact Face labels: dense integer ids, with the corner coordinates of each kept in one float array
+    and only built into tuples on request. One table is shared by a DCEL, its Copy()s and the hierarchy
+    built over them, so every face ever made has its own id.
+    """
+    __slots__ = ['tris_', 'count_']
+
+    def __init__(self, size=64):
+        self.tris_ = np.zeros((size, 3, 2))
+        self.count_ = 0
+
+    def __len__(self):
+        return self.count_
+
+    def reserve(self, count):
+        'Ensure room for count more labels'
+        if self.count_ + count > len(self.tris_):
+            grow = max(count, len(self.tris_))
+            self.tris_ = np.concatenate([self.tris_, np.zeros((grow, 3, 2))])
+
+    def Add(self, corners):
+        'New label for the triangle with corners (3 2-tuples)'
+        self.reserve(1)
+        self.tris_[self.count_] = corners
+        self.count_ += 1
+        return self.count_ - 1
+
+    def AddMany(self, tris):
+        'New labels for every triangle of tris, an (m, 3, 2) array; returns them as a list'
+        self.reserve(len(tris))
+        self.tris_[self.count_:self.count_ + len(tris)] = tris
+        self.count_ += len(tris)
+        return range(self.count_ - len(tris), self.count_)
+
+    def getCorners(self, label):
+        return tuple(map(tuple, self.tris_[label].tolist()))
+
+    def getTriangles(self, labels):
+        '(m, 3, 2) array of the corners of labels'
+        return self.tris_[labels]
+
+
+class Vertex(object):
     'Vertex'
+    __slots__ = ['coords_', 'outs_']
 
     def __init__(self, coords):
         'Coords are fixed at instantiation'
@@ -79,8 +313,9 @@ class Vertex:
         return neighbors
 
 
-class Edge:
+class Edge(object):
     'Half edge'
+    __slots__ = ['origin_', 'twin_', 'prev_', 'next_', 'face_']
 
     def __init__(self, origin):
         'Origin is fixed at instantiation'
@@ -135,8 +370,9 @@ class Edge:
             raise TypeError("Bad face: {}".format(f))
 
 
-class Face:
+class Face(object):
     'Face represention'
+    __slots__ = ['label_', 'boundary_']
 
     def __init__(self, label):
         self.label_ = label
@@ -180,6 +416,9 @@ class Triangled_DCEL:
         for f in self.getFaces():
             # Confirm representative edge leads to cycle of edges around f
             rep_e = f.getBoundary()
+            if rep_e is None:   # Only in a graph with no edges yet
+                assert len(self.edges_) == 0
+                continue
             assert rep_e.getFace() == f
             cur_e = rep_e.getNext()
             while rep_e != cur_e:
@@ -187,18 +426,22 @@ class Triangled_DCEL:
                 cur_e = cur_e.getNext()
 
     # TODO: make bbox NOT optional
-    def __init__(self, labeled_polys, bbox=None):
+    def __init__(self, labeled_polys, bbox=None, profile=None):
         """labeled_polys is a list of 2-tuples:
         first element a label, or None
         second element a list of 2-tuple vertex coordinates in CounterClockWise order
 
         The polygons are assumed to be the triangles of a triangulated planar subdivision.
         bbox, if given, is a list of vertices for the convex hull in CCW order.
+        profile, a KPProfile.Build_Profile, times the construction phase by phase.
         """
+        lap = Laps(profile)
+        lap('loops')
         self.verts_ = dict()
         self.edges_ = set()
         self.faces_ = dict()
         self.box_ = set()  # Bounding box, subset of verts_
+        self.table_ = None  # Face_Table of compact labels; None when faces are labelled by coordinates
 
         # All faces within the bounding box that are not within a labeled polygon interior
         no_region = Face(None)
@@ -259,17 +502,16 @@ class Triangled_DCEL:
 
             self.edges_.update(edges)
 
-        # Twin scan
+        # Twin scan, keyed on (origin, destination)
+        lap('twin_scan')
+        by_ends = dict(((e.getOrigin().getCoords(), e.getNext().getOrigin().getCoords()), e) for e in self.edges_)
         for e in self.edges_:
-            # Scan for existing twin
             if e.getTwin() is None:
-                e_next = e.getNext()
-                # For all edges from e's destination that are not e.getNext
-                for f in [x for x in e_next.getOrigin().getOuts() if x != e_next]:
-                    if f.getNext().getOrigin() == e.getOrigin():
-                        e.setTwin(f)
-                        f.setTwin(e)
-                        break
+                f = by_ends.get((e.getNext().getOrigin().getCoords(), e.getOrigin().getCoords()))
+                if f is not None:
+                    e.setTwin(f)
+                    f.setTwin(e)
+        for e in list(self.edges_):
             # Produce new twin; should only occur if bbox was not given
             if e.getTwin() is None:
                 if __debug__:
@@ -305,7 +547,75 @@ class Triangled_DCEL:
                 self.exterior_done = True
 
         if __debug__:
+            lap('validate')
             self.Validate()
+        if profile is not None:
+            profile.OnDCEL(self)
+
+    @classmethod
+    def FromTriangles(cls, points, simplices, neighbors=None, bbox=None, labels=None, compact=False, profile=None):
+        """Bulk constructor from scipy.spatial.Delaunay's points, simplices and neighbors,
+        or any (n, 2) point array with an (m, 3) vertex index array (neighbors optional).
+        labels, if given, holds a Face label per simplex; by default its coordinates,
+        or with compact its integer id in a new Face_Table.
+        bbox, if given, is a list of the convex hull vertices, all of which must be among points.
+        profile, a KPProfile.Build_Profile, times the construction phase by phase.
+        """
+        lap = Laps(profile)
+        lap('orient')
+        points, simplices, neighbors = OrientTriangles(points, simplices, neighbors)
+        lap('twins')
+        twin = TriangleTwins(simplices, neighbors)
+        dcel = cls([])
+        lap('labels')
+        if compact:
+            dcel.table_ = Face_Table(len(simplices))
+            labels = dcel.table_.AddMany(np.asarray(points, dtype=np.float64)[simplices])
+        elif labels is None:
+            labels = TriangleLabels(points, simplices)
+
+        lap('objects')
+        no_region = dcel.faces_[None]
+        pts = map(tuple, points.tolist())
+        verts = dict((i, Vertex(pts[i])) for i in np.unique(simplices).tolist())
+        dcel.verts_ = dict((v.getCoords(), v) for v in verts.itervalues())
+        faces = [Face(label) for label in labels]
+        dcel.faces_.update((f.getLabel(), f) for f in faces)
+
+        edges = [Edge(verts[o]) for o in simplices.ravel().tolist()]
+        for e in range(len(edges)):
+            tri = e - e % 3
+            edges[e].setNext(edges[tri + (e + 1) % 3])
+            edges[e].setPrev(edges[tri + (e + 2) % 3])
+            edges[e].setFace(faces[e // 3])
+            if twin[e] >= 0:
+                edges[e].setTwin(edges[twin[e]])
+        for t, f in enumerate(faces):
+            f.setBoundary(edges[3 * t])
+
+        # Exterior half edges, one per hull edge
+        lap('exterior')
+        exterior = dict()   # Origin coordinates -> exterior edge
+        for e in np.flatnonzero(twin < 0).tolist():
+            new_twin = Edge(edges[e].getNext().getOrigin())
+            new_twin.setTwin(edges[e])
+            edges[e].setTwin(new_twin)
+            new_twin.setFace(no_region)
+            no_region.setBoundary(new_twin)
+            exterior[new_twin.getOrigin().getCoords()] = new_twin
+        for x in exterior.itervalues():
+            x.setNext(exterior[x.getTwin().getOrigin().getCoords()])
+            x.getNext().setPrev(x)
+
+        dcel.edges_ = set(edges) | set(exterior.itervalues())
+        if bbox is not None:
+            dcel.box_ = set(dcel.verts_[pt] for pt in bbox)
+        if __debug__:
+            lap('validate')
+            dcel.Validate()
+        if profile is not None:
+            profile.OnDCEL(dcel)
+        return dcel
 
     def getVertices(self):
         return set(self.verts_.itervalues())
@@ -322,9 +632,18 @@ class Triangled_DCEL:
         else:
             raise TypeError("Bad edge: {}".format(e))
 
+    def getDegree(self, v):
+        return v.getDegree()
+
+    def getNeighbors(self, v):
+        return v.getNeighbors()
+
     def getFaces(self):
         return set(self.faces_.itervalues())
 
+    def getFaceLabels(self):
+        return set(self.faces_.iterkeys())
+
     def addFace(self, f):
         'Returns 0 if f already in faces_, 1 if f is new'
         if isinstance(f, Face):
@@ -337,6 +656,13 @@ class Triangled_DCEL:
     def getBox(self):
         return self.box_
 
+    def getTable(self):
+        return self.table_
+
+    def NewLabel(self, corners):
+        'Label for a new triangle with corners: the corners themselves, or a new id in table_'
+        return corners if self.table_ is None else self.table_.Add(corners)
+
     def getLabeledPolys(self):
         'Retrieve graph in labeled polygon structure'
         labeled_polys = []
@@ -352,117 +678,621 @@ class Triangled_DCEL:
             labeled_polys += [(f.getLabel(), verts)]
         return labeled_polys
 
-    def removeInteriorVertex(self, v):
-        'Cleanly remove a vertex and retriangulate created star-polygon. Return new-> old face links dict().'
-        if v in self.box_:
-            raise Exception("Cannot remove bounding box vertices.")
-
+    def Copy(self):
+        'Return an independent duplicate of the graph, built in one linear pass'
+        dup = copy.copy(self)   # Shallow; every attribute is replaced below
+        dup.verts_ = dict((pt, Vertex(pt)) for pt in self.verts_)
+        dup.faces_ = dict((label, Face(label)) for label in self.faces_)
+        edge_map = dict((e, Edge(dup.verts_[e.getOrigin().getCoords()])) for e in self.edges_)
+        for e, new_e in edge_map.iteritems():
+            new_e.setTwin(edge_map[e.getTwin()])
+            new_e.setNext(edge_map[e.getNext()])
+            new_e.setPrev(edge_map[e.getPrev()])
+            new_e.setFace(dup.faces_[e.getFace().getLabel()])
+        for label, f in self.faces_.iteritems():
+            dup.faces_[label].setBoundary(edge_map[f.getBoundary()])
+        dup.edges_ = set(edge_map.itervalues())
+        dup.box_ = set(dup.verts_[v.getCoords()] for v in self.box_)
+        return dup
+
+    def getCoords(self, v):
+        return v.getCoords()
+
+    def getVertex(self, pt):
+        'The vertex at coordinates pt, None if there is none'
+        return self.verts_.get(pt)
+
+    def getStar(self, v):
+        'Return (spokes, neighbors) of v, both in CCW order'
         # CCW ordering of neighbors and edges from v to each neighbor
-        del_edges = [v.getOuts().pop()]
+        # Start from the spoke to the least neighbor, not set order, so rebuilds are reproducible
+        del_edges = [min(v.getOuts(), key=lambda e: e.getTwin().getOrigin().getCoords())]
         neighbors = [del_edges[-1].getTwin().getOrigin()]
-        # Final triangle containing v will cover some of all vertices (assuming general position)
-        final_links = [del_edges[-1].getFace().getLabel()]
         # Exploit strict triangulation to scan around neighborhood of v
         cur_e = del_edges[-1].getPrev().getTwin()
         while cur_e is not del_edges[0]:
-            final_links += [cur_e.getFace().getLabel()]
             del_edges += [cur_e]
             neighbors += [del_edges[-1].getTwin().getOrigin()]
             cur_e = del_edges[-1].getPrev().getTwin()
-        if __debug__:
-            assert len(del_edges) == len(neighbors)
+        return del_edges, neighbors
 
-        face_links = {}
-        cur_neigh_i = 0
-        while len(neighbors) > 3:
-            # if __debug__:
-            #     print len(neighbors)
-            prev_neigh = neighbors[cur_neigh_i - 1]
-            cur_neigh = neighbors[cur_neigh_i]
-            next_neigh = neighbors[(cur_neigh_i + 1) % len(neighbors)]
-            turn = CCW(prev_neigh.getCoords(), cur_neigh.getCoords(), next_neigh.getCoords())
-            if turn == 2:   # ABC collinear
-                turn = -1   # Treat as convex corner, satisfies containment metrics for problem
-                if __debug__:
-                    print "Collinear degeneracy: {}, {}, {}".format(prev_neigh.getCoords(), cur_neigh.getCoords(), next_neigh.getCoords())
-            try:
-                assert (turn == -1) or (turn == 1)
-            except AssertionError, e:
-                raise Exception("Turn == {}".format(turn))
-            if turn == -1:  # Convex neighbor, ear cutting time
-                # Ensure v not inside new face, otherwise skip for now
-                if Contains(v.getCoords(), [prev_neigh.getCoords(), cur_neigh.getCoords(), next_neigh.getCoords()]):
-                    cur_neigh_i = (cur_neigh_i + 1) % len(neighbors)
-                    continue
-
-                diag = Edge(next_neigh)
-                assert self.addEdge(diag) == 1
-                diag_twin = Edge(prev_neigh)
-                assert self.addEdge(diag_twin) == 1
-                diag.setTwin(diag_twin)
-                diag_twin.setTwin(diag)
-
-                to_del = del_edges[cur_neigh_i]
-                del_edges = del_edges[:cur_neigh_i] + del_edges[cur_neigh_i + 1:]
-                neighbors = neighbors[:cur_neigh_i] + neighbors[cur_neigh_i + 1:]
-                cur_neigh_i %= len(neighbors)
-                cur_neigh.removeEdge(to_del.getTwin())
-                del self.faces_[to_del.getFace().getLabel()]
-                del self.faces_[to_del.getTwin().getFace().getLabel()]
-                self.edges_.remove(to_del)
-                self.edges_.remove(to_del.getTwin())
-
-                to_del.getTwin().getNext().setNext(diag_twin)  # a -> h
-                to_del.getTwin().getNext().setPrev(to_del.getPrev())  # f <- a
-                to_del.getTwin().getPrev().setNext(to_del.getNext())  # b -> e
-                to_del.getTwin().getPrev().setPrev(diag)  # g <- b
-                to_del.getNext().setNext(diag)  # e -> g
-                to_del.getNext().setPrev(to_del.getTwin().getPrev())  # b <- e
-                to_del.getPrev().setNext(to_del.getTwin().getNext())  # f -> a
-                to_del.getPrev().setPrev(diag_twin)  # h <- f
-                diag.setNext(to_del.getTwin().getPrev())  # g -> b
-                diag.setPrev(to_del.getNext())  # e <- g
-                diag_twin.setNext(to_del.getPrev())  # h -> f
-                diag_twin.setPrev(to_del.getTwin().getNext())  # a <- h
-
-                new_face = Face((prev_neigh.getCoords(), cur_neigh.getCoords(), next_neigh.getCoords()))
-                assert self.addFace(new_face) == 1
-                # TODO: Face linking -- check that no duplicate faces from same coords?
-                # Should be impossible, check
-                face_links[new_face.getLabel()] = [to_del.getFace().getLabel(), to_del.getTwin().getFace().getLabel()]
-                new_face.setBoundary(diag)
-                diag.setFace(new_face)
-                diag.getNext().setFace(new_face)
-                diag.getPrev().setFace(new_face)
-
-                new_face = Face((prev_neigh.getCoords(), v.getCoords(), next_neigh.getCoords()))
-                assert self.addFace(new_face) == 1
-                new_face.setBoundary(diag_twin)
-                diag_twin.setFace(new_face)
-                diag_twin.getNext().setFace(new_face)
-                diag_twin.getPrev().setFace(new_face)
-            else:  # Reflex point, skip for now
-                cur_neigh_i = (cur_neigh_i + 1) % len(neighbors)
+    def removeInteriorVertex(self, v):
+        'Cleanly remove a vertex and retriangulate created star-polygon. Return new-> old face links dict().'
+        if v in self.box_:
+            raise Exception("Cannot remove bounding box vertices.")
+        del_edges, neighbors = self.getStar(v)
+        tris = EarCut(v.getCoords(), [x.getCoords() for x in neighbors])
+        return self.applyRemoval(v, del_edges, neighbors, tris)
 
-        # Final 3 neighbors form final triangle
-        assert Contains(v.getCoords(), [x.getCoords() for x in neighbors])
-        new_face = Face((neighbors[0].getCoords(), neighbors[1].getCoords(), neighbors[2].getCoords()))
-        assert self.addFace(new_face) == 1
-        face_links[new_face.getLabel()] = final_links
-        for i in range(3):
+    def applyRemoval(self, v, del_edges, neighbors, tris):
+        """Replace the star of v by the triangles tris (as returned by EarCut).
+        Each new face links to the old faces of the star it overlaps.
+        """
+        d = len(neighbors)
+        ring = [e.getNext() for e in del_edges]   # neighbors[i] -> neighbors[i + 1]
+        old_labels = [e.getFace().getLabel() for e in del_edges]
+        for i in range(d):
             neighbors[i].removeEdge(del_edges[i].getTwin())
-            del_edges[i].getNext().setNext(del_edges[(i + 1) % 3].getNext())
-            del_edges[i].getNext().setPrev(del_edges[i - 1].getNext())
-            del_edges[i].getNext().setFace(new_face)
-            new_face.setBoundary(del_edges[i].getNext())
-            del self.faces_[del_edges[i].getFace().getLabel()]
+            del self.faces_[old_labels[i]]
             self.edges_.remove(del_edges[i])
             self.edges_.remove(del_edges[i].getTwin())
 
+        face_links = {}
+        diags = {}
+        for tri, links in zip(tris, StarLinks(tris, old_labels)):
+            new_face = Face(self.NewLabel(tuple(neighbors[i].getCoords() for i in tri)))
+            added = self.addFace(new_face)
+            assert added == 1
+            face_links[new_face.getLabel()] = links
+
+            sides = []
+            for a, b in zip(tri, tri[1:] + tri[:1]):
+                if b == (a + 1) % d:
+                    e = ring[a]
+                else:
+                    e = Edge(neighbors[a])
+                    self.addEdge(e)
+                    diags[(a, b)] = e
+                    if (b, a) in diags:
+                        e.setTwin(diags[(b, a)])
+                        diags[(b, a)].setTwin(e)
+                e.setFace(new_face)
+                sides.append(e)
+            for i in range(3):
+                sides[i].setNext(sides[(i + 1) % 3])
+                sides[i].setPrev(sides[i - 1])
+            new_face.setBoundary(sides[0])
+
         # And like that, its gone
         del self.verts_[v.getCoords()]
         return face_links
 
+    def getCorners(self, f):
+        'Coordinates of the corners of triangle f, in CCW order'
+        e = f.getBoundary()
+        return (e.getOrigin().getCoords(), e.getNext().getOrigin().getCoords(), e.getPrev().getOrigin().getCoords())
+
+    def deleteSite(self, pt):
+        """Remove the vertex at pt, retriangulating its star-polygon Delaunay style.
+        Return new-> old face links dict(), as removeInteriorVertex.
+        """
+        if pt not in self.verts_:
+            raise ValueError("No vertex at {}.".format(pt))
+        v = self.verts_[pt]
+        if v in self.box_:
+            raise ValueError("Cannot remove bounding box vertices.")
+        del_edges, neighbors = self.getStar(v)
+        tris = DelaunayStar(pt, [x.getCoords() for x in neighbors])
+        return self.applyRemoval(v, del_edges, neighbors, tris)
+
+    def insertSite(self, pt, label):
+        """Add a vertex at pt, within Face label, keeping a Delaunay triangulation Delaunay (Bowyer-Watson):
+        the faces whose circumcircle holds pt are replaced by a fan around pt.
+        Return new-> old face links dict(), as removeInteriorVertex.
+        """
+        if pt in self.verts_:
+            raise ValueError("Vertex {} already present.".format(pt))
+        cavity = set([self.faces_[label]])
+        stack = list(cavity)
+        while stack:
+            for e in self.getFaceEdges(stack.pop()):
+                g = e.getTwin().getFace()
+                if g.getLabel() is not None and g not in cavity and InCircle(*self.getCorners(g) + (pt, )):
+                    cavity.add(g)
+                    stack.append(g)
+        # The cavity must be star-shaped from pt; take in any face whose edge pt does not strictly see
+        hidden = True
+        while hidden:
+            hidden = False
+            for e in [x for f in cavity for x in self.getFaceEdges(f) if x.getTwin().getFace() not in cavity]:
+                if CCW(e.getOrigin().getCoords(), e.getNext().getOrigin().getCoords(), pt) != -1:
+                    if e.getTwin().getFace().getLabel() is None:
+                        raise ValueError("{} is not inside the bounding box.".format(pt))
+                    cavity.add(e.getTwin().getFace())
+                    hidden = True
+
+        boundary = dict((e.getOrigin(), e) for f in cavity for e in self.getFaceEdges(f)
+                        if e.getTwin().getFace() not in cavity)
+        ring = [boundary.itervalues().next()]
+        while len(ring) < len(boundary):
+            ring.append(boundary[ring[-1].getNext().getOrigin()])
+        if len(set(ring)) != len(boundary):
+            raise Exception("Cavity of {} is not a disc.".format(pt))
+        old = dict((f.getLabel(), self.getCorners(f)) for f in cavity)
+        for f in cavity:
+            for e in self.getFaceEdges(f):
+                if e.getTwin().getFace() in cavity:
+                    e.getOrigin().removeEdge(e)
+                    self.edges_.remove(e)
+            del self.faces_[f.getLabel()]
+
+        v = Vertex(pt)
+        self.verts_[pt] = v
+        k = len(ring)
+        spokes = [Edge(v) for i in range(k)]     # v -> ring[i]'s origin
+        face_links = {}
+        for i in range(k):
+            back = Edge(ring[i].getNext().getOrigin())   # Closes face i, twin of the next spoke
+            back.setTwin(spokes[(i + 1) % k])
+            spokes[(i + 1) % k].setTwin(back)
+            sides = [spokes[i], ring[i], back]
+            corners = (pt, ring[i].getOrigin().getCoords(), ring[i].getNext().getOrigin().getCoords())
+            new_face = Face(self.NewLabel(corners))
+            added = self.addFace(new_face)
+            assert added == 1
+            for j in range(3):
+                self.addEdge(sides[j])
+                sides[j].setFace(new_face)
+                sides[j].setNext(sides[(j + 1) % 3])
+                sides[j].setPrev(sides[j - 1])
+            new_face.setBoundary(sides[0])
+            face_links[new_face.getLabel()] = [x for x in old if Overlaps(corners, old[x])]
+        return face_links
+
+    def getFaceEdges(self, f):
+        'Half edges around f'
+        rep_e = f.getBoundary()
+        edges = [rep_e]
+        cur_e = rep_e.getNext()
+        while cur_e is not rep_e:
+            edges.append(cur_e)
+            cur_e = cur_e.getNext()
+        return edges
 
+    def getSides(self, label):
+        'For each edge around Face label in CCW order: (origin coordinates, destination coordinates, label across)'
+        return [(e.getOrigin().getCoords(), e.getNext().getOrigin().getCoords(), e.getTwin().getFace().getLabel())
+                for e in self.getFaceEdges(self.faces_[label])]
+
+
+class Array_DCEL:
+    """Planar graph rep via doublely connected edge list, stored as parallel integer arrays.
+
+    Half edge e runs from origin_[e] with twin_[e], next_[e], prev_[e] and face_[e].
+    Vertices are integer ids into coords_; faces are integer ids with labels in face_labels_.
+    Freed edge and face slots are reused, so removals never grow the arrays.
+    """
+
+    def Validate(self):
+        'Some (not exhaustive) internal consistency checks'
+        print "Array_DCEL.Validation()"
+
+        print "Number of vertices: ", len(self.getVertices())
+        live = np.flatnonzero(self.origin_ >= 0)
+        print "Number of (half-)edges: (", len(live), ")", len(live)/2
+        assert (self.prev_[self.next_[live]] == live).all()  # No stand-alone edges
+        assert (self.twin_[self.twin_[live]] == live).all()  # No half-edges
+        assert (self.origin_[self.twin_[live]] == self.origin_[self.next_[live]]).all()
+        assert (self.face_[self.next_[live]] == self.face_[live]).all()
+        assert self.getBox() <= self.getVertices()
 
+        print "Faces: ", len(self.face_ids_)
+        for f in self.face_ids_.itervalues():
+            assert (self.face_edge_[f] == -1 and len(live) == 0) or self.face_[self.face_edge_[f]] == f
 
+    def __init__(self, labeled_polys, bbox=None, profile=None):
+        """labeled_polys is a list of 2-tuples:
+        first element a label, or None
+        second element a list of 2-tuple vertex coordinates in CounterClockWise order
+
+        The polygons are assumed to be the triangles of a triangulated planar subdivision.
+        bbox, if given, is a list of vertices for the convex hull in CCW order.
+        profile, a KPProfile.Build_Profile, times the construction phase by phase.
+        """
+        lap = Laps(profile)
+        lap('loops')
+        vert_ids = dict()
+        coords = []
+        origin, nxt, prev, face = [], [], [], []
+        self.face_labels_ = [None]   # Face 0: all faces not within a labeled polygon
+        self.face_ids_ = {None: 0}
+        face_edge = [-1]
+
+        def VertId(pt):
+            if pt not in vert_ids:
+                vert_ids[pt] = len(coords)
+                coords.append(pt)
+            return vert_ids[pt]
+
+        def AddLoop(verts, f):
+            first = len(origin)
+            for i in range(len(verts)):
+                origin.append(verts[i])
+                nxt.append(first + (i + 1) % len(verts))
+                prev.append(first + (i - 1) % len(verts))
+                face.append(f)
+            face_edge[f] = first
+
+        if bbox is not None:
+            # Reverse vertex order to create exterior half edges
+            AddLoop([VertId(pt) for pt in bbox][::-1], 0)
+        box = set(vert_ids.itervalues())
+
+        for poly in labeled_polys:
+            if poly[0] not in self.face_ids_:
+                self.face_ids_[poly[0]] = len(self.face_labels_)
+                self.face_labels_.append(poly[0])
+                face_edge.append(-1)
+            AddLoop([VertId(pt) for pt in poly[1]], self.face_ids_[poly[0]])
+
+        # Twin scan, keyed on (origin, destination)
+        lap('twin_scan')
+        twin = [-1] * len(origin)
+        by_ends = dict()
+        for e in range(len(origin)):
+            by_ends[(origin[e], origin[nxt[e]])] = e
+        for e in range(len(origin)):
+            twin[e] = by_ends.get((origin[nxt[e]], origin[e]), -1)
+
+        # Produce exterior twins; should only occur if bbox was not given
+        exterior = dict()   # Origin vertex -> new exterior edge
+        for e in [x for x in range(len(origin)) if twin[x] == -1]:
+            assert bbox is None
+            new_twin = len(origin)
+            origin.append(origin[nxt[e]])
+            nxt.append(-1)
+            prev.append(-1)
+            face.append(0)
+            twin.append(e)
+            twin[e] = new_twin
+            exterior[origin[new_twin]] = new_twin
+            face_edge[0] = new_twin
+        for x in exterior.itervalues():
+            nxt[x] = exterior[origin[twin[x]]]
+            prev[nxt[x]] = x
+
+        self.coords_ = np.array(coords, dtype=np.float64).reshape(-1, 2)
+        self.origin_ = np.array(origin, dtype=np.int32)
+        self.twin_ = np.array(twin, dtype=np.int32)
+        self.next_ = np.array(nxt, dtype=np.int32)
+        self.prev_ = np.array(prev, dtype=np.int32)
+        self.face_ = np.array(face, dtype=np.int32)
+        self.face_edge_ = np.array(face_edge, dtype=np.int32)
+        self.vert_out_ = np.full(len(coords), -1, dtype=np.int32)
+        self.vert_out_[self.origin_] = np.arange(len(origin), dtype=np.int32)
+        self.vert_ids_ = vert_ids
+        self.box_ = box
+        self.table_ = None  # Face_Table of compact labels; None when faces are labelled by coordinates
+        self.free_edges_ = []
+        self.free_faces_ = []
+
+        if __debug__:
+            lap('validate')
+            self.Validate()
+        if profile is not None:
+            profile.OnDCEL(self)
+
+    @classmethod
+    def FromTriangles(cls, points, simplices, neighbors=None, bbox=None, labels=None, compact=False, profile=None):
+        """Bulk constructor from scipy.spatial.Delaunay's points, simplices and neighbors,
+        or any (n, 2) point array with an (m, 3) vertex index array (neighbors optional).
+        labels, if given, holds a Face label per simplex; by default its coordinates,
+        or with compact its integer id in a new Face_Table.
+        bbox, if given, is a list of the convex hull vertices, all of which must be among points.
+        profile, a KPProfile.Build_Profile, times the construction phase by phase.
+        """
+        lap = Laps(profile)
+        lap('orient')
+        points, simplices, neighbors = OrientTriangles(points, simplices, neighbors)
+        lap('twins')
+        twin = TriangleTwins(simplices, neighbors)
+        dcel = cls([])
+        lap('labels')
+        if compact:
+            dcel.table_ = Face_Table(len(simplices))
+            labels = dcel.table_.AddMany(np.asarray(points, dtype=np.float64)[simplices])
+        elif labels is None:
+            labels = TriangleLabels(points, simplices)
+
+        lap('arrays')
+        m = len(simplices)
+        tri = np.repeat(np.arange(m), 3)
+        corner = np.tile(np.arange(3), m)
+        origin = simplices.ravel()
+        dest = simplices[:, [1, 2, 0]].ravel()
+        hull = np.flatnonzero(twin < 0)
+        exterior = 3 * m + np.arange(len(hull))
+        ext_by_origin = np.full(len(points), -1, dtype=np.int64)
+        ext_by_origin[dest[hull]] = exterior
+        twin[hull] = exterior
+
+        dcel.coords_ = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        dcel.origin_ = np.concatenate([origin, dest[hull]]).astype(np.int32)
+        dcel.twin_ = np.concatenate([twin, hull]).astype(np.int32)
+        dcel.next_ = np.concatenate([3 * tri + (corner + 1) % 3, ext_by_origin[origin[hull]]]).astype(np.int32)
+        dcel.prev_ = np.concatenate([3 * tri + (corner + 2) % 3, np.zeros(len(hull))]).astype(np.int32)
+        dcel.prev_[dcel.next_[exterior]] = exterior
+        dcel.face_ = np.concatenate([1 + tri, np.zeros(len(hull))]).astype(np.int32)
+        dcel.face_labels_ = [None] + list(labels)
+        dcel.face_ids_ = dict((label, f) for f, label in enumerate(dcel.face_labels_))
+        dcel.face_edge_ = np.concatenate([exterior[:1] if len(hull) else [-1], 3 * np.arange(m)]).astype(np.int32)
+        dcel.vert_out_ = np.full(len(points), -1, dtype=np.int32)
+        dcel.vert_out_[dcel.origin_] = np.arange(len(dcel.origin_), dtype=np.int32)
+        dcel.vert_ids_ = dict((pt, v) for v, pt in enumerate(map(tuple, points.tolist())))
+        if bbox is not None:
+            dcel.box_ = set(dcel.vert_ids_[pt] for pt in bbox)
+        if __debug__:
+            lap('validate')
+            dcel.Validate()
+        if profile is not None:
+            profile.OnDCEL(dcel)
+        return dcel
+
+    def getVertices(self):
+        return set(np.flatnonzero(self.vert_out_ >= 0).tolist())
+
+    def getCoords(self, v):
+        return tuple(self.coords_[v].tolist())
+
+    def getVertex(self, pt):
+        'The vertex at coordinates pt, None if there is none'
+        v = self.vert_ids_.get(pt)
+        return v if v is not None and self.vert_out_[v] >= 0 else None
+
+    def getBox(self):
+        return self.box_
+
+    def getTable(self):
+        return self.table_
+
+    def NewLabel(self, corners):
+        'Label for a new triangle with corners: the corners themselves, or a new id in table_'
+        return corners if self.table_ is None else self.table_.Add(corners)
+
+    def getFaceLabels(self):
+        return set(self.face_ids_.iterkeys())
+
+    def getSpokes(self, v):
+        'Half edges out of v, in CCW order'
+        spokes = [self.vert_out_[v]]
+        cur_e = self.twin_[self.prev_[spokes[0]]]
+        while cur_e != spokes[0]:
+            spokes.append(cur_e)
+            cur_e = self.twin_[self.prev_[cur_e]]
+        return spokes
+
+    def getDegree(self, v):
+        return len(self.getSpokes(v))
+
+    def getNeighbors(self, v):
+        return set(self.origin_[self.twin_[self.getSpokes(v)]].tolist())
+
+    def getLabeledPolys(self):
+        'Retrieve graph in labeled polygon structure'
+        labeled_polys = []
+        for label, f in self.face_ids_.iteritems():
+            rep_e = self.face_edge_[f]
+            verts = [self.getCoords(self.origin_[rep_e])]
+
+            cur_e = self.next_[rep_e]
+            while rep_e != cur_e:
+                verts += [self.getCoords(self.origin_[cur_e])]
+                cur_e = self.next_[cur_e]
+
+            labeled_polys += [(label, verts)]
+        return labeled_polys
+
+    def Copy(self):
+        'Return an independent duplicate of the graph'
+        dup = copy.copy(self)   # Shallow; every attribute is replaced below
+        for name in ['coords_', 'origin_', 'twin_', 'next_', 'prev_', 'face_', 'face_edge_', 'vert_out_']:
+            setattr(dup, name, getattr(self, name).copy())
+        dup.face_labels_ = list(self.face_labels_)
+        dup.face_ids_ = dict(self.face_ids_)
+        dup.vert_ids_ = dict(self.vert_ids_)
+        dup.box_ = set(self.box_)
+        dup.free_edges_ = list(self.free_edges_)
+        dup.free_faces_ = list(self.free_faces_)
+        return dup
+
+    def getStar(self, v):
+        'Return (spokes, neighbors) of v, both in CCW order'
+        spokes = self.getSpokes(v)
+        return spokes, self.origin_[self.twin_[spokes]].tolist()
+
+    def removeInteriorVertex(self, v):
+        'Cleanly remove a vertex and retriangulate created star-polygon. Return new-> old face links dict().'
+        if v in self.box_:
+            raise Exception("Cannot remove bounding box vertices.")
+        spokes, neighbors = self.getStar(v)
+        tris = EarCut(self.getCoords(v), [self.getCoords(w) for w in neighbors])
+        return self.applyRemoval(v, spokes, neighbors, tris)
+
+    def applyRemoval(self, v, spokes, neighbors, tris):
+        """Replace the star of v by the triangles tris (as returned by EarCut).
+        Each new face links to the old faces of the star it overlaps.
+        """
+        d = len(neighbors)
+        ring = self.next_[spokes]               # neighbors[i] -> neighbors[i + 1]
+        old_faces = self.face_[spokes].tolist()  # old_faces[i] = (v, neighbors[i], neighbors[i + 1])
+        old_labels = [self.face_labels_[f] for f in old_faces]
+
+        # Release the star
+        for e in spokes:
+            self.free_edges_ += [e, self.twin_[e]]
+            self.origin_[[e, self.twin_[e]]] = -1
+        for f in old_faces:
+            del self.face_ids_[self.face_labels_[f]]
+            self.face_labels_[f] = None
+            self.free_faces_.append(f)
+        self.vert_out_[v] = -1
+        self.vert_out_[neighbors] = ring
+
+        face_links = {}
+        diags = {}
+        for tri, links in zip(tris, StarLinks(tris, old_labels)):
+            label = self.NewLabel(tuple(self.getCoords(neighbors[i]) for i in tri))
+            f = self.free_faces_.pop()
+            self.face_labels_[f] = label
+            self.face_ids_[label] = f
+            face_links[label] = links
+
+            sides = []
+            for a, b in zip(tri, tri[1:] + tri[:1]):
+                if b == (a + 1) % d:
+                    e = ring[a]
+                else:
+                    e = self.free_edges_.pop()
+                    self.origin_[e] = neighbors[a]
+                    diags[(a, b)] = e
+                    if (b, a) in diags:
+                        self.twin_[e] = diags[(b, a)]
+                        self.twin_[diags[(b, a)]] = e
+                self.face_[e] = f
+                sides.append(e)
+            for i in range(3):
+                self.next_[sides[i]] = sides[(i + 1) % 3]
+                self.prev_[sides[i]] = sides[i - 1]
+            self.face_edge_[f] = sides[0]
+
+        # And like that, its gone
+        return face_links
+
+    def getCorners(self, f):
+        'Coordinates of the corners of triangle f, in CCW order'
+        e = self.face_edge_[f]
+        return tuple(map(tuple, self.coords_[self.origin_[[e, self.next_[e], self.prev_[e]]]].tolist()))
+
+    def getSides(self, label):
+        'For each edge around Face label in CCW order: (origin coordinates, destination coordinates, label across)'
+        rep_e = int(self.face_edge_[self.face_ids_[label]])
+        edges = [rep_e]
+        cur_e = int(self.next_[rep_e])
+        while cur_e != rep_e:
+            edges.append(cur_e)
+            cur_e = int(self.next_[cur_e])
+        ends = map(tuple, self.coords_[self.origin_[edges + edges[1:] + edges[:1]]].tolist())
+        across = self.face_[self.twin_[edges]].tolist()
+        return [(ends[i], ends[len(edges) + i], self.face_labels_[across[i]]) for i in range(len(edges))]
+
+    def reserve(self, edges, faces, verts):
+        'Ensure at least edges free half edge slots, faces free face slots and verts unused vertex ids'
+        if len(self.free_edges_) < edges:
+            grow = max(edges, len(self.origin_))
+            start = len(self.origin_)
+            for name in ['origin_', 'twin_', 'next_', 'prev_', 'face_']:
+                setattr(self, name, np.concatenate([getattr(self, name), np.full(grow, -1, dtype=np.int32)]))
+            self.free_edges_ += range(start + grow - 1, start - 1, -1)
+        if len(self.free_faces_) < faces:
+            grow = max(faces, len(self.face_edge_))
+            start = len(self.face_edge_)
+            self.face_edge_ = np.concatenate([self.face_edge_, np.full(grow, -1, dtype=np.int32)])
+            self.face_labels_ += [None] * grow
+            self.free_faces_ += range(start + grow - 1, start - 1, -1)
+        if len(self.vert_ids_) + verts > len(self.coords_):
+            grow = max(verts, len(self.coords_))
+            self.coords_ = np.concatenate([self.coords_, np.zeros((grow, 2))])
+            self.vert_out_ = np.concatenate([self.vert_out_, np.full(grow, -1, dtype=np.int32)])
+
+    def deleteSite(self, pt):
+        """Remove the vertex at pt, retriangulating its star-polygon Delaunay style.
+        Return new-> old face links dict(), as removeInteriorVertex.
+        """
+        v = self.vert_ids_.get(pt)
+        if v is None or self.vert_out_[v] < 0:
+            raise ValueError("No vertex at {}.".format(pt))
+        if v in self.box_:
+            raise ValueError("Cannot remove bounding box vertices.")
+        spokes, neighbors = self.getStar(v)
+        tris = DelaunayStar(pt, [self.getCoords(w) for w in neighbors])
+        return self.applyRemoval(v, spokes, neighbors, tris)
+
+    def insertSite(self, pt, label):
+        """Add a vertex at pt, within Face label, keeping a Delaunay triangulation Delaunay (Bowyer-Watson):
+        the faces whose circumcircle holds pt are replaced by a fan around pt.
+        Return new-> old face links dict(), as removeInteriorVertex.
+        """
+        v = self.vert_ids_.get(pt)
+        if v is not None and self.vert_out_[v] >= 0:
+            raise ValueError("Vertex {} already present.".format(pt))
+        cavity = set([self.face_ids_[label]])
+        stack = list(cavity)
+        while stack:
+            e = self.face_edge_[stack.pop()]
+            for e in (e, self.next_[e], self.prev_[e]):
+                g = self.face_[self.twin_[e]]
+                if g != 0 and g not in cavity and InCircle(*self.getCorners(g) + (pt, )):
+                    cavity.add(g)
+                    stack.append(g)
+        # The cavity must be star-shaped from pt; take in any face whose edge pt does not strictly see
+        hidden = True
+        while hidden:
+            hidden = False
+            edges = self.face_edge_[list(cavity)]
+            edges = np.concatenate([edges, self.next_[edges], self.prev_[edges]])
+            for e in edges[~np.in1d(self.face_[self.twin_[edges]], list(cavity))].tolist():
+                if CCW(self.getCoords(self.origin_[e]), self.getCoords(self.origin_[self.next_[e]]), pt) != -1:
+                    if self.face_[self.twin_[e]] == 0:
+                        raise ValueError("{} is not inside the bounding box.".format(pt))
+                    cavity.add(self.face_[self.twin_[e]])
+                    hidden = True
+
+        cavity = list(cavity)
+        edges = self.face_edge_[cavity]
+        edges = np.concatenate([edges, self.next_[edges], self.prev_[edges]])
+        inner = np.in1d(self.face_[self.twin_[edges]], cavity)
+        boundary = dict((self.origin_[e], e) for e in edges[~inner].tolist())
+        ring = [boundary.itervalues().next()]
+        while len(ring) < len(boundary):
+            ring.append(boundary[self.origin_[self.next_[ring[-1]]]])
+        if len(set(ring)) != len(boundary):
+            raise Exception("Cavity of {} is not a disc.".format(pt))
+        old = dict((self.face_labels_[f], self.getCorners(f)) for f in cavity)
+
+        # Release the cavity's faces and inner edges
+        k = len(ring)
+        self.reserve(2 * k, k, 1)
+        self.free_edges_ += edges[inner].tolist()
+        self.origin_[edges[inner]] = -1
+        for f in cavity:
+            del self.face_ids_[self.face_labels_[f]]
+            self.face_labels_[f] = None
+            self.free_faces_.append(f)
+        if v is None:
+            v = len(self.vert_ids_)
+            self.vert_ids_[pt] = v
+            self.coords_[v] = pt
+        ends = self.origin_[ring].tolist()
+        self.vert_out_[ends] = ring
+
+        spokes = [self.free_edges_.pop() for i in range(k)]     # v -> ends[i]
+        backs = [self.free_edges_.pop() for i in range(k)]      # ends[i + 1] -> v
+        self.origin_[spokes] = v
+        self.origin_[backs] = ends[1:] + ends[:1]
+        self.twin_[spokes] = backs[-1:] + backs[:-1]
+        self.twin_[backs] = spokes[1:] + spokes[:1]
+        self.vert_out_[v] = spokes[0]
+        face_links = {}
+        for i in range(k):
+            corners = (pt, self.getCoords(ends[i]), self.getCoords(ends[(i + 1) % k]))
+            label = self.NewLabel(corners)
+            f = self.free_faces_.pop()
+            self.face_labels_[f] = label
+            self.face_ids_[label] = f
+            sides = [spokes[i], ring[i], backs[i]]
+            self.face_[sides] = f
+            self.next_[sides] = sides[1:] + sides[:1]
+            self.prev_[sides] = sides[-1:] + sides[:-1]
+            self.face_edge_[f] = sides[0]
+            face_links[label] = [x for x in old if Overlaps(corners, old[x])]
+        return face_links
@@ -0,0 +1,168 @@
+'''
+Kirkpatrick point location that answers from the moment it is created, while the hierarchy builds.
+
+Background_Locator starts ProduceHierarchy (and Freeze) in a background thread, and until it is
+done answers with a Grid_Locator: the bottom layer triangles bucketed in a uniform grid, built in
+one numpy pass, each query testing the few triangles of its cell. When the hierarchy is ready, the
+locator answering is swapped for it in one assignment, so every query is answered wholly by one
+or the other. QueryBatch indices are into the fallback's leaves throughout, so they name the same
+Face labels before and after the swap. The build shares the interpreter with the queries;
+with workers > 1 its ear cutting runs in other processes. getStats reports the time to the first
+answer and to the swap.
+'''
+import time
+import threading
+import numpy as np
+import DCEL
+import KPCache
+import KPIndex
+import PointLocator
+import Predicates
+
+
+class Grid_Locator(PointLocator.PointLocator):
+    'Uniform grid of the triangles of a DCEL, each query scanning the triangles bucketed in its cell'
+
+    @classmethod
+    def FromDCEL(cls, dcel, grid_size=None):
+        return cls(dcel, grid_size)
+
+    def __init__(self, dcel, grid_size=None):
+        """dcel: triangulation (Triangled_DCEL or Array_DCEL)
+        grid_size: cells per side, by default about one triangle per cell
+        """
+        table = dcel.getTable()
+        self.leaf_labels_ = [f for f in dcel.getFaceLabels() if f is not None]
+        self.corners_ = [DCEL.Corners(f, table) for f in self.leaf_labels_]
+        self.tris_ = np.array(self.corners_, dtype=np.float64).reshape(-1, 3, 2)
+        self.grid_ = KPCache.Leaf_Grid(self.tris_, grid_size)
+
+    def Locate(self, q_point):
+        for leaf in self.grid_.getCandidates(q_point):
+            if DCEL.Contains(q_point, self.corners_[leaf]):
+                return self.leaf_labels_[leaf]
+        return None
+
+    def QueryBatch(self, points, trace=None):
+        """As Locate for every row of points ((m, 2) array), testing all (point, candidate) pairs together.
+        Returns (m,) array of indices into getLeafLabels(), -1 outside; trace sees one round.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        grid = self.grid_
+        found = np.full(len(points), -1, dtype=np.int32)
+        per_cell = len(grid.cell_leaves_) / float(grid.grid_size_ ** 2)
+        step = max(1, int(KPIndex.SCAN_PAIRS / max(per_cell, 1.)))
+        pairs = 0
+        for start in range(0, len(points), step):
+            chunk = points[start:start + step]
+            cells = grid.CellOf(chunk)
+            cells = cells[:, 0] * grid.grid_size_ + cells[:, 1]
+            first = grid.cell_off_np_[cells]
+            counts = grid.cell_off_np_[cells + 1] - first
+            point = np.repeat(np.arange(len(chunk)), counts)
+            offset = np.repeat(first - np.cumsum(counts) + counts, counts)   # Pair i is offset + i in cell_leaves_
+            leaf = grid.cell_leaves_np_[np.arange(counts.sum()) + offset]
+            hits = np.flatnonzero(Predicates.ContainsBatch(chunk[point], self.tris_[leaf]))
+            hit_points, firsts = np.unique(point[hits], return_index=True)     # First hit of each point
+            found[start + hit_points] = leaf[hits[firsts]]
+            pairs += len(point)
+        if trace is not None:
+            trace.OnBatchRound(0, len(points), pairs)
+        return found
+
+    def getLeafLabels(self):
+        return self.leaf_labels_
+
+
+class Background_Locator(PointLocator.PointLocator):
+    'Grid_Locator answering while a Kirkpatrick hierarchy builds in a background thread, then the hierarchy'
+
+    @classmethod
+    def FromDCEL(cls, dcel, grid_size=None, **options):
+        return cls(dcel, grid_size, **options)
+
+    def __init__(self, dcel, grid_size=None, **options):
+        """dcel: triangulation with a bounding box, the bottom layer of the hierarchy; not modified
+        grid_size: cells per side of the fallback Grid_Locator
+        options are passed on to KP_Layer.FromDCEL (workers, strategy, max_degree, seed, top_faces).
+        """
+        self.start_time_ = time.time()
+        self.lock_ = threading.Lock()
+        self.fallback_queries_ = 0
+        self.hierarchy_queries_ = 0
+        self.first_answer_ = None   # Seconds from start to the first answer
+        self.switch_ = None         # Seconds from start to the swap
+        self.error_ = None          # Exception that ended the build, if any
+        self.fallback_ = Grid_Locator(dcel, grid_size)
+        self.fallback_seconds_ = time.time() - self.start_time_
+        self.hierarchy_ = None
+        self.remap_ = None          # Fallback leaf index of each hierarchy leaf index, -1 last, if they differ
+        self.locator_ = self.fallback_     # Answering locator, replaced once by the hierarchy
+        self.builder_ = threading.Thread(target=self.Build, args=(dcel, options))
+        self.builder_.daemon = True
+        self.builder_.start()
+
+    def Build(self, dcel, options):
+        'Body of the builder thread: build and freeze the hierarchy, then swap it in'
+        try:
+            top = PointLocator.Build('kirkpatrick', dcel, **options)
+            labels = top.getLeafLabels()
+            if labels != self.fallback_.getLeafLabels():     # Renumber to the fallback's leaves
+                ids = dict((f, i) for i, f in enumerate(self.fallback_.getLeafLabels()))
+                self.remap_ = np.array([ids[f] for f in labels] + [-1], dtype=np.int32)
+        except Exception, e:
+            self.error_ = e     # Keep answering from the fallback
+            return
+        self.hierarchy_ = top
+        self.locator_ = top
+        self.switch_ = time.time() - self.start_time_
+
+    def isReady(self):
+        'Is the hierarchy answering yet?'
+        return self.hierarchy_ is not None
+
+    def Wait(self, timeout=None):
+        'Block until the build ends or timeout seconds pass; returns isReady(), or raises what ended the build'
+        self.builder_.join(timeout)
+        if self.error_ is not None:
+            raise self.error_
+        return self.isReady()
+
+    def getHierarchy(self):
+        'Top KP_Layer once the build is done, else None'
+        return self.hierarchy_
+
+    def Count(self, locator, queries):
+        with self.lock_:
+            if locator is self.fallback_:
+                self.fallback_queries_ += queries
+            else:
+                self.hierarchy_queries_ += queries
+            if self.first_answer_ is None:
+                self.first_answer_ = time.time() - self.start_time_
+
+    def Locate(self, q_point):
+        locator = self.locator_     # Read once, so one locator answers the whole query
+        label = locator.Locate(q_point)
+        self.Count(locator, 1)
+        return label
+
+    def QueryBatch(self, points, trace=None):
+        locator = self.locator_
+        found = locator.QueryBatch(points, trace)
+        if locator is not self.fallback_ and self.remap_ is not None:
+            found = self.remap_[found]
+        self.Count(locator, len(found))
+        return found
+
+    def getLeafLabels(self):
+        return self.fallback_.getLeafLabels()
+
+    def getStats(self):
+        'Seconds from start to the fallback, first answer and swap (None until they happen), and query counts'
+        with self.lock_:
+            return {'live': 'hierarchy' if self.isReady() else 'fallback',
+                    'fallback_seconds': self.fallback_seconds_, 'first_answer_seconds': self.first_answer_,
+                    'switch_seconds': self.switch_, 'fallback_queries': self.fallback_queries_,
+                    'hierarchy_queries': self.hierarchy_queries_,
+                    'error': repr(self.error_) if self.error_ is not None else None}
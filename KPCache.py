@@ -0,0 +1,136 @@
+'''
+Coherent query accelerator in front of a frozen Kirkpatrick index.
+
+Streams of nearby points (e.g. GPS tracks) mostly land in the triangle of the previous answer or
+one next to it. Coherent_Locator first tests a bounded LRU of recent answers and their edge
+neighbours, then the few leaves bucketed in the point's cell of a uniform grid, and only then
+descends the full hierarchy.
+'''
+from collections import OrderedDict
+import numpy as np
+import DCEL
+
+CACHE_SIZE = 8
+
+
+def LeafNeighbors(tris):
+    """Edge adjacency of triangles tris ((L, 3, 2) array): (L, 3) array of the leaf across
+    each edge, -1 on the boundary.
+    """
+    count = len(tris)
+    ends = np.concatenate([tris, np.roll(tris, -1, axis=1)], axis=2).reshape(-1, 4)   # Edge i: corner i to i + 1
+    swap = (ends[:, 0] > ends[:, 2]) | ((ends[:, 0] == ends[:, 2]) & (ends[:, 1] > ends[:, 3]))
+    ends[swap] = ends[swap][:, [2, 3, 0, 1]]
+    order = np.lexsort(ends.T[::-1])
+    same = np.all(ends[order[1:]] == ends[order[:-1]], axis=1)
+    first, second = order[:-1][same], order[1:][same]
+    neighbors = np.full(3 * count, -1, dtype=np.int32)
+    neighbors[first] = second // 3
+    neighbors[second] = first // 3
+    return neighbors.reshape(count, 3)
+
+
+class Leaf_Grid:
+    'Uniform grid over triangles, each bucketed into every cell its bounding box overlaps'
+
+    def __init__(self, tris, grid_size=None):
+        """tris: (L, 3, 2) array of triangles, bucketed by index
+        grid_size: cells per side, by default about one triangle per cell
+        """
+        if grid_size is None:
+            grid_size = max(1, int(np.sqrt(len(tris))))
+        self.grid_size_ = grid_size
+        self.origin_ = tris.reshape(-1, 2).min(axis=0)
+        self.cell_ = (tris.reshape(-1, 2).max(axis=0) - self.origin_) / grid_size
+        self.cell_[self.cell_ == 0] = 1.
+
+        # CSR over row-major cells
+        lo = self.CellOf(tris.min(axis=1))
+        hi = self.CellOf(tris.max(axis=1))
+        spans = hi - lo + 1
+        counts = spans[:, 0] * spans[:, 1]
+        leaf = np.repeat(np.arange(len(tris)), counts)
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cells = ((lo[leaf, 0] + offset // spans[leaf, 1]) * grid_size + lo[leaf, 1] + offset % spans[leaf, 1])
+        order = np.argsort(cells, kind='mergesort')
+        self.cell_leaves_np_ = leaf[order]
+        self.cell_off_np_ = np.searchsorted(cells[order], np.arange(grid_size * grid_size + 1))
+        self.cell_leaves_ = self.cell_leaves_np_.tolist()
+        self.cell_off_ = self.cell_off_np_.tolist()
+
+    def CellOf(self, points):
+        'Grid cell (column, row) of each row of points, clamped to the grid'
+        return np.clip(((points - self.origin_) // self.cell_).astype(np.int64), 0, self.grid_size_ - 1)
+
+    def getCandidates(self, q_point):
+        'Indices of the triangles bucketed in the cell of q_point (2-tuple), clamped to the grid like CellOf'
+        last = self.grid_size_ - 1
+        col = min(max(int((q_point[0] - self.origin_[0]) // self.cell_[0]), 0), last)
+        row = min(max(int((q_point[1] - self.origin_[1]) // self.cell_[1]), 0), last)
+        cell = col * self.grid_size_ + row
+        return self.cell_leaves_[self.cell_off_[cell]:self.cell_off_[cell + 1]]
+
+
+class Coherent_Locator:
+    'LRU of recent hits plus a uniform grid of leaf candidates, falling back to a KPIndex.KP_Index'
+
+    def __init__(self, index, cache_size=CACHE_SIZE, grid_size=None):
+        """index: KPIndex.KP_Index answering misses
+        cache_size: number of recent leaves (each with its neighbours) tested before the grid
+        grid_size: cells per side, by default about one leaf per cell
+        """
+        self.index_ = index
+        self.cache_size_ = cache_size
+        self.cache_ = OrderedDict()
+        tris = np.asarray(index.tris_[:index.n_leaves_])
+        self.corners_ = [tuple(map(tuple, tri)) for tri in tris.tolist()]
+        self.neighbors_ = LeafNeighbors(tris).tolist()
+        self.grid_ = Leaf_Grid(tris, grid_size)
+
+        self.hits_ = 0
+        self.neighbor_hits_ = 0
+        self.grid_hits_ = 0
+        self.misses_ = 0
+
+    def getStats(self):
+        queries = self.hits_ + self.neighbor_hits_ + self.grid_hits_ + self.misses_
+        return {'queries': queries, 'hits': self.hits_, 'neighbor_hits': self.neighbor_hits_,
+                'grid_hits': self.grid_hits_, 'misses': self.misses_,
+                'hit_rate': (self.hits_ + self.neighbor_hits_) / float(max(queries, 1))}
+
+    def ResetStats(self):
+        self.hits_ = self.neighbor_hits_ = self.grid_hits_ = self.misses_ = 0
+
+    def Remember(self, leaf):
+        if leaf in self.cache_:
+            del self.cache_[leaf]
+        elif len(self.cache_) >= self.cache_size_:
+            self.cache_.popitem(last=False)
+        self.cache_[leaf] = True
+        return leaf
+
+    def Query(self, q_point):
+        'Return leaf index of the bottom layer triangle containing q_point, -1 if outside'
+        corners = self.corners_
+        for leaf in reversed(self.cache_.keys()):    # Most recent first
+            if DCEL.Contains(q_point, corners[leaf]):
+                self.hits_ += 1
+                return self.Remember(leaf)
+        for leaf in reversed(self.cache_.keys()):
+            for near in self.neighbors_[leaf]:
+                if near >= 0 and DCEL.Contains(q_point, corners[near]):
+                    self.neighbor_hits_ += 1
+                    return self.Remember(near)
+
+        for leaf in self.grid_.getCandidates(q_point):
+            if DCEL.Contains(q_point, corners[leaf]):
+                self.grid_hits_ += 1
+                return self.Remember(leaf)
+
+        self.misses_ += 1
+        leaf = int(self.index_.Query(q_point))
+        return leaf if leaf < 0 else self.Remember(leaf)
+
+    def QueryStream(self, points):
+        'Locate the rows of points ((m, 2) array) in order, each warming the cache for the next'
+        return np.array([self.Query(q_point) for q_point in map(tuple, np.asarray(points).tolist())], dtype=np.int64)
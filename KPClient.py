@@ -0,0 +1,137 @@
+'''
+Client and load generator for the point location service in KPServer.
+
+    python KPClient.py [--connect 127.0.0.1:4510] [--clients 8] [--requests 10000] [--window 32] [--box 600]
+
+runs clients in parallel, each keeping up to window requests in flight, and prints the
+throughput and latency they saw along with the server's own counters.
+'''
+import time
+import json
+import socket
+import argparse
+import threading
+import collections
+import numpy as np
+from KPServer import LISTEN, PERCENTILES, ParseAddress
+
+BOXSIZE = 600.     # Side of the square load points are drawn from, by default KirkPatrick's
+
+
+class KP_Client:
+    'Connection to a KPServer'
+
+    def __init__(self, address=LISTEN):
+        family, address = ParseAddress(address)
+        self.sock_ = socket.socket(family, socket.SOCK_STREAM)
+        self.sock_.connect(address)
+        self.rfile_ = self.sock_.makefile('rb')
+        self.wfile_ = self.sock_.makefile('wb')
+
+    def Close(self):
+        self.rfile_.close()
+        self.wfile_.close()
+        self.sock_.close()
+
+    def Send(self, q_point):
+        self.wfile_.write('{!r} {!r}\n'.format(float(q_point[0]), float(q_point[1])))
+
+    def Receive(self):
+        'Leaf index answering the oldest request in flight'
+        answer = self.rfile_.readline()
+        if answer.startswith('error'):
+            raise ValueError("Server rejected the request: {}".format(answer.strip()))
+        return int(answer)
+
+    def Query(self, q_point):
+        'Return leaf index of the triangle containing q_point, -1 if outside'
+        self.Send(q_point)
+        self.wfile_.flush()
+        return self.Receive()
+
+    def QueryMany(self, points):
+        'Pipeline all of points ((m, 2) array or list of 2-tuples); returns (m,) array of leaf indices'
+        sender = threading.Thread(target=self.SendAll, args=(points, ))
+        sender.start()
+        leaves = np.array([self.Receive() for i in range(len(points))], dtype=np.int64)
+        sender.join()
+        return leaves
+
+    def SendAll(self, points):
+        for q_point in points:
+            self.Send(q_point)
+        self.wfile_.flush()
+
+    def getStats(self):
+        'The server counters, as a dict'
+        self.wfile_.write('stats\n')
+        self.wfile_.flush()
+        return json.loads(self.rfile_.readline())
+
+
+def LoadClient(address, points, window, latencies, failures):
+    """Send points keeping at most window in flight, appending each round trip time to latencies,
+    or for a request the server answers "error", its point to failures
+    """
+    client = KP_Client(address)
+    slots = threading.Semaphore(window)
+    sent = collections.deque()
+
+    def Receiver():
+        for q_point in points:
+            try:
+                client.Receive()
+                latencies.append(time.time() - sent.popleft())
+            except ValueError:
+                sent.popleft()
+                failures.append(q_point)
+            finally:
+                slots.release()     # Else the sender waits forever on a failed request's slot
+    receiver = threading.Thread(target=Receiver)
+    receiver.start()
+    for q_point in points:
+        slots.acquire()
+        sent.append(time.time())
+        client.Send(q_point)
+        client.wfile_.flush()
+    receiver.join()
+    client.Close()
+
+
+def LoadTest(address=LISTEN, clients=8, requests=10000, window=32, seed=451, box=BOXSIZE):
+    """Run clients in parallel, each sending requests random points of the square [0, box]^2;
+    return throughput, latency percentiles of the requests answered, and the count answered "error".
+    """
+    rng = np.random.RandomState(seed)
+    latencies = []
+    failures = []
+    threads = [threading.Thread(target=LoadClient, args=(address, rng.uniform(0, box, size=(requests, 2)).tolist(),
+                                                          window, latencies, failures)) for i in range(clients)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+    result = {'clients': clients, 'requests': clients * requests, 'window': window, 'seconds': elapsed,
+              'requests_per_second': clients * requests / max(elapsed, 1e-9), 'failed_requests': len(failures)}
+    if latencies:
+        for p, x in zip(PERCENTILES, np.percentile(latencies, PERCENTILES)):
+            result['latency_p{}'.format(p)] = float(x)
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load generator for KPServer")
+    parser.add_argument('--connect', default=LISTEN, help="host:port or Unix socket path")
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=10000, help="per client")
+    parser.add_argument('--window', type=int, default=32, help="requests in flight per client")
+    parser.add_argument('--seed', type=int, default=451)
+    parser.add_argument('--box', type=float, default=BOXSIZE, help="side of the square points are drawn from")
+    args = parser.parse_args()
+    result = LoadTest(args.connect, args.clients, args.requests, args.window, args.seed, args.box)
+    print json.dumps(result, indent=1, sort_keys=True)
+    client = KP_Client(args.connect)
+    print json.dumps(client.getStats(), indent=1, sort_keys=True)
+    client.Close()
@@ -0,0 +1,101 @@
+'''
+pygame drawing for Kirkpatrick point location; the only module importing pygame.
+'''
+import pygame
+
+SCALE = 1.   # Set to 1 for no scaling
+
+BLACK = (  0,   0,   0)
+WHITE = (255, 255, 255)
+RED =   (255,   0,   0)
+BLUE =  (  0,   0, 255)
+GREEN = (  0, 255,   0)
+
+
+def ScaleUp(poly):
+    'Poly should be a list of 2-tuples'
+    return [(SCALE * x[0], SCALE * x[1]) for x in poly]
+
+
+def Display(polys, red_polys=None, blue_polys=None, caption=None, green_polys=None, size=600.):
+    'Expects just a list of polys(each a list of 2-tuples), NO LABELS'
+    screen = pygame.display.set_mode([int(size), int(size)])
+
+    if caption is None:
+        pygame.display.set_caption("Kirkpatrick Point Location")
+    else:
+        pygame.display.set_caption(caption)
+
+    screen.fill(WHITE)
+
+    to_draw = [ScaleUp(x) for x in polys]
+
+    for poly in to_draw:
+        pygame.draw.polygon(screen, BLACK, poly, 1)
+
+    if blue_polys is not None:
+        to_draw = [ScaleUp(x) for x in blue_polys]
+
+        for poly in to_draw:
+            pygame.draw.polygon(screen, BLUE, poly, 1)
+
+    if red_polys is not None:
+        to_draw = [ScaleUp(x) for x in red_polys]
+
+        for poly in to_draw:
+            pygame.draw.polygon(screen, RED, poly, 1)
+
+    if green_polys is not None:
+        to_draw = [ScaleUp(x) for x in green_polys]
+
+        for poly in to_draw:
+            pygame.draw.polygon(screen, GREEN, poly, 1)
+
+    # Update the screen with what we've drawn.
+    pygame.display.flip()
+
+    # Hold until the user does anything.
+    done = False
+    clock = pygame.time.Clock()
+    while not done:
+        clock.tick(4)
+        for event in pygame.event.get():  # User did something
+            # if event.type == pygame.KEYDOWN:
+            #     done = True
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                done = True
+            if event.type == pygame.QUIT:  # If user clicked close
+                done = True  # Flag that we are done so we exit this loop
+
+
+class DisplayTrace:
+    """Query trace drawing each layer of a scalar query, waiting for a click between layers.
+    Every hook is passed on to inner, another trace, when given.
+    """
+
+    def __init__(self, inner=None):
+        self.inner_ = inner
+        self.spotter_ = None
+
+    def OnQuery(self, q_point):
+        self.spotter_ = [(q_point[0]-1, q_point[1]-1), (q_point[0]-1, q_point[1]+1),
+                         (q_point[0]+1, q_point[1]+1), (q_point[0]+1, q_point[1]-1)]
+        self.q_point_ = q_point
+        if self.inner_ is not None:
+            self.inner_.OnQuery(q_point)
+
+    def OnLayer(self, layer, candidates, hit, contains_calls):
+        if hit is not None:
+            layer.Display(red_polys=[layer.getCorners(hit)],
+                          blue_polys=[layer.getCorners(x) for x in candidates if x is not None],
+                          green_polys=[self.spotter_], caption="{} within face {}".format(self.q_point_, hit))
+        if self.inner_ is not None:
+            self.inner_.OnLayer(layer, candidates, hit, contains_calls)
+
+    def OnResult(self, q_point, tri):
+        if self.inner_ is not None:
+            self.inner_.OnResult(q_point, tri)
+
+    def OnBatchRound(self, level, active, contains_calls):
+        if self.inner_ is not None:
+            self.inner_.OnBatchRound(level, active, contains_calls)
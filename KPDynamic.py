@@ -0,0 +1,132 @@
+'''
+Kirkpatrick point location over a Delaunay triangulation that takes site insertions and deletions.
+
+An update retriangulates the bottom DCEL locally (Bowyer-Watson to insert, a Delaunay ear cut to
+delete), so the triangulation stays the one a fresh build of the current sites would produce.
+The hierarchy built before the first update is kept: its bottom layer becomes a delta layer over
+the live triangulation, linking each of its faces that has since been destroyed to the live
+faces now covering it. Layers above are never touched. Once that patch covers REBUILD_FRACTION
+of the original faces, the hierarchy is rebuilt from the live triangulation.
+'''
+import DCEL
+from KirkPatrick import KP_Layer
+
+REBUILD_FRACTION = 0.25
+
+
+class KP_Dynamic:
+    'Kirkpatrick hierarchy over a Delaunay triangulation patched in place by InsertSite and DeleteSite'
+
+    def __init__(self, dcel, rebuild_fraction=REBUILD_FRACTION, workers=None, strategy='arbitrary', max_degree=8,
+                 seed=None):
+        """dcel: Delaunay triangulation (Triangled_DCEL or Array_DCEL) with a bounding box; it is updated in place.
+        rebuild_fraction: rebuild once patched faces exceed this fraction of the faces at the last build
+        workers, strategy, max_degree and seed are passed on to KP_Layer.ProduceHierarchy.
+        """
+        self.dcel_ = dcel
+        self.rebuild_fraction_ = rebuild_fraction
+        self.build_args_ = (workers, strategy, max_degree, seed)
+        self.rebuilds_ = 0
+        self.Rebuild()
+        self.rebuilds_ = 0
+
+    def Rebuild(self):
+        'Build a fresh hierarchy over the live triangulation, dropping the patch'
+        self.base_ = KP_Layer(None, self.dcel_)     # Bottom layer of the last build
+        self.top_ = self.base_.ProduceHierarchy(*self.build_args_)
+        self.base_faces_ = None     # Face labels of base_ once it is patched
+        self.covers_ = {}           # Live face -> base_ faces linking to it
+        self.updates_ = 0
+        self.rebuilds_ += 1
+
+    def getTop(self):
+        return self.top_
+
+    def getDCEL(self):
+        return self.dcel_
+
+    def getPatchSize(self):
+        'Number of faces of the last build that are currently patched over'
+        return len(self.base_.links_) if self.base_faces_ is not None else 0
+
+    def Query(self, q_point, trace=None):
+        'As KP_Layer.Query, over the live triangulation'
+        return self.top_.Query(q_point, trace)
+
+    def QueryBatch(self, points, trace=None):
+        'As KP_Layer.QueryBatch, over the live triangulation'
+        return self.top_.QueryBatch(points, trace)
+
+    def getLeafLabels(self):
+        return self.top_.getLeafLabels()
+
+    def Traverse(self, polyline):
+        'As KP_Layer.Traverse, over the live triangulation'
+        return self.top_.Traverse(polyline)
+
+    def TraverseBatch(self, polylines):
+        'As KP_Layer.TraverseBatch, over the live triangulation'
+        return self.top_.TraverseBatch(polylines)
+
+    def NearestSite(self, q_point):
+        'As KP_Layer.NearestSite, over the live sites'
+        return self.top_.NearestSite(q_point)
+
+    def NearestSiteBatch(self, points):
+        'As KP_Layer.NearestSiteBatch, over the live sites'
+        return self.top_.NearestSiteBatch(points)
+
+    def InsertSite(self, pt):
+        'Add a site at pt (2-tuple strictly inside the bounding box)'
+        label = self.top_.Locate(pt)
+        if label is None:
+            raise ValueError("{} is not inside the bounding box.".format(pt))
+        self.Patch(self.dcel_.insertSite(pt, label))
+
+    def DeleteSite(self, pt):
+        'Remove the site at pt; bounding box corners stay'
+        self.Patch(self.dcel_.deleteSite(pt))
+
+    def Patch(self, links):
+        """Relink the base layer after the live triangulation replaced the faces in links' values
+        by the faces in its keys (a new-> old face links dict())."""
+        base = self.base_
+        if self.base_faces_ is None:
+            # First patch since the build: base_ turns into a delta layer over the live triangulation
+            self.base_faces_ = (self.dcel_.getFaceLabels() - set(links.iterkeys())) | \
+                set(f for olds in links.itervalues() for f in olds)
+            base.below_ = KP_Layer(None, self.dcel_)
+            if base is not self.top_:
+                base.dcel_ = None
+
+        replaced = {}   # Destroyed face -> new faces overlapping it
+        for new, olds in links.iteritems():
+            for old in olds:
+                replaced.setdefault(old, []).append(new)
+        for old, news in replaced.iteritems():
+            for b in self.covers_.pop(old, ()):    # A patch face: every base face linking to it takes its place
+                kids = base.links_[b]
+                kids.remove(old)
+                for new in news:
+                    if new not in kids and DCEL.Overlaps(base.getCorners(new), base.getCorners(b)):
+                        kids.append(new)
+                        self.covers_.setdefault(new, set()).add(b)
+            if old in self.base_faces_:
+                base.links_[old] = list(news)
+                for new in news:
+                    self.covers_.setdefault(new, set()).add(old)
+            else:
+                base.dead_.discard(old)
+        for new in links:
+            if new in self.base_faces_:     # Back as it was built, so it is its own link again
+                for kid in base.links_.pop(new, ()):
+                    self.covers_[kid].discard(new)
+                    if not self.covers_[kid]:
+                        del self.covers_[kid]
+            else:
+                base.dead_.add(new)
+
+        self.top_.index_ = None
+        self.updates_ += 1
+        if len(base.links_) > self.rebuild_fraction_ * len(self.base_faces_):
+            self.Rebuild()
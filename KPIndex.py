@@ -0,0 +1,180 @@
+'''
+Flat, compiled form of a built Kirkpatrick hierarchy.
+
+Every distinct triangle of every layer gets one integer face id; bottom layer faces come first,
+so a leaf's face id is also its leaf index. A face created when building layer k points, CSR
+style, at the faces of layer k - 1 it overlaps. A face that survives unchanged through several
+layers is stored once, so descent jumps straight from a face to its children without visiting
+the layers in between.
+'''
+import struct
+import numpy as np
+import DCEL
+import KPNearest
+import Predicates
+
+FORMAT_MAGIC = 'KPINDEX\0'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sII')     # Magic, version, number of arrays
+ENTRY = struct.Struct('<16s8sI3qq')  # Name, dtype, ndim, shape, byte offset
+ALIGN = 64
+ARRAYS = ['tris', 'child_off', 'children', 'top', 'n_leaves']
+SCAN_PAIRS = 1 << 18    # Point-triangle pairs tested at once by the top layer scan
+
+
+class KP_Index:
+    'Query-only Kirkpatrick hierarchy in flat arrays'
+
+    def __init__(self, tris, child_off, children, top, n_leaves, leaf_labels=None):
+        """tris: (F, 3, 2) array of face coordinates
+        child_off, children: CSR links, the children of face f are children[child_off[f]:child_off[f + 1]]
+        top: face ids of the top layer
+        n_leaves: faces [0, n_leaves) are the bottom layer
+        leaf_labels: optional list of bottom layer Face labels; by default the leaf coordinates
+        """
+        self.tris_ = tris
+        self.child_off_ = child_off
+        self.children_ = children
+        self.top_ = top
+        self.n_leaves_ = n_leaves
+        self.leaf_labels_ = leaf_labels
+        self.top_tris_ = np.ascontiguousarray(self.tris_[self.top_])    # Top layer, packed for TopScan
+        self.site_graph_ = None     # See getSiteGraph
+
+    def getLeafLabels(self):
+        if self.leaf_labels_ is None:
+            self.leaf_labels_ = [tuple(map(tuple, tri)) for tri in self.tris_[:self.n_leaves_].tolist()]
+        return self.leaf_labels_
+
+    def getLeafTriangle(self, leaf):
+        'Coordinates (3-tuple of 2-tuples) of bottom layer triangle leaf'
+        return tuple(map(tuple, self.tris_[leaf].tolist()))
+
+    def getSiteGraph(self, box=()):
+        'KPNearest.Site_Graph of the leaves, built on first use; box: coordinates of the vertices that are not sites'
+        if self.site_graph_ is None:
+            self.site_graph_ = KPNearest.Site_Graph(self.tris_[:self.n_leaves_], box)
+        return self.site_graph_
+
+    def NearestSiteBatch(self, points, box=()):
+        'Coordinates ((m, 2) array) of the leaf vertex nearest each row of points, box excluded; nan if none'
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        graph = self.getSiteGraph(box)
+        nearest = graph.NearestBatch(points, self.QueryBatch(points))
+        coords = graph.coords_[np.maximum(nearest, 0)]
+        coords[nearest < 0] = np.nan
+        return coords
+
+    def getFaceCount(self):
+        return len(self.tris_)
+
+    def Save(self, path):
+        """Write the index to path in the versioned binary format read by Load.
+        Leaf labels are not saved; a loaded index labels leaves by their coordinates.
+        """
+        arrays = [np.ascontiguousarray(self.tris_, dtype=np.float64),
+                  np.ascontiguousarray(self.child_off_, dtype=np.int64),
+                  np.ascontiguousarray(self.children_, dtype=np.int32),
+                  np.ascontiguousarray(self.top_, dtype=np.int32),
+                  np.array([self.n_leaves_], dtype=np.int64)]
+        offset = HEADER.size + ENTRY.size * len(arrays)
+        entries = []
+        for name, a in zip(ARRAYS, arrays):
+            offset += -offset % ALIGN
+            entries.append(ENTRY.pack(name, a.dtype.str, a.ndim, *(list(a.shape) + [0] * (3 - a.ndim) + [offset])))
+            offset += a.nbytes
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(FORMAT_MAGIC, FORMAT_VERSION, len(arrays)))
+            f.write(''.join(entries))
+            for entry, a in zip(entries, arrays):
+                f.seek(ENTRY.unpack(entry)[-1])
+                f.write(a.tostring())
+
+    def QueryBatch(self, points, trace=None):
+        """Locate every row of points ((m, 2) array).
+            Returns (m,) array of leaf indices, -1 for points outside the top layer.
+            trace, a KirkPatrick.QueryTrace, observes each descent round.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        found = self.TopScan(points)
+        if trace is not None:
+            trace.OnBatchRound(0, len(points), len(points) * len(self.top_))
+        active = np.flatnonzero(found >= 0)
+        level = 1
+        while len(active) > 0:      # O(lg n) rounds
+            start = self.child_off_[found[active]]
+            counts = self.child_off_[found[active] + 1] - start
+            active = active[counts > 0]
+            start = start[counts > 0]
+            counts = counts[counts > 0]
+            if len(active) == 0:
+                break
+            width = np.arange(counts.max())
+            candidates = np.where(width < counts[:, np.newaxis],
+                                  self.children_[np.minimum(start[:, np.newaxis] + width, len(self.children_) - 1)], -1)
+            found[active] = DCEL.FirstContaining(points[active], self.tris_, candidates)
+            if trace is not None:
+                trace.OnBatchRound(level, len(active), int(counts.sum()))
+            active = active[found[active] >= 0]
+            level += 1
+        return found
+
+    def TopScan(self, points):
+        'Face id of the first top layer face containing each row of points, -1 where none does'
+        found = np.full(len(points), -1, dtype=np.int32)
+        step = max(1, SCAN_PAIRS // max(len(self.top_), 1))
+        for start in range(0, len(points), step):
+            inside = Predicates.ContainsBatch(points[start:start + step, np.newaxis, :], self.top_tris_)
+            found[start:start + step] = np.where(inside.any(axis=1), self.top_[inside.argmax(axis=1)], -1)
+        return found
+
+    def Query(self, q_point, trace=None):
+        'Return leaf index of the bottom layer triangle containing q_point, -1 if outside'
+        return self.QueryBatch(np.array([q_point], dtype=np.float64), trace)[0]
+
+
+def Load(path):
+    """Open an index written by KP_Index.Save. The arrays are read-only views of one memory map of the file,
+    so nothing is copied and every process opening the same file shares its page cache.
+    """
+    mm = np.memmap(path, dtype=np.uint8, mode='r')
+    magic, version, count = HEADER.unpack(mm[:HEADER.size].tostring())
+    if magic != FORMAT_MAGIC:
+        raise ValueError("{} is not a KP index file".format(path))
+    if version != FORMAT_VERSION:
+        raise ValueError("{} has format version {}, expected {}".format(path, version, FORMAT_VERSION))
+    arrays = {}
+    for i in range(count):
+        start = HEADER.size + i * ENTRY.size
+        name, dtype, ndim, d0, d1, d2, offset = ENTRY.unpack(mm[start:start + ENTRY.size].tostring())
+        arrays[name.rstrip('\0')] = np.ndarray((d0, d1, d2)[:ndim], dtype=np.dtype(dtype.rstrip('\0')),
+                                                buffer=mm, offset=offset)
+    return KP_Index(arrays['tris'], arrays['child_off'], arrays['children'], arrays['top'], int(arrays['n_leaves'][0]))
+
+
+def Freeze(top_layer):
+    'Compile the hierarchy of KP_Layers topped by top_layer into a KP_Index'
+    chain = [top_layer]
+    while chain[-1].getNext() is not None:
+        chain.append(chain[-1].getNext())
+
+    labels = [f for f in chain[-1].getFaceLabels() if f is not None]
+    ids = dict((f, i) for i, f in enumerate(labels))
+    n_leaves = len(labels)
+    links = [[]] * n_leaves
+    for layer in reversed(chain[:-1]):  # Bottom up, each layer adds only its new faces
+        for f, below in layer.links_.iteritems():
+            ids[f] = len(labels)
+            labels.append(f)
+            links.append([ids[g] for g in below])
+
+    counts = np.array([len(x) for x in links], dtype=np.int64)
+    child_off = np.zeros(len(labels) + 1, dtype=np.int64)
+    np.cumsum(counts, out=child_off[1:])
+    children = np.array([g for x in links for g in x], dtype=np.int32)
+    if top_layer.table_ is None:
+        tris = np.array(labels, dtype=np.float64).reshape(-1, 3, 2)
+    else:
+        tris = top_layer.table_.getTriangles(labels)
+    top = np.array(sorted(ids[f] for f in top_layer.getFaceLabels() if f is not None), dtype=np.int32)
+    return KP_Index(tris, child_off, children, top, n_leaves, labels[:n_leaves])
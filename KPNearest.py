@@ -0,0 +1,110 @@
+'''
+Nearest-site queries over the Delaunay triangulation at the bottom of a Kirkpatrick hierarchy.
+
+In a Delaunay triangulation, a vertex that is not the nearest to q always has a neighbour strictly
+nearer to q, so a greedy walk that keeps moving to its nearest neighbour stops at a nearest vertex.
+Started from the nearest corner of the triangle holding q, located through the hierarchy, the walk
+is a step or two. Bounding box corners are vertices but not sites; when the walk stops at one, q is
+nearer to that corner than to every site, and a scan of the sites settles it.
+'''
+import numpy as np
+import DCEL
+
+SCAN_PAIRS = 1 << 18    # Point-site pairs compared at once when scanning the sites
+
+
+def Distance2(a, b):
+    return (a[0] - b[0]) * (a[0] - b[0]) + (a[1] - b[1]) * (a[1] - b[1])
+
+
+def Walk(dcel, q_point, v):
+    'Greedy walk from vertex v of dcel to the vertex nearest q_point (2-tuple)'
+    best = Distance2(dcel.getCoords(v), q_point)
+    while True:
+        step = min(dcel.getNeighbors(v), key=lambda w: Distance2(dcel.getCoords(w), q_point))
+        dist = Distance2(dcel.getCoords(step), q_point)
+        if dist >= best:
+            return v
+        v, best = step, dist
+
+
+def NearestSite(dcel, q_point, label=None, table=None):
+    """Coordinates of the vertex of dcel, a Delaunay triangulation, nearest q_point (2-tuple), bounding box
+    corners excluded; None if there are no other vertices. label is the Face label of the triangle holding
+    q_point (with its Face_Table table), or None outside to start from the box.
+    """
+    box = dcel.getBox()
+    if label is not None:
+        start = min(DCEL.Corners(label, table), key=lambda pt: Distance2(pt, q_point))
+        v = dcel.getVertex(start)
+    else:
+        v = min(box, key=lambda w: Distance2(dcel.getCoords(w), q_point))
+    v = Walk(dcel, q_point, v)
+    if v in box:
+        sites = [dcel.getCoords(w) for w in dcel.getVertices() - box]
+        return min(sites, key=lambda pt: Distance2(pt, q_point)) if sites else None
+    return dcel.getCoords(v)
+
+
+class Site_Graph:
+    'Vertices and edges of a triangulation as arrays, for greedy walks of many points at once'
+
+    def __init__(self, tris, box=()):
+        """tris: (L, 3, 2) array of the triangles
+        box: coordinates of the vertices that are not sites (the bounding box corners)
+        """
+        self.coords_, verts = np.unique(np.asarray(tris, dtype=np.float64).reshape(-1, 2), axis=0,
+                                        return_inverse=True)
+        self.leaf_verts_ = verts.reshape(-1, 3)     # Vertex ids of the corners of each triangle
+        a, b = self.leaf_verts_.ravel(), np.roll(self.leaf_verts_, -1, axis=1).ravel()
+        ends = np.unique(np.column_stack([np.concatenate([a, b]), np.concatenate([b, a])]), axis=0)  # Sorted edges
+        self.adj_ = ends[:, 1].astype(np.int32)
+        self.adj_off_ = np.searchsorted(ends[:, 0], np.arange(len(self.coords_) + 1))
+        ids = dict((pt, v) for v, pt in enumerate(map(tuple, self.coords_.tolist())))
+        self.box_ = np.zeros(len(self.coords_), dtype=bool)
+        self.box_[[ids[pt] for pt in map(tuple, box) if pt in ids]] = True
+        self.sites_ = np.flatnonzero(~self.box_)
+
+    def Distance2(self, verts, points):
+        delta = self.coords_[verts] - points
+        return (delta * delta).sum(axis=-1)
+
+    def NearestBatch(self, points, leaves):
+        """Vertex ids of the sites nearest each row of points ((m, 2) array), -1 if there are no sites.
+        leaves: leaf index of the triangle holding each point, -1 outside, as KP_Index.QueryBatch returns.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        corners = self.leaf_verts_[np.maximum(leaves, 0)]
+        if self.box_.any():     # Points outside every triangle start from the nearest box corner
+            box = np.flatnonzero(self.box_)
+            outside = box[self.Distance2(box[np.newaxis, :], points[:, np.newaxis, :]).argmin(axis=1)]
+            corners[leaves < 0] = outside[leaves < 0, np.newaxis]
+        else:
+            corners[leaves < 0] = 0
+        current = corners[np.arange(len(points)), self.Distance2(corners, points[:, np.newaxis, :]).argmin(axis=1)]
+
+        active = np.arange(len(points))
+        while len(active):
+            v = current[active]
+            q = points[active]
+            best = self.Distance2(v, q)
+            start = self.adj_off_[v]
+            counts = self.adj_off_[v + 1] - start
+            width = np.arange(counts.max())
+            neighbors = self.adj_[np.minimum(start[:, np.newaxis] + width, len(self.adj_) - 1)]
+            dist = np.where(width < counts[:, np.newaxis], self.Distance2(neighbors, q[:, np.newaxis, :]), np.inf)
+            step = dist.argmin(axis=1)
+            moved = dist[np.arange(len(active)), step] < best
+            current[active[moved]] = neighbors[moved, step[moved]]
+            active = active[moved]
+
+        corner = np.flatnonzero(self.box_[current])     # Nearer a box corner than any site: scan the sites
+        if not len(self.sites_):
+            current[corner] = -1
+            return current
+        step = max(1, SCAN_PAIRS // len(self.sites_))
+        for start in range(0, len(corner), step):
+            rows = corner[start:start + step]
+            dist = self.Distance2(self.sites_[np.newaxis, :], points[rows, np.newaxis, :])
+            current[rows] = self.sites_[dist.argmin(axis=1)]
+        return current
@@ -0,0 +1,147 @@
+'''
+Batch point location split across a pool of processes sharing one memory mapped KP index.
+
+The index is saved once (see KPIndex.KP_Index.Save) and every worker opens it with KPIndex.Load,
+so the workers map the same file pages instead of receiving a pickled copy of the hierarchy.
+A batch is cut into chunks of at most CHUNK points; each chunk goes to a worker as a slice of
+points, or as a row range of a .npy file the worker maps itself, and comes back as leaf indices
+written into the chunk's place in the result, so results keep the input order. Each worker
+times its chunks, and getStats reports points per second per worker.
+
+    python KPParallel.py index.kp points.npy answers.npy [--processes 32]
+'''
+import os
+import sys
+import time
+import atexit
+import argparse
+import tempfile
+import multiprocessing
+import numpy as np
+import KPIndex
+
+CHUNK = 16384   # Points per task
+INDEX = None    # Index opened by each worker process, see Open
+
+
+def Open(path):
+    'Pool initializer: map the index at path into this worker'
+    global INDEX
+    INDEX = KPIndex.Load(path)
+
+
+def Work(task):
+    """Locate one chunk in a worker. task is (start, points) with points an (m, 2) array, or
+    (start, path, stop) to read rows [start, stop) of the .npy file at path.
+    Returns (start, leaf indices, worker pid, seconds spent).
+    """
+    begin = time.time()
+    if len(task) == 2:
+        start, points = task
+    else:
+        start, path, stop = task
+        points = np.load(path, mmap_mode='r')[start:stop]
+    leaves = INDEX.QueryBatch(points)
+    return start, leaves, os.getpid(), time.time() - begin
+
+
+class Parallel_Executor:
+    'Pool of processes answering QueryBatch over one memory mapped KP_Index'
+
+    def __init__(self, index, processes=None, chunk=CHUNK):
+        """index: path of a saved index, or a KP_Index, saved once to a temporary file
+        processes: pool size, by default one per core
+        chunk: points per task
+        """
+        if isinstance(index, KPIndex.KP_Index):
+            fd, path = tempfile.mkstemp(suffix='.kp')
+            os.close(fd)
+            index.Save(path)
+            atexit.register(os.remove, path)
+            self.labels_ = index.getLeafLabels()
+        else:
+            path = index
+            self.labels_ = None
+        self.path_ = path
+        self.chunk_ = chunk
+        self.processes_ = processes or multiprocessing.cpu_count()
+        self.pool_ = multiprocessing.Pool(self.processes_, Open, (path, ))
+        self.ResetStats()
+
+    def Close(self):
+        self.pool_.close()
+        self.pool_.join()
+
+    def getLeafLabels(self):
+        'Leaf labels of the index: those of the KP_Index given, else its leaf coordinates'
+        if self.labels_ is None:
+            self.labels_ = KPIndex.Load(self.path_).getLeafLabels()
+        return self.labels_
+
+    def ResetStats(self):
+        self.workers_ = {}      # pid -> [points, seconds]
+        self.batches_ = 0
+        self.points_ = 0
+        self.seconds_ = 0.      # Wall time in Run
+
+    def getStats(self):
+        'Overall and per worker points per second since ResetStats'
+        workers = dict((str(pid), {'points': points, 'seconds': seconds,
+                                   'points_per_second': points / max(seconds, 1e-9)})
+                       for pid, (points, seconds) in self.workers_.iteritems())
+        return {'processes': self.processes_, 'batches': self.batches_, 'points': self.points_,
+                'points_per_second': self.points_ / max(self.seconds_, 1e-9), 'workers': workers}
+
+    def Run(self, tasks, found):
+        'Hand out tasks, writing each chunk of answers into found at its start'
+        begin = time.time()
+        for start, leaves, pid, seconds in self.pool_.imap_unordered(Work, tasks):
+            found[start:start + len(leaves)] = leaves
+            tally = self.workers_.setdefault(pid, [0, 0.])
+            tally[0] += len(leaves)
+            tally[1] += seconds
+        self.seconds_ += time.time() - begin
+        self.batches_ += 1
+        self.points_ += len(found)
+        return found
+
+    def QueryBatch(self, points):
+        """As KP_Index.QueryBatch, split across the pool: (m,) array of leaf indices, -1 outside,
+        in the order of the rows of points ((m, 2) array).
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        found = np.empty(len(points), dtype=np.int32)
+        tasks = ((start, points[start:start + self.chunk_]) for start in xrange(0, len(points), self.chunk_))
+        return self.Run(tasks, found)
+
+    def QueryFile(self, path, out=None):
+        """Locate every row of the (n, 2) .npy file at path; workers map the file themselves, so only row
+        ranges are sent to them. Answers go to the .npy file out if given (and are returned mapped), else to memory.
+        """
+        count = np.load(path, mmap_mode='r').shape[0]
+        if out is None:
+            found = np.empty(count, dtype=np.int32)
+        else:
+            found = np.lib.format.open_memmap(out, mode='w+', dtype=np.int32, shape=(count, ))
+        tasks = ((start, path, min(start + self.chunk_, count)) for start in xrange(0, count, self.chunk_))
+        return self.Run(tasks, found)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Locate the points of a .npy file across a process pool")
+    parser.add_argument('index', help="index file written by KP_Index.Save")
+    parser.add_argument('points', help="(n, 2) float64 .npy file")
+    parser.add_argument('output', help=".npy file for the (n, ) int32 leaf indices")
+    parser.add_argument('--processes', type=int, default=None, help="default: one per core")
+    parser.add_argument('--chunk', type=int, default=CHUNK)
+    args = parser.parse_args()
+
+    executor = Parallel_Executor(args.index, args.processes, args.chunk)
+    executor.QueryFile(args.points, args.output)
+    executor.Close()
+    stats = executor.getStats()
+    print >> sys.stderr, "Located {} points at {:.0f} points/s with {} processes.".format(
+        stats['points'], stats['points_per_second'], stats['processes'])
+    for pid, worker in sorted(stats['workers'].iteritems()):
+        print >> sys.stderr, "    worker {}: {} points, {:.0f} points/s".format(
+            pid, worker['points'], worker['points_per_second'])
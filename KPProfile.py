@@ -0,0 +1,163 @@
+'''
+Build profiling for the DCEL constructors and KP_Layer.ProduceHierarchy.
+
+The builders take an optional profile and mark where each phase of their work starts with
+Lap(profile, name), which returns at once when profile is None, so unprofiled builds pay one call
+per phase; the DCEL constructors call the profile's own Lap (see DCEL.Laps) instead, so the DCEL
+module does not import this one. A Build_Profile times the phases, per hierarchy layer and in
+total, with the resident memory each one grew by; counts each layer's vertices, edges and faces;
+and while started (with profile: ...) counts calls of the Predicates functions in COUNTED and can
+run cProfile, dumping its stats for pstats. Calls made in pool processes (workers > 1) are not
+counted.
+
+    profile = KPProfile.Build_Profile(cprofile='build.prof')
+    with profile:
+        dcel = DCEL.Array_DCEL.FromTriangles(points, simplices, neighbors, bbox, profile=profile)
+        top = KirkPatrick.KP_Layer(None, dcel).ProduceHierarchy(profile=profile)
+    print json.dumps(profile.getReport())
+'''
+import sys
+import time
+import resource
+import cProfile
+import Predicates
+
+COUNTED = ['CCW', 'Contains', 'Orient', 'InCircle', 'OrientBatch', 'ContainsBatch', 'EarTests']
+PAGE_SIZE = resource.getpagesize()
+
+
+def Lap(profile, name):
+    'End the phase profile is timing, if any, and start timing phase name (None for no phase)'
+    if profile is not None:
+        profile.Lap(name)
+
+
+def ResidentBytes():
+    'Resident memory of this process, None where /proc is not available'
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (IOError, OSError, ValueError, IndexError):
+        return None
+
+
+def Counts(dcel):
+    'Vertices, edges and faces (the unlabelled face included) of a connected DCEL, by Euler\'s formula'
+    verts = len(dcel.getVertices())
+    faces = len(dcel.getFaceLabels())
+    return {'vertices': verts, 'edges': verts + faces - 2, 'faces': faces}
+
+
+class Build_Profile:
+    'Phase timings, layer sizes, memory growth and predicate call counts of a build'
+
+    def __init__(self, counters=True, cprofile=None):
+        """counters: count calls of the COUNTED predicates while started
+        cprofile: path to dump cProfile stats to when stopped, or None not to run cProfile
+        """
+        self.counters_ = counters
+        self.cprofile_ = cprofile
+        self.profiler_ = None
+        self.patched_ = []      # (module, name, original) replaced while started
+        self.started_ = 0       # Nesting depth of Start
+        self.calls_ = dict((name, 0) for name in COUNTED)
+        self.phases_ = {}       # Phase name -> totals over the whole build
+        self.layers_ = []
+        self.layer_ = None      # Layer being built, a dict as in layers_
+        self.dcel_ = None       # Counts of the last DCEL constructed
+        self.phase_ = None      # (name, start time, resident bytes) of the phase being timed
+        self.start_ = None
+
+    def __enter__(self):
+        self.Start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.Stop()
+
+    def Start(self):
+        'Begin counting calls and running cProfile; Start and Stop nest'
+        self.started_ += 1
+        if self.started_ > 1:
+            return
+        self.start_ = time.time()
+        if self.counters_:
+            for name in COUNTED:
+                original = getattr(Predicates, name)
+                counted = self.Counted(name, original)
+                for module in sys.modules.values():
+                    if module is not None and getattr(module, name, None) is original:
+                        self.patched_.append((module, name, original))
+                        setattr(module, name, counted)
+        if self.cprofile_ is not None:
+            self.profiler_ = cProfile.Profile()
+            self.profiler_.enable()
+
+    def Stop(self):
+        self.started_ -= 1
+        if self.started_ > 0:
+            return
+        self.Lap(None)
+        if self.profiler_ is not None:
+            self.profiler_.disable()
+            self.profiler_.dump_stats(self.cprofile_)
+            self.profiler_ = None
+        for module, name, original in self.patched_:
+            setattr(module, name, original)
+        self.patched_ = []
+
+    def Counted(self, name, function):
+        calls = self.calls_
+
+        def Wrapper(*args):
+            calls[name] += 1
+            return function(*args)
+        return Wrapper
+
+    def Lap(self, name):
+        'End the phase being timed, crediting it to the layer being built if any, and start timing phase name'
+        now = time.time()
+        rss = ResidentBytes()
+        if self.phase_ is not None:
+            done, start, start_rss = self.phase_
+            growth = rss - start_rss if rss is not None and start_rss is not None else None
+            for phases in [self.phases_] + ([self.layer_['phases']] if self.layer_ is not None else []):
+                total = phases.setdefault(done, {'seconds': 0., 'laps': 0, 'rss_growth_bytes': 0})
+                total['seconds'] += now - start
+                total['laps'] += 1
+                if growth is not None:
+                    total['rss_growth_bytes'] += growth
+        self.phase_ = (name, now, rss) if name is not None else None
+
+    def OnDCEL(self, dcel):
+        'A DCEL constructor finished building dcel'
+        self.Lap(None)
+        self.dcel_ = Counts(dcel)
+
+    def BeginLayer(self, layer_below):
+        'ProduceHierarchy starts building the layer above layer_below'
+        self.Lap(None)
+        self.layer_ = {'layer': len(self.layers_) + 1, 'phases': {}, 'start': time.time(),
+                       'start_rss': ResidentBytes()}
+
+    def EndLayer(self, layer):
+        'ProduceHierarchy built layer'
+        self.Lap(None)
+        record = self.layer_
+        self.layer_ = None
+        rss = ResidentBytes()
+        start_rss = record.pop('start_rss')
+        record['seconds'] = time.time() - record.pop('start')
+        record['rss_growth_bytes'] = rss - start_rss if rss is not None and start_rss is not None else None
+        record['removed'] = len(layer.removed_)
+        record['new_faces'] = len(layer.links_)
+        record.update(Counts(layer.getDCEL()))
+        self.layers_.append(record)
+
+    def getReport(self):
+        'The measurements so far, as a dict of plain values (JSON ready)'
+        return {'seconds': time.time() - self.start_ if self.start_ is not None else None,
+                'phases': self.phases_, 'layers': self.layers_, 'dcel': self.dcel_,
+                'calls': dict(self.calls_) if self.counters_ else None,
+                'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                'cprofile': self.cprofile_}
@@ -0,0 +1,265 @@
+'''
+Point location over labelled polygonal regions (counties, zones), answering region labels.
+
+Triangulate takes simple polygons of any shape, each with a label, and triangulates them inside
+the bounding box: the Delaunay triangulation of their vertices, with every polygon edge then forced
+in by flipping the edges that cross it (Sloan's method, exact predicates), split where it runs
+through another vertex. Each triangle then takes the region of the polygon it lies in, flooded
+from the triangles left of each polygon edge across the edges that are not polygon edges.
+
+Region_Map builds a point locator over that triangulation with compact Face labels, so each leaf
+triangle is a dense integer, and keeps one flat array of the region id of every leaf: a batch of
+answers is one array lookup away from region ids, and a single answer from its region label.
+
+    regions = KPRegions.Region_Map.FromLabeledPolys([('north', [...]), ('south', [...])], KirkPatrick.BBOX)
+    regions.Query((10., 20.))           # 'north'
+    regions.QueryBatch(points)          # Region ids, indices into regions.getLeafLabels(); -1 for none
+'''
+import collections
+import numpy as np
+from scipy.spatial import Delaunay
+import DCEL
+import PointLocator
+from Predicates import Orient
+
+
+class Constrained_Triangulation:
+    'Triangles of a point set, as vertex id triples, whose edges can be flipped until given segments are edges'
+
+    def __init__(self, points, simplices):
+        """points: list of 2-tuples
+        simplices: (m, 3) CounterClockWise vertex ids of a triangulation of points
+        """
+        self.points_ = points
+        self.tris_ = [tuple(tri) for tri in simplices.tolist()]
+        self.edges_ = dict()    # Half edge (u, w) -> triangle it runs CounterClockWise around
+        self.vert_tris_ = collections.defaultdict(set)
+        for t, tri in enumerate(self.tris_):
+            for i in range(3):
+                self.edges_[(tri[i], tri[(i + 1) % 3])] = t
+                self.vert_tris_[tri[i]].add(t)
+        self.fixed_ = set()     # Edges inserted, as (lesser id, greater id), never flipped
+
+    def isFixed(self, u, w):
+        return (min(u, w), max(u, w)) in self.fixed_
+
+    def getTriangles(self):
+        return self.tris_
+
+    def getTriangle(self, u, w):
+        'Triangle left of the half edge u -> w, None if u -> w is not an edge'
+        return self.edges_.get((u, w))
+
+    def Orient(self, a, b, c):
+        return Orient(self.points_[a], self.points_[b], self.points_[c])
+
+    def Third(self, t, u, w):
+        return [v for v in self.tris_[t] if v != u and v != w][0]
+
+    def Flip(self, u, w):
+        """Replace edge u - w by the other diagonal of its two triangles, if they form a strictly convex
+        quadrilateral; returns that diagonal (x, y), x left of u -> w, or None where it cannot flip.
+        """
+        t1 = self.edges_[(u, w)]
+        t2 = self.edges_[(w, u)]
+        x = self.Third(t1, u, w)
+        y = self.Third(t2, w, u)
+        if self.Orient(u, y, x) <= 0 or self.Orient(y, w, x) <= 0:
+            return None
+        del self.edges_[(u, w)], self.edges_[(w, u)]
+        self.tris_[t1] = (u, y, x)
+        self.tris_[t2] = (y, w, x)
+        self.edges_[(u, y)] = self.edges_[(y, x)] = t1
+        self.edges_[(w, x)] = self.edges_[(x, y)] = t2
+        self.vert_tris_[w].discard(t1)
+        self.vert_tris_[u].discard(t2)
+        self.vert_tris_[x].add(t2)
+        self.vert_tris_[y].add(t1)
+        return x, y
+
+    def Toward(self, a, b):
+        """Start of the segment a -> b: (None, v) if it runs along the edge a - v first (v == b for an edge),
+        else (right, left), the edge it crosses first, named by its ends right and left of the segment.
+        """
+        for t in self.vert_tris_[a]:
+            tri = self.tris_[t]
+            i = tri.index(a)
+            u, w = tri[(i + 1) % 3], tri[(i + 2) % 3]
+            for v in (u, w):    # Along an edge, toward b rather than away
+                pa, pb, pv = self.points_[a], self.points_[b], self.points_[v]
+                if self.Orient(a, b, v) == 0 and (pv[0] - pa[0]) * (pb[0] - pa[0]) + \
+                        (pv[1] - pa[1]) * (pb[1] - pa[1]) > 0:
+                    return None, v
+            if self.Orient(a, u, b) > 0 and self.Orient(a, w, b) < 0:
+                return u, w
+        raise ValueError("No triangle around {} toward {}.".format(self.points_[a], self.points_[b]))
+
+    def Crossing(self, a, b, right, left):
+        """Edges the segment a -> b crosses from its first, right - left, until it reaches b or runs into a vertex
+        of the triangulation on it; returns them as (right, left) pairs, with the vertex reached.
+        """
+        crossed = [(right, left)]
+        while True:
+            if self.isFixed(right, left):
+                raise ValueError("Segments {} - {} and {} - {} cross.".format(
+                    self.points_[a], self.points_[b], self.points_[right], self.points_[left]))
+            x = self.Third(self.edges_[(left, right)], left, right)
+            side = self.Orient(a, b, x)
+            if x == b or side == 0:
+                return crossed, x
+            if side > 0:
+                left = x
+            else:
+                right = x
+            crossed.append((right, left))
+
+    def Insert(self, a, b):
+        'Make the segment a - b a chain of edges, flipping those crossing it; returns the chain of vertex ids'
+        chain = [a]
+        while a != b:
+            right, left = self.Toward(a, b)
+            if right is None:
+                end = left
+            else:
+                crossed, end = self.Crossing(a, b, right, left)
+                self.Resolve(a, end, crossed)
+            self.fixed_.add((min(a, end), max(a, end)))
+            a = end
+            chain.append(a)
+        return chain
+
+    def Resolve(self, a, end, crossed):
+        'Flip the edges crossed, which cross the segment a - end, until none does (Sloan)'
+        queue = collections.deque(crossed)
+        while queue:
+            right, left = queue.popleft()
+            diagonal = self.Flip(right, left)
+            if diagonal is None:
+                queue.append((right, left))     # Not convex yet, flips elsewhere will make it so
+                continue
+            x, y = diagonal
+            if end not in diagonal and a not in diagonal and self.Orient(a, end, x) * self.Orient(a, end, y) < 0:
+                queue.append(diagonal)
+
+
+def Area2(verts):
+    'Twice the signed area of the polygon verts (list of 2-tuples), positive if CounterClockWise'
+    return sum(p[0] * r[1] - r[0] * p[1] for p, r in zip(verts, verts[1:] + verts[:1]))
+
+
+def Triangulate(labeled_polys, bbox):
+    """Triangulate labelled simple polygons within bbox.
+    labeled_polys: list of (label, list of 2-tuple vertex coordinates) as taken by DCEL.Triangled_DCEL, but
+        polygons of any shape and either orientation. Polygons may share edges and vertices, but not overlap;
+        several may share a label.
+    bbox: list of the bounding box corners in CounterClockWise order, strictly around every polygon.
+    Returns points ((n, 2) array, bbox first), simplices ((m, 3) array), the region id of each simplex
+    ((m,) array, -1 outside every polygon) and the region labels the ids index.
+    """
+    coords = list(bbox)
+    vert_ids = dict((pt, v) for v, pt in enumerate(coords))
+    polys = []
+    for label, verts in labeled_polys:
+        verts = [tuple(map(float, pt)) for pt in verts]
+        if Area2(verts) < 0:
+            verts = verts[::-1]
+        for pt in verts:
+            if pt not in vert_ids:
+                vert_ids[pt] = len(coords)
+                coords.append(pt)
+        polys.append((label, [vert_ids[pt] for pt in verts]))
+
+    for pt in coords[len(bbox):]:   # Only box corners may be on the hull, the hierarchy never removes them
+        if any(Orient(p, r, pt) <= 0 for p, r in zip(bbox, bbox[1:] + bbox[:1])):
+            raise ValueError("{} is not strictly inside the bounding box.".format(pt))
+    points = np.array(coords, dtype=np.float64)
+    tri = Delaunay(points, qhull_options="Qbb Qc Qz")
+    points, simplices = DCEL.OrientTriangles(points, tri.simplices)[:2]
+    triangulation = Constrained_Triangulation(coords, simplices)
+
+    region_ids = dict()
+    region_labels = []
+    seeds = []          # (region id, half edge with the region on its left)
+    for label, verts in polys:
+        if label not in region_ids:
+            region_ids[label] = len(region_labels)
+            region_labels.append(label)
+        for a, b in zip(verts, verts[1:] + verts[:1]):
+            chain = triangulation.Insert(a, b)
+            for u, w in zip(chain, chain[1:]):
+                seeds.append((region_ids[label], (u, w)))
+
+    tris = triangulation.getTriangles()
+    regions = np.full(len(tris), -1, dtype=np.int32)
+    stack = []
+    for region, edge in seeds:
+        t = triangulation.getTriangle(*edge)
+        if regions[t] == -1:
+            regions[t] = region
+            stack.append(t)
+        elif regions[t] != region:
+            raise ValueError("Polygons {} and {} overlap.".format(region_labels[regions[t]], region_labels[region]))
+    while stack:
+        t = stack.pop()
+        tri = tris[t]
+        for u, w in zip(tri, tri[1:] + tri[:1]):
+            if triangulation.isFixed(u, w):
+                continue
+            across = triangulation.getTriangle(w, u)
+            if across is None:
+                continue
+            if regions[across] == -1:
+                regions[across] = regions[t]
+                stack.append(across)
+            elif regions[across] != regions[t]:
+                raise ValueError("Polygons {} and {} overlap.".format(region_labels[regions[across]],
+                                                                       region_labels[regions[t]]))
+    return points, np.array(tris, dtype=np.int64).reshape(-1, 3), regions, region_labels
+
+
+class Region_Map(PointLocator.PointLocator):
+    'Point locator over the triangulation of labelled polygons, answering the region label of each point'
+
+    @classmethod
+    def FromLabeledPolys(cls, labeled_polys, bbox, backend=DCEL.Array_DCEL, engine='kirkpatrick', **options):
+        """Triangulate labeled_polys (see Triangulate) into a backend DCEL with compact Face labels,
+        and build the engine named engine (a key of PointLocator.ENGINES) over it with options.
+        """
+        points, simplices, regions, region_labels = Triangulate(labeled_polys, bbox)
+        dcel = backend.FromTriangles(points, simplices, None, bbox, compact=True)
+        return cls(PointLocator.Build(engine, dcel, **options), regions, region_labels)
+
+    def __init__(self, locator, face_regions, region_labels):
+        """locator: PointLocator answering with compact Face labels
+        face_regions: region id of each compact Face label of its leaves, -1 for none
+        region_labels: the label of each region id
+        """
+        self.locator_ = locator
+        self.region_labels_ = list(region_labels)
+        self.face_regions_ = np.asarray(face_regions, dtype=np.int32)
+        leaves = np.asarray(locator.getLeafLabels(), dtype=np.int64)
+        self.leaf_regions_ = np.append(self.face_regions_[leaves], -1)  # -1 last, for leaf index -1
+
+    def getLocator(self):
+        return self.locator_
+
+    def getRegion(self, label):
+        'Region id of compact Face label, -1 for none'
+        return self.face_regions_[label]
+
+    def Locate(self, q_point):
+        'Return the label of the region containing q_point (2-tuple), None outside every region'
+        label = self.locator_.Locate(q_point)
+        region = self.face_regions_[label] if label is not None else -1
+        return self.region_labels_[region] if region >= 0 else None
+
+    def Query(self, q_point):
+        return self.Locate(q_point)
+
+    def QueryBatch(self, points, trace=None):
+        'Region ids of every row of points ((m, 2) array), indices into getLeafLabels(), -1 outside every region'
+        return self.leaf_regions_[self.locator_.QueryBatch(points, trace)]
+
+    def getLeafLabels(self):
+        'Return the region labels indexed by QueryBatch results'
+        return self.region_labels_
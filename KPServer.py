@@ -0,0 +1,206 @@
+'''
+Local point location service over a saved KP index (see KPIndex.KP_Index.Save).
+
+Clients send one "x y" line per point and read back one line per point, in order: the leaf index
+of the triangle containing it, -1 outside, or "error" for a malformed line. A "stats" line reads
+back the service counters as JSON. A batch the index fails on is answered "error" throughout.
+Points from all connections are coalesced into micro-batches of up to BATCH_SIZE points, waiting
+at most BATCH_WAIT seconds for a batch to fill, and each batch is answered by one QueryBatch
+descent. The queue in front of the batcher holds at most QUEUE_SIZE points; when it is full,
+connections are not read until it drains, so clients feel the backpressure through their sockets.
+
+    python KPServer.py index.kp [--listen 127.0.0.1:4510 | --listen /tmp/kp.sock]
+'''
+import os
+import time
+import json
+import Queue
+import socket
+import argparse
+import threading
+import collections
+import SocketServer
+import numpy as np
+import KPIndex
+
+LISTEN = '127.0.0.1:4510'
+BATCH_SIZE = 256
+BATCH_WAIT = 0.002
+QUEUE_SIZE = 4096
+LATENCY_SAMPLES = 10000     # Recent request latencies kept for percentiles
+PERCENTILES = [50, 90, 99]
+
+
+def ParseAddress(address):
+    'host:port for TCP, anything else is a Unix socket path'
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return socket.AF_INET, (host or '127.0.0.1', int(port))
+    return socket.AF_UNIX, address
+
+
+class Batcher(threading.Thread):
+    'Thread answering queued points in micro-batches through one index'
+
+    def __init__(self, index, batch_size=BATCH_SIZE, batch_wait=BATCH_WAIT, queue_size=QUEUE_SIZE):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.index_ = index
+        self.batch_size_ = batch_size
+        self.batch_wait_ = batch_wait
+        self.queue_ = Queue.Queue(queue_size)
+        self.lock_ = threading.Lock()
+        self.start_time_ = time.time()
+        self.requests_ = 0
+        self.batches_ = 0
+        self.failed_batches_ = 0     # Batches QueryBatch raised on, answered 'error'
+        self.busy_ = 0.     # Seconds spent in QueryBatch
+        self.latencies_ = collections.deque(maxlen=LATENCY_SAMPLES)
+
+    def Submit(self, q_point, replies):
+        """Queue q_point (2-tuple); its answer is put on replies. Blocks while the queue is full.
+        q_point may instead be 'stats', answered with getStats() as JSON, or any other string, answered as is.
+        """
+        self.queue_.put((time.time(), q_point, replies))
+
+    def Stop(self):
+        self.queue_.put(None)
+
+    def run(self):
+        while True:
+            batch = [self.queue_.get()]
+            if batch[0] is None:
+                return
+            deadline = time.time() + self.batch_wait_
+            while len(batch) < self.batch_size_:
+                wait = deadline - time.time()
+                try:
+                    request = self.queue_.get(wait > 0, max(wait, 0))
+                except Queue.Empty:
+                    break
+                if request is None:
+                    self.queue_.put(None)   # Finish this batch, stop on the next
+                    break
+                batch.append(request)
+
+            points = [x[1] for x in batch if type(x[1]) is tuple]
+            query_start = time.time()
+            try:
+                leaves = iter(self.index_.QueryBatch(np.array(points, dtype=np.float64).reshape(-1, 2)).tolist())
+                failed = 0
+            except Exception:
+                leaves = iter(['error'] * len(points))  # Answer the whole batch, and keep serving
+                failed = 1
+            done = time.time()
+            with self.lock_:
+                self.requests_ += len(points)
+                self.batches_ += 1
+                self.failed_batches_ += failed
+                self.busy_ += done - query_start
+                self.latencies_.extend(done - x[0] for x in batch if type(x[1]) is tuple)
+            for start, q_point, replies in batch:   # In queue order, so each connection's answers stay in order
+                if type(q_point) is tuple:
+                    replies.put(leaves.next())
+                else:
+                    replies.put(json.dumps(self.getStats()) if q_point == 'stats' else q_point)
+
+    def getStats(self):
+        'Throughput and latency counters since start'
+        with self.lock_:
+            elapsed = time.time() - self.start_time_
+            stats = {'requests': self.requests_, 'batches': self.batches_, 'failed_batches': self.failed_batches_,
+                     'mean_batch': self.requests_ / float(max(self.batches_, 1)),
+                     'requests_per_second': self.requests_ / max(elapsed, 1e-9),
+                     'busy_fraction': self.busy_ / max(elapsed, 1e-9), 'queued': self.queue_.qsize()}
+            if self.latencies_:
+                for p, x in zip(PERCENTILES, np.percentile(list(self.latencies_), PERCENTILES)):
+                    stats['latency_p{}'.format(p)] = float(x)
+        if hasattr(self.index_, 'getStats'):
+            stats['locator'] = self.index_.getStats()
+        return stats
+
+
+class KP_Handler(SocketServer.StreamRequestHandler):
+    'One client connection: a reader thread (this one) submitting points and a writer thread answering them'
+    wbufsize = -1   # Flushed by Write once no answer is waiting
+
+    def handle(self):
+        replies = Queue.Queue()
+        writer = threading.Thread(target=self.Write, args=(replies, ))
+        writer.daemon = True
+        writer.start()
+        for line in iter(self.rfile.readline, ''):
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] == 'stats':
+                self.server.batcher_.Submit('stats', replies)
+                continue
+            try:
+                q_point = (float(parts[0]), float(parts[1]))
+                if not np.isfinite(q_point).all():
+                    raise ValueError
+            except (ValueError, IndexError):
+                q_point = 'error'   # Still one answer per line, in order
+            self.server.batcher_.Submit(q_point, replies)
+        replies.put(None)
+        writer.join()
+
+    def Write(self, replies):
+        try:
+            while True:
+                answer = replies.get()
+                if answer is None:
+                    break
+                self.wfile.write('{}\n'.format(answer))
+                if replies.empty():
+                    self.wfile.flush()
+            self.wfile.flush()
+        except socket.error:
+            pass    # Client went away
+
+
+class KP_TCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class KP_UnixServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+def Serve(index, address=LISTEN, batch_size=BATCH_SIZE, batch_wait=BATCH_WAIT, queue_size=QUEUE_SIZE):
+    """Return a started server (not yet serving; call serve_forever) answering from index, a KP_Index
+    or any locator with QueryBatch (e.g. a KPBackground.Background_Locator still building); the stats
+    line then includes its getStats() as 'locator'.
+    address is host:port or a Unix socket path; only bind to localhost or a local path.
+    """
+    family, address = ParseAddress(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(address):
+            os.unlink(address)
+        server = KP_UnixServer(address, KP_Handler)
+    else:
+        server = KP_TCPServer(address, KP_Handler)
+    server.batcher_ = Batcher(index, batch_size, batch_wait, queue_size)
+    server.batcher_.start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Kirkpatrick point location service")
+    parser.add_argument('index', help="index file written by KP_Index.Save")
+    parser.add_argument('--listen', default=LISTEN, help="host:port or Unix socket path")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--batch-wait', type=float, default=BATCH_WAIT, help="seconds")
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE)
+    args = parser.parse_args()
+    server = Serve(KPIndex.Load(args.index), args.listen, args.batch_size, args.batch_wait, args.queue_size)
+    print "Serving {} on {}".format(args.index, args.listen)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print json.dumps(server.batcher_.getStats(), indent=1, sort_keys=True)
+    finally:
+        server.server_close()
+        server.batcher_.Stop()
@@ -0,0 +1,142 @@
+'''
+Streaming point location: query points in, one answer per point out, in chunks.
+
+Points come from a CSV (or whitespace separated) text file, stdin, or a .npy file; header and blank
+lines in text are skipped. Each answer is the leaf index of the triangle containing the point (-1
+outside), or with --labels the triangle's corner coordinates (nan outside). Reading, querying and
+writing run in three threads joined by queues holding at most DEPTH chunks, so memory stays flat
+however long the stream, and numpy does the per-point work, so the job runs at the speed of its
+I/O. With --processes, each chunk is split across a KPParallel.Parallel_Executor pool mapping the
+same index file.
+
+    python KPStream.py index.kp [points.csv | points.npy | -] [--output answers.txt | -] [--labels] [--binary]
+                                [--processes 32]
+'''
+import sys
+import Queue
+import argparse
+import threading
+import itertools
+import numpy as np
+import KPIndex
+import KPParallel
+
+CHUNK = 65536   # Points per chunk
+DEPTH = 4       # Chunks queued between each stage
+NUMBER_STARTS = set('0123456789+-.')    # First characters of the lines ReadText reads, others are skipped
+
+
+def ReadText(f, chunk=CHUNK):
+    """Yield (m, 2) arrays of the points in text file object f, one "x,y" or "x y" line each.
+    Blank lines and lines not starting with a number (a CSV header, comments) are skipped.
+    """
+    for number in itertools.count():
+        lines = list(itertools.islice(f, chunk))
+        if not lines:
+            return
+        rows = [line for line in lines if line.lstrip()[:1] in NUMBER_STARTS]
+        if not rows:
+            continue
+        values = np.fromstring(''.join(rows).replace(',', ' '), sep=' ')
+        if len(values) != 2 * len(rows):
+            raise ValueError("Chunk {} (lines {}-{}) does not hold two numbers per line".format(
+                number, number * chunk + 1, number * chunk + len(lines)))
+        yield values.reshape(-1, 2)
+
+
+def ReadNpy(path, chunk=CHUNK):
+    'Yield (m, 2) arrays from an (n, 2) .npy file, memory mapped so only the current chunk is read in'
+    points = np.load(path, mmap_mode='r')
+    if points.ndim != 2 or points.shape[1] != 2:
+        raise ValueError("{} holds a {} array, expected (n, 2)".format(path, points.shape))
+    for start in xrange(0, len(points), chunk):
+        yield np.array(points[start:start + chunk], dtype=np.float64)
+
+
+def Answers(index, leaves, labels=False):
+    'Leaf indices as they are, or with labels the (m, 6) corner coordinates of each leaf, nan outside'
+    if not labels:
+        return leaves
+    corners = np.asarray(index.tris_)[np.maximum(leaves, 0)].reshape(-1, 6)
+    corners[leaves < 0] = np.nan
+    return corners
+
+
+def WriteText(f, answers):
+    if answers.ndim == 1:
+        f.write('\n'.join(map(str, answers.tolist())))
+    else:
+        f.write('\n'.join(','.join(map(repr, row)) for row in answers.tolist()))
+    f.write('\n')
+
+
+def WriteBinary(f, answers):
+    'Raw little endian int32 leaf indices, or float64 corner coordinates'
+    f.write(answers.astype('<i4' if answers.ndim == 1 else '<f8').tostring())
+
+
+def Stage(target, source, sink):
+    'Run target(item) over source (iterable), putting results in sink (a Queue) then None; errors are put too'
+    try:
+        for item in source:
+            sink.put(target(item))
+    except Exception, e:
+        sink.put(e)
+    sink.put(None)
+
+
+def Drain(queue):
+    'Iterate a stage\'s queue to its end, re-raising an error from the stage'
+    while True:
+        item = queue.get()
+        if item is None:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def Stream(index, chunks, out, labels=False, binary=False, executor=None):
+    """Locate every point of chunks (iterable of (m, 2) arrays) through index, a KP_Index, writing the answers
+    to file object out as they come. Returns the number of points.
+    executor: optional KPParallel.Parallel_Executor over the same index, answering in its place
+    """
+    locator = executor if executor is not None else index
+    read = Queue.Queue(DEPTH)
+    answered = Queue.Queue(DEPTH)
+    reader = threading.Thread(target=Stage, args=(lambda x: x, chunks, read))
+    querier = threading.Thread(target=Stage, args=(lambda x: Answers(index, locator.QueryBatch(x), labels),
+                                                   Drain(read), answered))
+    for t in (reader, querier):
+        t.daemon = True
+        t.start()
+    write = WriteBinary if binary else WriteText
+    count = 0
+    for answers in Drain(answered):
+        write(out, answers)
+        count += len(answers)
+    out.flush()
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Locate a stream of points through a saved KP index")
+    parser.add_argument('index', help="index file written by KP_Index.Save")
+    parser.add_argument('points', nargs='?', default='-', help=".npy file, text file, or - for stdin")
+    parser.add_argument('--output', default='-', help="file, or - for stdout")
+    parser.add_argument('--labels', action='store_true', help="write triangle corners instead of leaf indices")
+    parser.add_argument('--binary', action='store_true', help="write raw int32 / float64 instead of text")
+    parser.add_argument('--chunk', type=int, default=CHUNK)
+    parser.add_argument('--processes', type=int, default=1, help="query processes, 0 for one per core")
+    args = parser.parse_args()
+
+    if args.points == '-':
+        chunks = ReadText(sys.stdin, args.chunk)
+    elif args.points.endswith('.npy'):
+        chunks = ReadNpy(args.points, args.chunk)
+    else:
+        chunks = ReadText(open(args.points), args.chunk)
+    out = sys.stdout if args.output == '-' else open(args.output, 'wb' if args.binary else 'w')
+    executor = KPParallel.Parallel_Executor(args.index, args.processes or None) if args.processes != 1 else None
+    count = Stream(KPIndex.Load(args.index), chunks, out, args.labels, args.binary, executor)
+    print >> sys.stderr, "Located {} points.".format(count)
@@ -0,0 +1,97 @@
+'''
+Segment and polyline traversal: the faces of the bottom layer a route passes through, in order.
+
+The start of a route is located through the hierarchy; from there the walk crosses, face after
+face, the edge the segment leaves by, following twins (getSides' label across) until the face
+holding the segment's end. Orientations are exact (see Predicates), and the segment is taken as
+shifted an infinitesimal amount to its left, so it never runs through a vertex or along an edge:
+where it does, the faces reported are those just left of it, and at a polyline joint on a vertex
+the faces it turns through about the vertex are reported too. Each face is entered once, so a
+segment costs one step per face crossed and thin triangles cannot be skipped.
+'''
+from Predicates import Orient, Contains
+
+
+def Inward(p, r, a, b):
+    'Does the segment a -> b, shifted left, leave a (on edge p -> r of a CounterClockWise face) into the face?'
+    side = Orient(p, r, b)
+    if side:
+        return side > 0
+    return (p < r) == (a < b)   # Along the edge: left of it is inside when both run the same way
+
+
+def StartFace(dcel, label, a, b):
+    """Face label of the face that the segment a -> b, shifted left, starts in, among the faces holding a
+    around Face label (which holds a); None if it leaves the triangulation at once.
+    """
+    seen = set([label])
+    stack = [label]
+    while stack:
+        label = stack.pop()
+        on = [(p, r, across) for p, r, across in dcel.getSides(label) if Orient(p, r, a) == 0]
+        if all(Inward(p, r, a, b) for p, r, across in on):
+            return label
+        for p, r, across in on:
+            if across is not None and across not in seen:
+                seen.add(across)
+                stack.append(across)
+    return None
+
+
+def Crossed(dcel, label, a, b):
+    """Face labels of the faces the segment a -> b, shifted left, crosses, in order, from Face label, the face
+    it starts in (see StartFace). The walk stops early where the segment leaves the labelled faces.
+    """
+    faces = []
+    while label is not None:
+        faces.append(label)
+        sides = dcel.getSides(label)
+        if Contains(b, [p for p, r, across in sides]):
+            break
+        for p, r, across in sides:
+            if Orient(a, b, p) <= 0 < Orient(a, b, r):   # The side the segment leaves by
+                label = across
+                break
+        else:
+            break
+    return faces
+
+
+def Turn(dcel, label, v, stop):
+    """Face labels of the faces met turning ClockWise about vertex v from Face label to Face label stop, both
+    excluded: those a shifted polyline passes turning at v. None if the turn reaches the unlabelled face first.
+    """
+    faces = []
+    while True:
+        label = [across for p, r, across in dcel.getSides(label) if p == v][0]
+        if label is None:
+            return None
+        if label == stop:
+            return faces
+        faces.append(label)
+
+
+def Traverse(dcel, label, polyline):
+    """Face labels of the faces a polyline (list of 2-tuples) crosses, in order, each once per visit,
+    from Face label (which holds polyline[0]; None outside, for no faces). The walk stops where the polyline
+    leaves the labelled faces.
+    """
+    if label is None:
+        return []
+    faces = []
+    for a, b in zip(polyline, polyline[1:]):
+        if a == b:
+            continue
+        start = StartFace(dcel, label, a, b)
+        if start is None:
+            break
+        if faces and start == faces[-1]:
+            faces.pop()
+        elif faces and a in [p for p, r, across in dcel.getSides(label)]:  # Turning at a vertex
+            faces += Turn(dcel, label, a, start) or []
+        crossed = Crossed(dcel, start, a, b)
+        faces += crossed
+        label = crossed[-1]
+        if not Contains(b, [p for p, r, across in dcel.getSides(label)]):
+            break
+    return faces or [label]
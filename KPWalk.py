@@ -0,0 +1,99 @@
+'''
+Walk-based point location over the bottom triangulation, for queries that come with a good guess.
+
+From a hint face (the caller's, or the previous answer) the visibility walk crosses any edge the
+query point lies strictly beyond, until no edge separates them. Each face tests its edges from a
+random one, so the walk cannot cycle even where the triangulation is not Delaunay. A walk that
+runs past max_steps faces, or a hint that is no longer a face, falls back to a full descent of
+the Kirkpatrick hierarchy. Walk lengths are counted, so getStats tells whether a workload walks
+short enough to be worth it.
+'''
+import random
+import numpy as np
+import PointLocator
+from Predicates import Orient
+
+MAX_STEPS = 50
+
+
+class Walk_Locator(PointLocator.PointLocator):
+    'Visibility walk from a hint face, falling back to a PointLocator (by default the Kirkpatrick hierarchy)'
+
+    @classmethod
+    def FromDCEL(cls, dcel, max_steps=MAX_STEPS, seed=None, **options):
+        'Walk dcel, falling back to a Kirkpatrick hierarchy built over it with options'
+        return cls(dcel, PointLocator.Build('kirkpatrick', dcel, seed=seed, **options), max_steps, seed)
+
+    def __init__(self, dcel, fallback, max_steps=MAX_STEPS, seed=None):
+        """dcel: the triangulation walked (Triangled_DCEL or Array_DCEL), as the bottom layer of fallback
+        fallback: PointLocator answering with dcel's Face labels, used when there is no hint or the walk is long
+        max_steps: faces crossed before giving up on a walk
+        """
+        self.dcel_ = dcel
+        self.fallback_ = fallback
+        self.max_steps_ = max_steps
+        self.rng_ = random.Random(seed)
+        self.last_ = None   # Previous answer, the hint when none is given
+        self.leaf_ids_ = None
+        self.ResetStats()
+
+    def getStats(self):
+        return {'queries': self.walks_ + self.fallbacks_, 'walks': self.walks_, 'fallbacks': self.fallbacks_,
+                'mean_walk': self.steps_ / float(max(self.walks_, 1)),
+                'fallback_rate': self.fallbacks_ / float(max(self.walks_ + self.fallbacks_, 1))}
+
+    def ResetStats(self):
+        self.walks_ = 0
+        self.steps_ = 0     # Faces crossed by finished walks
+        self.fallbacks_ = 0
+
+    def Walk(self, q_point, label):
+        """Return (label of the face holding q_point or None outside, faces crossed),
+        or (None, -1) if there is no face label or the walk passes max_steps.
+        """
+        if label is None:
+            return None, -1
+        for steps in xrange(self.max_steps_ + 1):
+            try:
+                sides = self.dcel_.getSides(label)
+            except KeyError:
+                return None, -1
+            first = self.rng_.randrange(len(sides))
+            for i in range(len(sides)):
+                a, b, across = sides[(first + i) % len(sides)]
+                if Orient(a, b, q_point) < 0:
+                    break
+            else:
+                return label, steps
+            if across is None:  # Crossed the hull: q_point is outside the triangulation
+                return None, steps
+            label = across
+        return None, -1
+
+    def Locate(self, q_point, hint=None):
+        """Return the Face label of the face containing q_point (2-tuple), None outside.
+        hint is a Face label to walk from; by default the previous answer.
+        """
+        label, steps = self.Walk(q_point, hint if hint is not None else self.last_)
+        if steps < 0:
+            self.fallbacks_ += 1
+            label = self.fallback_.Locate(q_point)
+        else:
+            self.walks_ += 1
+            self.steps_ += steps
+        if label is not None:
+            self.last_ = label
+        return label
+
+    def QueryBatch(self, points, trace=None, hints=None):
+        """Locate the rows of points ((m, 2) array) in order, each walking from the previous answer
+        or from its row of hints (list of Face labels). Returns (m,) array of indices into getLeafLabels().
+        """
+        if self.leaf_ids_ is None:
+            self.leaf_ids_ = dict((label, i) for i, label in enumerate(self.getLeafLabels()))
+        labels = [self.Locate(q_point, hints[i] if hints is not None else None)
+                  for i, q_point in enumerate(map(tuple, np.asarray(points).reshape(-1, 2).tolist()))]
+        return np.array([self.leaf_ids_[x] if x is not None else -1 for x in labels], dtype=np.int64)
+
+    def getLeafLabels(self):
+        return self.fallback_.getLeafLabels()
@@ -3,91 +3,113 @@ Created on Jan 8, 2016
 
 @author: jonathanshor
 '''
+import os
+import sys
 import time
-import copy
+import json
+import resource
 import random
+import multiprocessing
 import numpy as np
-import pygame
 from scipy.spatial import Delaunay
 import DCEL
-from COS451PS1 import CCW
-
-BENCHMARKING = False
+import Predicates
+import KPIndex
+import KPCache
+import KPWalk
+import KPNearest
+import KPTraverse
+import KPProfile
+from KPProfile import Lap
+import PointLocator
+
+BENCHMARKING = False    # Set to skip the pygame display of each query in the driver
 BOXSIZE = 600.
 SITES = 20
 QUERIES = 1
-SCALE = 1.   # Set to 1 for no scaling
+WORKERS = 1  # Processes used to build each hierarchy layer
+STRATEGY = 'arbitrary'  # Independent set selection: 'arbitrary', 'lowest_degree' or 'random'
+MAX_DEGREE = 8  # Only vertices up to this degree are removed
+PARALLEL_MIN_STARS = 2000   # Smaller independent sets are retriangulated serially, even with workers
+TOP_FACES = None    # Stop peeling at this many top layer triangles, 'auto', or None to peel to the end
+HOP_TRIANGLES = 48  # Triangles a packed top layer scan tests in the time of one more layer hop (see Benchmark)
+BACKEND = 'object'   # DCEL backend: 'object' (Triangled_DCEL) or 'array' (Array_DCEL)
+COMPACT = False  # Label Faces by dense integer ids in a DCEL.Face_Table, not by their coordinates
+INDEX_FILE = None    # If set, query the saved index there when present, else save the built one there
+PROFILE = None  # If set, write a build profile (JSON) there, with cProfile stats beside it in PROFILE + '.prof'
 BBOX = [(0., 0.), (BOXSIZE, 0.), (BOXSIZE, BOXSIZE), (0., BOXSIZE)]
-BLACK = (  0,   0,   0)
-WHITE = (255, 255, 255)
-RED =   (255,   0,   0)
-BLUE =  (  0,   0, 255)
-GREEN = (  0, 255,   0)
-
-
-def ScaleUp(poly):
-    'Poly should be a list of 2-tuples'
-    return [(SCALE * x[0], SCALE * x[1]) for x in poly]
 
 
-def Display(polys, red_polys=None, blue_polys=None, caption=None, green_polys=None):
-    'Expects just a list of polys(each a list of 2-tuples), NO LABELS'
-    screen = pygame.display.set_mode([int(BOXSIZE), int(BOXSIZE)])
+class QueryTrace:
+    """Observer interface for KP_Layer.Query and KPIndex.KP_Index.QueryBatch; every hook is a no-op here.
+    Pass an instance (or anything with the same methods) as trace to receive the progress of each query.
+    """
 
-    if caption is None:
-        pygame.display.set_caption("Kirkpatrick Point Location")
-    else:
-        pygame.display.set_caption(caption)
+    def OnQuery(self, q_point):
+        'A scalar query for q_point starts at the top layer'
 
-    screen.fill(WHITE)
+    def OnLayer(self, layer, candidates, hit, contains_calls):
+        'At layer, contains_calls of the candidates (Face labels) were tested; hit is the containing one, or None'
 
-    to_draw = [ScaleUp(x) for x in polys]
+    def OnResult(self, q_point, tri):
+        'The scalar query for q_point ended in bottom layer triangle tri, or None if outside'
 
-    for poly in to_draw:
-        pygame.draw.polygon(screen, BLACK, poly, 1)
+    def OnBatchRound(self, level, active, contains_calls):
+        'Descent round level of a batch query: active points still descending, contains_calls candidate tests'
 
-    if blue_polys is not None:
-        to_draw = [ScaleUp(x) for x in blue_polys]
 
-        for poly in to_draw:
-            pygame.draw.polygon(screen, BLUE, poly, 1)
+class CountingTrace(QueryTrace):
+    'QueryTrace accumulating candidate counts and Contains calls, in total and per level from the top'
 
-    if red_polys is not None:
-        to_draw = [ScaleUp(x) for x in red_polys]
+    def __init__(self):
+        self.queries_ = 0
+        self.contains_calls_ = 0
+        self.level_candidates_ = []
+        self.level_calls_ = []
+        self.level_ = 0
 
-        for poly in to_draw:
-            pygame.draw.polygon(screen, RED, poly, 1)
+    def OnQuery(self, q_point):
+        self.queries_ += 1
+        self.level_ = 0
 
-    if green_polys is not None:
-        to_draw = [ScaleUp(x) for x in green_polys]
+    def OnLayer(self, layer, candidates, hit, contains_calls):
+        self.Count(self.level_, len([f for f in candidates if f is not None]), contains_calls)
+        self.level_ += 1
 
-        for poly in to_draw:
-            pygame.draw.polygon(screen, GREEN, poly, 1)
+    def OnBatchRound(self, level, active, contains_calls):
+        if level == 0:
+            self.queries_ += active
+        self.Count(level, contains_calls, contains_calls)
 
-    # Update the screen with what we've drawn.
-    pygame.display.flip()
+    def Count(self, level, candidates, contains_calls):
+        while len(self.level_calls_) <= level:
+            self.level_candidates_.append(0)
+            self.level_calls_.append(0)
+        self.level_candidates_[level] += candidates
+        self.level_calls_[level] += contains_calls
+        self.contains_calls_ += contains_calls
 
-    # Hold until the user does anything.
-    done = False
-    clock = pygame.time.Clock()
-    while not done:
-        clock.tick(4)
-        for event in pygame.event.get():  # User did something
-            # if event.type == pygame.KEYDOWN:
-            #     done = True
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                done = True
-            if event.type == pygame.QUIT:  # If user clicked close
-                done = True  # Flag that we are done so we exit this loop
 
-
-class KP_Layer:
+class KP_Layer(PointLocator.PointLocator):
     'Triangulated planar graph rep for one layer of Kirkpatrick pt loc heirarchy'
 
+    @classmethod
+    def FromDCEL(cls, dcel, workers=None, strategy='arbitrary', max_degree=8, seed=None, top_faces=None):
+        'Build the hierarchy over a triangulation dcel with a bounding box, and return its top layer'
+        return cls(None, dcel).ProduceHierarchy(workers, strategy, max_degree, seed, top_faces)
+
     def __init__(self, layer_below, dcel):
         self.below_ = layer_below  # Layer below
-        self.links_ = dict()    # Keys: Face labels, Items: list of Face labels
-        self.dcel_ = dcel
+        self.links_ = dict()    # Keys: labels of Faces new in this layer, Items: list of Face labels below
+        self.dead_ = set()      # Labels of Faces below that are not in this layer
+        self.removed_ = set()   # Vertices removed from the layer below
+        self.interior_ = 0      # Number of non-CH vertices in the layer below
+        self.dcel_ = dcel       # Held by the bottom and top layers only; the rest are deltas
+        self.index_ = None      # Flat query index, see Freeze
+        self.top_labels_ = None  # Face labels of a packed top layer, see Pack
+        self.top_tris_ = None   # and their corners, an (T, 3, 2) array
+        # Face_Table shared down the hierarchy when Faces have compact integer labels, else None
+        self.table_ = dcel.getTable() if dcel is not None else layer_below.table_
 
     def getNext(self):
         return self.below_
@@ -107,71 +129,127 @@ class KP_Layer:
             raise TypeError("Expected links to be dict, not {}".format(type(links)))
 
     def getLink(self, f):
-        'Return list of Faces (labels) pointed to by f'
+        'Return list of Faces (labels) pointed to by f. Unchanged faces are shared with the layer below.'
         try:
             return self.links_[f]
         except KeyError, e:
-            print "All keys: {}".format(list(self.links_.iterkeys()))
-            raise e
-
+            if __debug__ and f in self.dead_:
+                print "All keys: {}".format(list(self.links_.iterkeys()))
+                raise e
+            return [f]
 
     def getDCEL(self):
         return self.dcel_
 
-    def Display(self, red_polys=None, blue_polys=None, caption=None, green_polys=None):
-        Display([x[1] for x in self.dcel_.getLabeledPolys()], red_polys, blue_polys, caption, green_polys)
+    def getCorners(self, f):
+        'Corner coordinates of the triangle Face label f'
+        return DCEL.Corners(f, self.table_)
+
+    def getFaceLabels(self):
+        'Return set of Face labels in this layer'
+        if self.dcel_ is not None:
+            return self.dcel_.getFaceLabels()
+        return (self.below_.getFaceLabels() - self.dead_) | set(self.links_.iterkeys())
 
-    def FindIndieSet(self):
-        'Return an independent set of non-CH vertices'
+    def Display(self, red_polys=None, blue_polys=None, caption=None, green_polys=None):
+        'Draw the layer with pygame, imported only here; the query and build paths never draw.'
+        import KPDisplay
+        if self.dcel_ is not None:
+            polys = [x[1] for x in self.dcel_.getLabeledPolys()]
+        else:
+            polys = [list(self.getCorners(x)) for x in self.getFaceLabels() if x is not None]
+        KPDisplay.Display(polys, red_polys, blue_polys, caption, green_polys, BOXSIZE)
+
+    def FindIndieSet(self, strategy='arbitrary', max_degree=8, rng=None):
+        """Return an independent set of non-CH vertices of degree at most max_degree.
+        The set is maximal among those vertices; strategy picks the order they are taken in:
+            'arbitrary': set order
+            'lowest_degree': lowest degree first, freeing the most vertices for later picks
+            'random': shuffled by rng (a random.Random)
+        """
         verts = self.getDCEL().getVertices()
         verts -= self.getDCEL().getBox()
 
         # for v in verts:
         #     if v.getDegree() > 8:
         #         verts.remove(v)
-        verts -= set([v for v in verts if v.getDegree() > 8])
+        degrees = dict((v, self.getDCEL().getDegree(v)) for v in verts)
+        verts -= set([v for v in verts if degrees[v] > max_degree])
+
+        if strategy == 'arbitrary':
+            order = list(verts)
+        elif strategy == 'lowest_degree':
+            order = sorted(verts, key=lambda v: (degrees[v], self.getDCEL().getCoords(v)))
+        elif strategy == 'random':
+            order = sorted(verts, key=self.getDCEL().getCoords)
+            (rng or random).shuffle(order)
+        else:
+            raise ValueError("Unknown independent set strategy: {}".format(strategy))
 
         ind_set = set()
-        while len(verts) > 0:
-            v = verts.pop()
-            ind_set.add(v)
-            # With degree limited to O(1), getNeighbors is O(1)
-            for w in v.getNeighbors():
-                verts.discard(w)
+        for v in order:
+            if v in verts:
+                ind_set.add(v)
+                # With degree limited to O(1), getNeighbors is O(1)
+                for w in self.getDCEL().getNeighbors(v):
+                    verts.discard(w)
 
         return ind_set
 
-    def FindPrevLayer(self):
-        'Generate and return the parent layer of self'
-        new_layer = KP_Layer(self, copy.deepcopy(self.getDCEL()))
-        del_verts = new_layer.FindIndieSet()
+    def FindPrevLayer(self, pool=None, strategy='arbitrary', max_degree=8, rng=None, profile=None):
+        """Generate and return the parent layer of self.
+        The bottom layer keeps its own DCEL; above it one working DCEL is handed up layer to layer,
+        so each layer only records what changed: removed vertices, dead faces and new faces' links.
+        With a multiprocessing pool, the holes left by the independent set are retriangulated in parallel.
+        strategy, max_degree and rng are passed on to FindIndieSet; profile, a KPProfile.Build_Profile, times
+        each phase.
+        """
+        Lap(profile, 'copy')
+        if self.below_ is None:
+            dcel = self.getDCEL().Copy()
+        else:
+            dcel = self.dcel_
+            self.dcel_ = None
+        new_layer = KP_Layer(self, dcel)
+        new_layer.interior_ = len(dcel.getVertices()) - len(dcel.getBox())
+        Lap(profile, 'indie_set')
+        del_verts = new_layer.FindIndieSet(strategy, max_degree, rng)
         if __debug__:
             # print "Building next layer"
             # print "del_verts: ", del_verts
             for v in del_verts:
-                assert del_verts.isdisjoint(v.getNeighbors())
-
-        for v in del_verts:
-            # if __debug__:
-            #     print v, v.getDegree()
-            new_links = new_layer.getDCEL().removeInteriorVertex(v)
+                assert del_verts.isdisjoint(dcel.getNeighbors(v))
+
+        if pool is not None and len(del_verts) >= PARALLEL_MIN_STARS:
+            # Independent stars share no faces, so each hole can be ear cut on its own.
+            # Splicing stays serial and in set order, keeping the result identical to a serial build.
+            Lap(profile, 'ear_cut')
+            del_verts = list(del_verts)
+            stars = [dcel.getStar(v) for v in del_verts]
+            jobs = [(dcel.getCoords(v), [dcel.getCoords(w) for w in star[1]]) for v, star in zip(del_verts, stars)]
+            removals = zip(del_verts, stars, pool.map(DCEL.EarCutStar, jobs, chunksize=256))
+        else:
+            removals = [(v, None, None) for v in del_verts]
+
+        Lap(profile, 'remove')
+        for v, star, tris in removals:
+            if star is None:
+                new_links = dcel.removeInteriorVertex(v)
+            else:
+                new_links = dcel.applyRemoval(v, star[0], star[1], tris)
             new_layer.updateLinks(new_links)
-            # print "len(new_links): {}".format(len(new_links))
-            # if __debug__:
-            #     new_layer.getDCEL().Validate()
-
-        untouched = set([f.getLabel() for f in new_layer.getDCEL().getFaces()]) - set(new_layer.links_.iterkeys())
-        untouched_update = {}
-        for f in untouched:
-            untouched_update[f] = [f]
-        new_layer.updateLinks(untouched_update)
+            for links in new_links.itervalues():
+                new_layer.dead_.update(links)
+        new_layer.removed_ = set(del_verts)
 
         if __debug__:
+            Lap(profile, 'check')
             try:
-                assert set(new_layer.links_.iterkeys()) == set([f.getLabel() for f in new_layer.getDCEL().getFaces()])
+                assert new_layer.getFaceLabels() == \
+                    (self.getFaceLabels() - new_layer.dead_) | set(new_layer.links_.iterkeys())
             except AssertionError, e:
-                k = set(new_layer.links_.iterkeys())
-                fs = set([f.getLabel() for f in new_layer.getDCEL().getFaces()])
+                k = (self.getFaceLabels() - new_layer.dead_) | set(new_layer.links_.iterkeys())
+                fs = new_layer.getFaceLabels()
                 print "keys < faces: {}".format(k < fs)
                 print "New layer keys[{}]: {}".format(len(k), k)
                 print "New layer faces[{}]: {}".format(len(fs), fs)
@@ -179,18 +257,66 @@ class KP_Layer:
                 new_layer.Display()
                 raise e
 
-
+        Lap(profile, None)
         return new_layer
 
-    def ProduceHierarchy(self):
-        'Generate the full KP hierarchy, and return the top layer.'
-        cur_layer = self
-        while len(cur_layer.getDCEL().getVertices()) > 2 + len(BBOX):
-            cur_layer = cur_layer.FindPrevLayer()
-            # if __debug__:
-            #     cur_layer.Display()
+    def ProduceHierarchy(self, workers=None, strategy='arbitrary', max_degree=8, seed=None, top_faces=None,
+                         profile=None):
+        """Generate the full KP hierarchy, and return the top layer. workers > 1 ear cuts each layer in a process pool.
+        strategy and max_degree choose each layer's independent set (see FindIndieSet); seed seeds 'random'.
+        Raises ValueError if a layer removes no vertex, as can happen with max_degree below 8.
+        top_faces truncates the hierarchy: peeling stops at a layer of at most that many triangles, or with 'auto'
+        once another layer would save fewer triangle tests than HOP_TRIANGLES, and that top layer is packed.
+        profile, a KPProfile.Build_Profile, times each layer phase by phase; start it to count predicate calls.
+        """
+        pool = multiprocessing.Pool(workers) if workers is not None and workers > 1 else None
+        rng = random.Random(seed)
+        try:
+            cur_layer = self
+            prev_faces = None
+            while len(cur_layer.getDCEL().getVertices()) > 2 + len(BBOX):
+                faces = len(cur_layer.getDCEL().getFaceLabels()) - 1
+                if top_faces == 'auto':
+                    # The next layer should shrink by about as much as this one did
+                    if prev_faces is not None and faces * (1. - faces / float(prev_faces)) <= HOP_TRIANGLES:
+                        break
+                elif top_faces is not None and faces <= top_faces:
+                    break
+                prev_faces = faces
+                if profile is not None:
+                    profile.BeginLayer(cur_layer)
+                cur_layer = cur_layer.FindPrevLayer(pool, strategy, max_degree, rng, profile)
+                if not cur_layer.removed_:  # Every interior vertex is above max_degree: no layer would shrink
+                    raise ValueError("No interior vertex of degree at most {} among {} vertices; max_degree below 8 "
+                                     "can stall".format(max_degree, len(cur_layer.getDCEL().getVertices())))
+                if profile is not None:
+                    profile.EndLayer(cur_layer)
+                # if __debug__:
+                #     cur_layer.Display()
+        finally:
+            if pool is not None:
+                pool.terminate()
+        if top_faces is not None:
+            Lap(profile, 'pack')
+            cur_layer.Pack()
+            Lap(profile, None)
         return cur_layer
 
+    def Pack(self):
+        'Keep this (top) layer\'s triangles in one packed coordinate array, which Query scans in one vectorized test'
+        self.top_labels_ = [f for f in self.getFaceLabels() if f is not None]
+        self.top_tris_ = np.array([self.getCorners(f) for f in self.top_labels_], dtype=np.float64).reshape(-1, 3, 2)
+
+    def BuildReport(self):
+        'Return the Depth() of the hierarchy topped by self and, bottom up, the removal ratio of each layer'
+        layers = []
+        cur_layer = self
+        while cur_layer.getNext() is not None:
+            layers.append({'interior': cur_layer.interior_, 'removed': len(cur_layer.removed_),
+                           'ratio': len(cur_layer.removed_) / float(max(cur_layer.interior_, 1))})
+            cur_layer = cur_layer.getNext()
+        return {'depth': self.Depth(), 'layers': layers[::-1]}
+
     def Depth(self):
         'Return number of layers.'
         next_layer = self.getNext()
@@ -199,29 +325,105 @@ class KP_Layer:
         else:
             return 1 + next_layer.Depth()
 
-    def Query(self, q_point):
+    def Query(self, q_point, trace=None):
         """Return triangle coordinates (3-tuple of 2-tuples) for bottom layer triangle containing q_point.
-            If __debug__, also displays query progress layer by layer.
+            trace, a QueryTrace, observes the descent layer by layer.
         """
-        green_spotter_box = [(q_point[0]-1, q_point[1]-1), (q_point[0]-1,q_point[1]+1), (q_point[0]+1,q_point[1]+1), (q_point[0]+1,q_point[1]-1)]
-        search_faces = self.links_.iterkeys()
+        tri = self.Locate(q_point, trace)
+        if tri is not None:
+            tri = self.getCorners(tri)
+        if trace is not None:
+            trace.OnResult(q_point, tri)
+        return tri
+
+    def Locate(self, q_point, trace=None):
+        'As Query, but return the Face label of the bottom layer triangle, and leave OnResult to Query'
+        if trace is not None:
+            trace.OnQuery(q_point)
+        search_faces = self.getFaceLabels() if self.top_tris_ is None else self.top_labels_
         cur_layer = self
+        tri = None
         while cur_layer is not None:           # O(lg n) layers
-            for tri in search_faces:             # O(1) search_faces at each layer
-                if (tri is not None) and (DCEL.Contains(q_point, tri)): # O(1) per Contains() check
-                    # if __debug__:
-                    #     print "At height {}, within face {}.".format(cur_layer.Depth(), tri)
-                    if not BENCHMARKING:
-                        cur_layer.Display(red_polys=[tri], blue_polys=[x for x in search_faces if x is not None], green_polys=[green_spotter_box], caption="{} within face {}".format(q_point, tri))
-                    if cur_layer.getNext() is not None:
-                        search_faces = cur_layer.getLink(tri)
-                    cur_layer = cur_layer.getNext()
-                    break   # for loop
-            else:               # Did not break for loop, i.e.
-                return None     # q_point not within the bounding box
-
+            contains_calls = 0
+            if cur_layer is self and self.top_tris_ is not None:    # Packed top layer, scanned whole
+                inside = np.flatnonzero(Predicates.ContainsBatch(q_point, self.top_tris_))
+                tri = search_faces[inside[0]] if len(inside) else None
+                contains_calls = len(search_faces)
+            else:
+                for tri in search_faces:             # O(1) search_faces at each layer
+                    if tri is not None:
+                        contains_calls += 1
+                        if DCEL.Contains(q_point, cur_layer.getCorners(tri)):  # O(1) per Contains() check
+                            break
+                else:               # Did not break for loop, i.e.
+                    tri = None      # q_point not within the bounding box
+            if trace is not None:
+                trace.OnLayer(cur_layer, search_faces, tri, contains_calls)
+            if tri is None:
+                break
+            if cur_layer.getNext() is not None:
+                search_faces = cur_layer.getLink(tri)
+            cur_layer = cur_layer.getNext()
         return tri
 
+    def Freeze(self):
+        'Compile the hierarchy topped by self into a flat KPIndex.KP_Index, built once and cached.'
+        if self.index_ is None:
+            self.index_ = KPIndex.Freeze(self)
+        return self.index_
+
+    def getLeafLabels(self):
+        'Return the bottom layer Face labels indexed by QueryBatch results'
+        return self.Freeze().getLeafLabels()
+
+    def QueryBatch(self, points, trace=None):
+        """Locate every row of points ((m, 2) array) through the frozen index.
+            Returns (m,) array of indices into getLeafLabels(), -1 for points outside BBOX.
+        """
+        return self.Freeze().QueryBatch(points, trace)
+
+    def Accelerate(self, cache_size=KPCache.CACHE_SIZE, grid_size=None):
+        'Return a KPCache.Coherent_Locator over the frozen index, for streams of nearby queries'
+        return KPCache.Coherent_Locator(self.Freeze(), cache_size, grid_size)
+
+    def Walker(self, max_steps=KPWalk.MAX_STEPS, seed=None):
+        'Return a KPWalk.Walk_Locator over the bottom layer, falling back to this hierarchy'
+        return KPWalk.Walk_Locator(self.getBottom().getDCEL(), self, max_steps, seed)
+
+    def getBottom(self):
+        'Bottom layer of the hierarchy topped by self'
+        bottom = self
+        while bottom.getNext() is not None:
+            bottom = bottom.getNext()
+        return bottom
+
+    def NearestSite(self, q_point):
+        """Return the coordinates of the input site nearest q_point (2-tuple), bounding box corners excluded,
+            when the bottom layer is a Delaunay triangulation: located here, then a greedy walk (see KPNearest).
+        """
+        return KPNearest.NearestSite(self.getBottom().getDCEL(), q_point, self.Locate(q_point), self.table_)
+
+    def Traverse(self, polyline):
+        """Return the Face labels of the bottom layer faces polyline (list of 2-tuples) crosses, in order:
+            its start is located here, then the bottom layer is walked edge by edge (see KPTraverse).
+        """
+        polyline = map(tuple, polyline)
+        return KPTraverse.Traverse(self.getBottom().getDCEL(), self.Locate(polyline[0]), polyline)
+
+    def TraverseBatch(self, polylines):
+        'As Traverse for every polyline of polylines, their starts located in one QueryBatch'
+        polylines = [map(tuple, polyline) for polyline in polylines]
+        leaves = self.QueryBatch([polyline[0] for polyline in polylines]).tolist()
+        labels = self.getLeafLabels()
+        dcel = self.getBottom().getDCEL()
+        return [KPTraverse.Traverse(dcel, labels[leaf] if leaf >= 0 else None, polyline)
+                for leaf, polyline in zip(leaves, polylines)]
+
+    def NearestSiteBatch(self, points):
+        'As NearestSite for every row of points ((m, 2) array), through the frozen index; (m, 2) array'
+        dcel = self.getBottom().getDCEL()
+        return self.Freeze().NearestSiteBatch(points, [dcel.getCoords(v) for v in dcel.getBox()])
+
 
 def LabelTriangle(triangle):
     'triangle is a length 3 iterable, each element being a 2-tuple'
@@ -230,6 +432,21 @@ def LabelTriangle(triangle):
 
 # Assume fixed bounding box BBOX with O(1) vertices, and list of labeled non-intersecting polygons POLYS
 if __name__ == '__main__':
+    if INDEX_FILE is not None and os.path.exists(INDEX_FILE):
+        # Cold start from a saved hierarchy: no triangulation or Python objects to rebuild
+        load_start = time.time()
+        index = KPIndex.Load(INDEX_FILE)
+        print "Loading {} took {} seconds.".format(INDEX_FILE, time.time() - load_start)
+        q_points = [(random.randint(1, BOXSIZE - 1), random.randint(1, BOXSIZE - 1)) for i in range(QUERIES)]
+        batch_start = time.time()
+        leaves = index.QueryBatch(np.array(q_points))
+        batch_time = time.time() - batch_start
+        for i, (q_point, leaf) in enumerate(zip(q_points, leaves)):
+            print "Query {}: {} contained within: ".format(i, q_point), \
+                None if leaf < 0 else index.getLeafTriangle(leaf)
+        print "Batch of {} queries took {} seconds.".format(QUERIES, batch_time)
+        sys.exit()
+
     input_pts = set(BBOX)
     for i in range(SITES):
         input_pts.add((2*random.randint(1, BOXSIZE/2 - 1), 2*random.randint(1, BOXSIZE/2 - 1)))
@@ -241,26 +458,56 @@ if __name__ == '__main__':
     if __debug__:
         assert len(first_tri.coplanar) == 0  # Ensure qhull didnt omit any points
 
-    # Back to our point-tuple structure
     print "shape: {}".format(first_tri.simplices.shape)
-    tri_points = [[(pt[0], pt[1]) for pt in tri] for tri in points[first_tri.simplices]]
     if __debug__:   # Ensure qhull didnt mutate any points
-        tri_points_check = set()
-        for tri in tri_points:
-            tri_points_check.update(tri)
+        tri_points_check = set(map(tuple, points[first_tri.simplices].reshape(-1, 2).tolist()))
         assert input_pts == tri_points_check
 
-    labeled_tris = [(LabelTriangle(tri), tri) for tri in tri_points]
-
     start_time = time.time()
+    profile = KPProfile.Build_Profile(cprofile=PROFILE + '.prof') if PROFILE is not None else None
+    if profile is not None:
+        profile.Start()
     ds_start = time.time()
-    first_layer = KP_Layer(None, DCEL.Triangled_DCEL(labeled_tris, BBOX))
-    top_layer = first_layer.ProduceHierarchy()
+    backend = {'object': DCEL.Triangled_DCEL, 'array': DCEL.Array_DCEL}[BACKEND]
+    first_layer = KP_Layer(None, backend.FromTriangles(points, first_tri.simplices, first_tri.neighbors, BBOX,
+                                                                compact=COMPACT, profile=profile))
+    print "{} DCEL took {} seconds.".format(BACKEND, time.time() - ds_start)
+    top_layer = first_layer.ProduceHierarchy(WORKERS, STRATEGY, MAX_DEGREE, top_faces=TOP_FACES, profile=profile)
     print "DS took {} seconds.".format(time.time() - ds_start)
+    if profile is not None:
+        profile.Stop()
+        with open(PROFILE, 'w') as f:
+            json.dump(profile.getReport(), f, indent=1, sort_keys=True)
+        print "Build profile written to {}, cProfile stats to {}.".format(PROFILE, PROFILE + '.prof')
+    report = top_layer.BuildReport()
+    print "Depth {} with {} selection: removal ratios {}".format(
+        report['depth'], STRATEGY, ", ".join("{:.3f}".format(x['ratio']) for x in report['layers']))
+    print "Peak memory: {} KB.".format(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    q_points = [(random.randint(1, BOXSIZE - 1), random.randint(1, BOXSIZE - 1)) for i in range(QUERIES)]
+    counts = trace = CountingTrace()
+    if not BENCHMARKING:
+        import KPDisplay
+        trace = KPDisplay.DisplayTrace(counts)
     queries_start = time.time()
-    for i in range(QUERIES):
+    for i, q_point in enumerate(q_points):
         query_start = time.time()
-        q_point = (random.randint(1, BOXSIZE - 1), random.randint(1, BOXSIZE - 1))
-        print "Query {}: {} contained within: ".format(i, q_point), top_layer.Query(q_point)
+        print "Query {}: {} contained within: ".format(i, q_point), top_layer.Query(q_point, trace)
         print "Query {} took {} seconds.".format(i, time.time() - query_start)
-    print "All {} queries took {} seconds.".format(QUERIES, time.time() - queries_start)
+    queries_time = time.time() - queries_start
+    print "All {} queries took {} seconds.".format(QUERIES, queries_time)
+    print "{} Contains calls, {:.1f} per query; per level from the top: {}.".format(
+        counts.contains_calls_, counts.contains_calls_ / float(max(counts.queries_, 1)), counts.level_calls_)
+
+    freeze_start = time.time()
+    top_layer.Freeze()
+    print "Freeze took {} seconds.".format(time.time() - freeze_start)
+    if INDEX_FILE is not None:
+        top_layer.Freeze().Save(INDEX_FILE)
+    batch_start = time.time()
+    leaves = top_layer.QueryBatch(np.array(q_points))
+    batch_time = time.time() - batch_start
+    if __debug__:
+        for q_point, leaf in zip(q_points, leaves):
+            assert DCEL.Contains(q_point, top_layer.Freeze().getLeafTriangle(leaf))
+    print "Batch of {} queries took {} seconds: {:.0f} queries/s, vs {:.0f} queries/s for the scalar loop.".format(
+        QUERIES, batch_time, QUERIES / max(batch_time, 1e-9), QUERIES / max(queries_time, 1e-9))
@@ -0,0 +1,97 @@
+'''
+Common interface of the point location engines, and the segment view of a subdivision they share.
+
+Every engine is built from a DCEL (Triangled_DCEL or Array_DCEL, so from the same labelled polygons)
+and answers with the DCEL's Face labels:
+    'kirkpatrick'   KirkPatrick.KP_Layer, the Kirkpatrick hierarchy
+    'trapezoid'     Trapezoid.Trapezoid_Map, a randomized incremental trapezoidal map
+    'slab'          Slabs.Slab_Locator, a persistent slab decomposition
+    'walk'          KPWalk.Walk_Locator, a walk from the previous answer, else Kirkpatrick
+    'background'    KPBackground.Background_Locator, a grid scan until Kirkpatrick is built
+Engines agree on every answer, except for a point on the boundary of several faces, where each
+answers one of the faces containing it.
+'''
+import numpy as np
+import DCEL
+from Predicates import Orient
+
+ENGINES = {'kirkpatrick': ('KirkPatrick', 'KP_Layer'), 'trapezoid': ('Trapezoid', 'Trapezoid_Map'),
+           'slab': ('Slabs', 'Slab_Locator'), 'walk': ('KPWalk', 'Walk_Locator'),
+           'background': ('KPBackground', 'Background_Locator')}
+
+
+class PointLocator:
+    'Interface of a point location engine'
+
+    @classmethod
+    def FromDCEL(cls, dcel, **options):
+        'Build the engine over the faces of dcel; options are engine specific'
+        raise NotImplementedError
+
+    def Locate(self, q_point):
+        'Return the Face label of the face containing q_point (2-tuple), None outside every labelled face'
+        raise NotImplementedError
+
+    def QueryBatch(self, points, trace=None):
+        'Locate every row of points ((m, 2) array); returns (m,) array of indices into getLeafLabels(), -1 outside'
+        raise NotImplementedError
+
+    def getLeafLabels(self):
+        'Return the Face labels indexed by QueryBatch results'
+        raise NotImplementedError
+
+
+def Build(engine, dcel, **options):
+    'Build the engine named engine (a key of ENGINES) over dcel'
+    module, name = ENGINES[engine]
+    return getattr(__import__(module), name).FromDCEL(dcel, **options)
+
+
+def FromLabeledPolys(engine, labeled_polys, bbox, **options):
+    'Build the engine named engine over labelled triangles, as taken by DCEL.Triangled_DCEL (any polygons: KPRegions)'
+    return Build(engine, DCEL.Triangled_DCEL(labeled_polys, bbox), **options)
+
+
+def Above(s_p, s_q, t_p, t_q):
+    """Is segment s above segment t where their x ranges overlap? Both run from their lexicographically
+    least endpoint p to their greatest q, and they do not cross; exact, see Predicates.
+    """
+    if t_p <= s_p:
+        return (Orient(t_p, t_q, s_p) or Orient(t_p, t_q, s_q)) > 0
+    return (Orient(s_p, s_q, t_p) or Orient(s_p, s_q, t_q)) < 0
+
+
+class Segments:
+    """Undirected edges of a subdivision, each from its lexicographically least endpoint p to its greatest q,
+    with the faces on either side as indices into leaf_labels_ (-1 for a side not in a labelled face).
+    """
+
+    def __init__(self, labeled_polys):
+        'labeled_polys as DCEL getLabeledPolys(): (label, CounterClockWise vertex coordinates) per face'
+        sides = dict()      # (a, b) -> label of the face left of a -> b
+        self.leaf_labels_ = []
+        for label, verts in labeled_polys:
+            if label is not None:
+                self.leaf_labels_.append(label)
+            for i in range(len(verts)):
+                sides[(verts[i], verts[(i + 1) % len(verts)])] = label
+        leaves = dict((label, i) for i, label in enumerate(self.leaf_labels_))
+        leaves[None] = -1
+
+        ends = sorted(set((min(a, b), max(a, b)) for a, b in sides))
+        points = sorted(set(pt for end in ends for pt in end))
+        ids = dict((pt, i) for i, pt in enumerate(points))
+        self.points_ = points
+        self.coords_ = np.array(points, dtype=np.float64).reshape(-1, 2)
+        self.p_ = np.array([ids[p] for p, q in ends], dtype=np.int32)
+        self.q_ = np.array([ids[q] for p, q in ends], dtype=np.int32)
+        # Left of p -> q is above, left of q -> p below
+        self.above_ = np.array([leaves[sides.get((p, q))] for p, q in ends], dtype=np.int32)
+        self.below_ = np.array([leaves[sides.get((q, p))] for p, q in ends], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.p_)
+
+    def getEnds(self, s):
+        'Endpoint coordinates (p, q) of segment s'
+        return self.points_[self.p_[s]], self.points_[self.q_[s]]
@@ -0,0 +1,150 @@
+'''
+Exact geometric predicates with a floating point filter.
+
+Each predicate is first evaluated in floating point together with a bound on its rounding error
+(Shewchuk's, "Adaptive Precision Floating-Point Arithmetic and Fast Robust Geometric Predicates").
+Only when the result is within that bound of zero is it evaluated again exactly, in integers
+scaled from the binary fractions the coordinates are, so every answer is the exact one at nearly
+floating point cost. The batched forms run the filter over whole arrays in numpy and fall back to
+exact arithmetic for the few uncertain entries.
+'''
+import numpy as np
+
+EPSILON = 2. ** -53
+CCW_BOUND = (3. + 16. * EPSILON) * EPSILON
+INCIRCLE_BOUND = (10. + 96. * EPSILON) * EPSILON
+
+
+def Integers(*values):
+    'The values (ints or floats) as ints, all scaled by one power of two'
+    ratios = [x.as_integer_ratio() if isinstance(x, float) else (int(x), 1) for x in values]
+    scale = max(d for n, d in ratios)
+    return [n * (scale // d) for n, d in ratios]
+
+
+def OrientExact(a, b, c):
+    'Sign of the orientation of a, b, c computed exactly: 1 CounterClockWise, -1 ClockWise, 0 collinear'
+    ax, ay, bx, by, cx, cy = Integers(a[0], a[1], b[0], b[1], c[0], c[1])
+    det = (ax - cx) * (by - cy) - (ay - cy) * (bx - cx)
+    return (det > 0) - (det < 0)
+
+
+def Orient(a, b, c):
+    'Sign of the orientation of a, b, c (2-tuples): 1 CounterClockWise, -1 ClockWise, 0 collinear'
+    left = (a[0] - c[0]) * (b[1] - c[1])
+    right = (a[1] - c[1]) * (b[0] - c[0])
+    det = left - right
+    if abs(det) > CCW_BOUND * (abs(left) + abs(right)):
+        return 1 if det > 0 else -1
+    return OrientExact(a, b, c)
+
+
+def OrientBatch(a, b, c):
+    'Orient over arrays of points ((..., 2) each, broadcast together); returns an int8 array of signs'
+    a, b, c = np.broadcast_arrays(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64),
+                                  np.asarray(c, dtype=np.float64))
+    left = (a[..., 0] - c[..., 0]) * (b[..., 1] - c[..., 1])
+    right = (a[..., 1] - c[..., 1]) * (b[..., 0] - c[..., 0])
+    det = left - right
+    signs = np.sign(det).astype(np.int8)
+    uncertain = np.abs(det) <= CCW_BOUND * (np.abs(left) + np.abs(right))
+    if uncertain.any():
+        flat = signs.reshape(-1)
+        a, b, c = [x.reshape(-1, 2) for x in (a, b, c)]
+        for i in np.flatnonzero(uncertain).tolist():
+            flat[i] = OrientExact(a[i].tolist(), b[i].tolist(), c[i].tolist())
+        signs = flat.reshape(signs.shape)
+    return signs
+
+
+def CCW(a, b, c):
+    """Exact replacement for COS451PS1.CCW: -1 for a left (CounterClockWise) turn, 1 for a right turn,
+    and for collinear points 2 if b lies between a and c, else 0.
+    """
+    sign = Orient(a, b, c)
+    if sign:
+        return -sign
+    if min(a[0], c[0]) <= b[0] <= max(a[0], c[0]) and min(a[1], c[1]) <= b[1] <= max(a[1], c[1]):
+        return 2
+    return 0
+
+
+def Contains(point, poly):
+    'Is point (2-tuple) not outside convex poly (list of 2-tuples, either orientation)?'
+    seen = 0
+    for i in range(len(poly)):
+        sign = Orient(poly[i - 1], poly[i], point)
+        if sign:
+            if seen == -sign:
+                return False
+            seen = sign
+    if seen == 0:   # Flat poly, with point on its line
+        return all(min(x[j] for x in poly) <= point[j] <= max(x[j] for x in poly) for j in range(2))
+    return True
+
+
+def ContainsBatch(points, tris):
+    """Contains for many (point, triangle) pairs at once.
+    points is a (..., 2) array and tris a (..., 3, 2) array broadcast against it; returns a bool array.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    tris = np.asarray(tris, dtype=np.float64)
+    px, py = points[..., 0], points[..., 1]
+    # One static error bound for the whole batch, from the largest coordinate difference in it
+    span = max(tris.max(), points.max()) - min(tris.min(), points.min()) if tris.size and points.size else 0.
+    bound = CCW_BOUND * 2.01 * span * span   # 2 products of at most span squared, with slack for rounding
+    pos = neg = False
+    for i in range(3):
+        a, b = tris[..., i, :], tris[..., (i + 1) % 3, :]
+        det = (a[..., 0] - px) * (b[..., 1] - py) - (a[..., 1] - py) * (b[..., 0] - px)
+        if (np.abs(det) <= bound).any():     # Rare: settle those signs exactly
+            det = OrientBatch(a, b, points).astype(np.float64)
+        pos = pos | (det > 0)
+        neg = neg | (det < 0)
+    flat = ~(pos | neg)     # Flat triangle, with the point on its line
+    if flat.any():
+        within = (points >= tris.min(axis=-2)) & (points <= tris.max(axis=-2))
+        return ~(pos & neg) & (~flat | within.all(axis=-1))
+    return ~(pos & neg)
+
+
+def EarTests(v_pt, ring):
+    """For every corner i of the star-polygon ring (CCW list of 2-tuples) around v_pt, in one evaluation:
+    the CCW turn code of ring[i - 1], ring[i], ring[i + 1], and whether the ear cut there is blocked
+    because it holds v_pt other than on its cutting diagonal. Returns (turns, blocked) lists.
+    """
+    corners = np.asarray(ring, dtype=np.float64)
+    prev = np.roll(corners, 1, axis=0)
+    nxt = np.roll(corners, -1, axis=0)
+    turns = -OrientBatch(prev, corners, nxt).astype(np.int64)
+    for i in np.flatnonzero(turns == 0).tolist():
+        turns[i] = CCW(ring[i - 1], ring[i], ring[(i + 1) % len(ring)])
+    blocked = ContainsBatch(np.asarray(v_pt, dtype=np.float64), np.stack([prev, corners, nxt], axis=1)) & \
+        (OrientBatch(prev, nxt, np.asarray(v_pt, dtype=np.float64)) != 0)
+    return turns.tolist(), blocked.tolist()
+
+
+def InCircleExact(a, b, c, d):
+    'Sign of the InCircle determinant computed exactly'
+    ax, ay, bx, by, cx, cy, dx, dy = Integers(a[0], a[1], b[0], b[1], c[0], c[1], d[0], d[1])
+    adx, ady, bdx, bdy, cdx, cdy = ax - dx, ay - dy, bx - dx, by - dy, cx - dx, cy - dy
+    det = (adx * adx + ady * ady) * (bdx * cdy - cdx * bdy) + \
+        (bdx * bdx + bdy * bdy) * (cdx * ady - adx * cdy) + \
+        (cdx * cdx + cdy * cdy) * (adx * bdy - bdx * ady)
+    return (det > 0) - (det < 0)
+
+
+def InCircle(a, b, c, d):
+    'Sign of the position of d against the circumcircle of CounterClockWise a, b, c: 1 inside, -1 outside, 0 on'
+    adx, ady = a[0] - d[0], a[1] - d[1]
+    bdx, bdy = b[0] - d[0], b[1] - d[1]
+    cdx, cdy = c[0] - d[0], c[1] - d[1]
+    alift = adx * adx + ady * ady
+    blift = bdx * bdx + bdy * bdy
+    clift = cdx * cdx + cdy * cdy
+    det = alift * (bdx * cdy - cdx * bdy) + blift * (cdx * ady - adx * cdy) + clift * (adx * bdy - bdx * ady)
+    permanent = alift * (abs(bdx * cdy) + abs(cdx * bdy)) + blift * (abs(cdx * ady) + abs(adx * cdy)) + \
+        clift * (abs(adx * bdy) + abs(bdx * ady))
+    if abs(det) > INCIRCLE_BOUND * permanent:
+        return 1 if det > 0 else -1
+    return InCircleExact(a, b, c, d)
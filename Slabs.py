@@ -0,0 +1,191 @@
+'''
+Persistent slab decomposition for point location.
+
+The vertical lines through every vertex cut the plane into slabs, and within a slab the edges
+crossing it are totally ordered bottom to top. Sweeping left to right, one treap of those edges
+is updated at each vertex line; updates copy only the nodes on their search paths, so every
+slab keeps its own version of the tree (its root in roots_) in O(n log n) nodes overall, rather
+than the O(n^2) of one sorted edge list per slab. A query finds its slab with bisect (or
+numpy searchsorted for a batch) and walks down that version to the lowest edge above it.
+'''
+import array
+import bisect
+import random
+import numpy as np
+import PointLocator
+from Predicates import Orient, OrientBatch
+
+
+class Slab_Locator(PointLocator.PointLocator):
+    'Persistent slab decomposition over the edges of a subdivision'
+
+    @classmethod
+    def FromDCEL(cls, dcel, seed=None):
+        return cls(PointLocator.Segments(dcel.getLabeledPolys()), seed)
+
+    def __init__(self, segments, seed=None):
+        """segments: PointLocator.Segments of the subdivision
+        seed: seeds the treap priorities, so a rebuild makes the same trees
+        """
+        self.segments_ = segments
+        coords = segments.coords_
+        self.xs_ = np.unique(coords[:, 0])
+        self.xs_list_ = self.xs_.tolist()
+        p, q = segments.p_, segments.q_
+        spans = np.flatnonzero(coords[p, 0] < coords[q, 0])     # Vertical edges cross no slab
+        rng = random.Random(seed)
+        self.priority_ = [rng.random() for s in range(len(segments))]
+        self.ends_ = [segments.getEnds(s) for s in range(len(segments))]
+
+        # Nodes of every version, as parallel arrays; nodes from fresh_ on belong to the version being built
+        self.edge_ = array.array('i')
+        self.left_ = array.array('i')
+        self.right_ = array.array('i')
+        self.fresh_ = 0
+        starts = np.searchsorted(self.xs_, coords[p[spans], 0])
+        stops = np.searchsorted(self.xs_, coords[q[spans], 0])
+        order = np.argsort(starts, kind='mergesort')
+        start_off = np.searchsorted(starts[order], np.arange(len(self.xs_) + 1))
+        inserts = spans[order].tolist()
+        order = np.argsort(stops, kind='mergesort')
+        stop_off = np.searchsorted(stops[order], np.arange(len(self.xs_) + 1))
+        removes = spans[order].tolist()
+
+        roots = []
+        root = -1
+        for i in range(len(self.xs_) - 1):
+            self.fresh_ = len(self.edge_)
+            for s in removes[stop_off[i]:stop_off[i + 1]]:
+                root = self.Remove(root, s)
+            for s in inserts[start_off[i]:start_off[i + 1]]:
+                root = self.Insert(root, s)
+            roots.append(root)
+        self.roots_ = np.array(roots, dtype=np.int32)
+        self.roots_list_ = roots
+
+        # Views of the node arrays for batches; nothing is appended to them after the sweep
+        self.edge_np_, self.left_np_, self.right_np_ = [np.frombuffer(x, dtype=np.int32) if len(x) else
+                                                        np.zeros(0, dtype=np.int32)
+                                                        for x in (self.edge_, self.left_, self.right_)]
+
+    def getNodeCount(self):
+        return len(self.edge_)
+
+    def NewNode(self, s, left, right):
+        self.edge_.append(s)
+        self.left_.append(left)
+        self.right_.append(right)
+        return len(self.edge_) - 1
+
+    def Own(self, node):
+        'node itself if it belongs to the version being built, else a copy of it that does'
+        if node >= self.fresh_:
+            return node
+        return self.NewNode(self.edge_[node], self.left_[node], self.right_[node])
+
+    def Above(self, s, t):
+        return PointLocator.Above(self.ends_[s][0], self.ends_[s][1], self.ends_[t][0], self.ends_[t][1])
+
+    def Insert(self, node, s):
+        'Return the root of the subtree at node with segment s added'
+        if node < 0:
+            return self.NewNode(s, -1, -1)
+        node = self.Own(node)
+        if self.Above(s, self.edge_[node]):
+            child = self.Insert(self.right_[node], s)
+            self.right_[node] = child
+            if self.priority_[self.edge_[child]] > self.priority_[self.edge_[node]]:
+                self.right_[node] = self.left_[child]
+                self.left_[child] = node
+                return child
+        else:
+            child = self.Insert(self.left_[node], s)
+            self.left_[node] = child
+            if self.priority_[self.edge_[child]] > self.priority_[self.edge_[node]]:
+                self.left_[node] = self.right_[child]
+                self.right_[child] = node
+                return child
+        return node
+
+    def Remove(self, node, s):
+        'Return the root of the subtree at node with segment s taken out'
+        if node < 0:
+            raise ValueError("Segment {} is not in the slab.".format(self.ends_[s]))
+        if self.edge_[node] == s:
+            return self.Merge(self.left_[node], self.right_[node])
+        node = self.Own(node)
+        if self.Above(s, self.edge_[node]):
+            self.right_[node] = self.Remove(self.right_[node], s)
+        else:
+            self.left_[node] = self.Remove(self.left_[node], s)
+        return node
+
+    def Merge(self, low, high):
+        'Join two subtrees, every segment of low below every segment of high'
+        if low < 0:
+            return high
+        if high < 0:
+            return low
+        if self.priority_[self.edge_[low]] > self.priority_[self.edge_[high]]:
+            low = self.Own(low)
+            self.right_[low] = self.Merge(self.right_[low], high)
+            return low
+        high = self.Own(high)
+        self.left_[high] = self.Merge(low, self.left_[high])
+        return high
+
+    def Slab(self, x):
+        'Slab holding x, -1 outside them all; the rightmost line belongs to the last slab'
+        i = bisect.bisect_right(self.xs_list_, x) - 1
+        if x == self.xs_list_[-1]:
+            i -= 1
+        return i if i < len(self.roots_list_) else -1
+
+    def Locate(self, q_point):
+        slab = self.Slab(q_point[0])
+        if slab < 0:
+            return None
+        node = self.roots_list_[slab]
+        best = -1   # Lowest segment not below q_point
+        while node >= 0:
+            s = self.edge_[node]
+            # On s with nothing labelled below it: the face above s holds q_point
+            if (Orient(self.ends_[s][0], self.ends_[s][1], q_point) or (self.segments_.below_[s] < 0)) > 0:
+                node = self.right_[node]
+            else:
+                best = s
+                node = self.left_[node]
+        if best < 0 or self.segments_.below_[best] < 0:
+            return None
+        return self.segments_.leaf_labels_[self.segments_.below_[best]]
+
+    def QueryBatch(self, points, trace=None):
+        """As Locate for every row of points ((m, 2) array), descending all their versions at once.
+        Returns (m,) array of indices into getLeafLabels(), -1 outside; trace sees each round as a level.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        slab = np.searchsorted(self.xs_, points[:, 0], side='right') - 1
+        slab[points[:, 0] == self.xs_[-1]] -= 1
+        inside = (slab >= 0) & (slab < len(self.roots_))
+        node = np.full(len(points), -1, dtype=np.int32)
+        node[inside] = self.roots_[slab[inside]]
+        best = np.full(len(points), -1, dtype=np.int32)
+        coords = self.segments_.coords_
+        level = 0
+        while True:
+            active = np.flatnonzero(node >= 0)
+            if trace is not None:
+                trace.OnBatchRound(level, len(active), len(active))
+            if not len(active):
+                break
+            n = node[active]
+            s = self.edge_np_[n]
+            side = OrientBatch(coords[self.segments_.p_[s]], coords[self.segments_.q_[s]], points[active])
+            above = (side > 0) | ((side == 0) & (self.segments_.below_[s] < 0))
+            best[active] = np.where(above, best[active], s)
+            node[active] = np.where(above, self.right_np_[n], self.left_np_[n])
+            level += 1
+        return np.where(best >= 0, self.segments_.below_[np.maximum(best, 0)], -1).astype(np.int32)
+
+    def getLeafLabels(self):
+        return self.segments_.leaf_labels_
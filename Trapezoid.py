@@ -0,0 +1,211 @@
+'''
+Randomized incremental trapezoidal map for point location (de Berg et al., Computational Geometry, ch. 6).
+
+The edges of the subdivision are added in random order. Each splits the trapezoids it crosses
+into the parts above and below it, merging parts no longer walled off from each other, and the
+search DAG's leaves for the old trapezoids become the tests that choose among the new ones.
+Points sharing an x coordinate are ordered by y (a symbolic shear), so vertical edges need no
+special case. The trapezoids an edge crosses are found by descending the DAG again at each wall
+rather than through neighbour pointers, which keeps the map to top, bottom, leftp and rightp.
+Once built, the DAG is flattened into arrays, so a batch of queries descends it together in numpy.
+'''
+import random
+import numpy as np
+import PointLocator
+from Predicates import Orient, OrientBatch
+
+LEAF, X_NODE, Y_NODE = 0, 1, 2
+
+
+class Trapezoid(object):
+    'Region between segments top_ and bottom_, and the walls through points leftp_ and rightp_'
+    __slots__ = ['top_', 'bottom_', 'leftp_', 'rightp_', 'node_']
+
+    def __init__(self, top, bottom, leftp, rightp):
+        self.top_ = top
+        self.bottom_ = bottom
+        self.leftp_ = leftp
+        self.rightp_ = rightp
+        self.node_ = Node(LEAF, self)
+
+
+class Node(object):
+    """Search DAG node: an X_NODE tests against the wall through point key_, a Y_NODE against segment key_,
+    and a LEAF holds Trapezoid key_. left_ is the left of or below branch, right_ the right of or above one.
+    """
+    __slots__ = ['kind_', 'key_', 'left_', 'right_']
+
+    def __init__(self, kind, key, left=None, right=None):
+        self.kind_ = kind
+        self.key_ = key
+        self.left_ = left
+        self.right_ = right
+
+
+class Trapezoid_Map(PointLocator.PointLocator):
+    'Trapezoidal map with its search DAG, over the edges of a subdivision'
+
+    @classmethod
+    def FromDCEL(cls, dcel, seed=None):
+        return cls(PointLocator.Segments(dcel.getLabeledPolys()), seed)
+
+    def __init__(self, segments, seed=None):
+        """segments: PointLocator.Segments of the subdivision
+        seed: seeds the insertion order, so a rebuild makes the same map
+        """
+        self.segments_ = segments
+        self.ends_ = [segments.getEnds(s) for s in range(len(segments))]
+        lo = (segments.coords_.min(axis=0) - 1).tolist()
+        hi = (segments.coords_.max(axis=0) + 1).tolist()
+        # Frame segments below and above everything, with no face on either side
+        bottom = len(self.ends_)
+        self.ends_.append(((lo[0], lo[1]), (hi[0], lo[1])))
+        self.ends_.append(((lo[0], hi[1]), (hi[0], hi[1])))
+        self.faces_ = segments.below_.tolist() + [-1, -1]   # Leaf index of the face below each segment
+        self.root_ = Trapezoid(bottom + 1, bottom, (lo[0], lo[1]), (hi[0], hi[1])).node_
+
+        order = range(len(segments))
+        random.Random(seed).shuffle(order)
+        for s in order:
+            self.Add(s)
+        self.Flatten()
+
+    def Find(self, s, wall):
+        'Trapezoid segment s crosses just right of the wall through point wall'
+        node = self.root_
+        while node.kind_ != LEAF:
+            if node.kind_ == X_NODE:
+                node = node.right_ if node.key_ <= wall else node.left_
+            else:
+                t = self.ends_[node.key_]
+                above = PointLocator.Above(self.ends_[s][0], self.ends_[s][1], t[0], t[1])
+                node = node.right_ if above else node.left_
+        return node.key_
+
+    def Add(self, s):
+        'Split the trapezoids segment s crosses, and grow the DAG below their leaves'
+        p, q = self.ends_[s]
+        crossed = [self.Find(s, p)]
+        while crossed[-1].rightp_ < q:
+            crossed.append(self.Find(s, crossed[-1].rightp_))
+
+        first, last = crossed[0], crossed[-1]
+        left = Trapezoid(first.top_, first.bottom_, first.leftp_, p) if first.leftp_ < p else None
+        right = Trapezoid(last.top_, last.bottom_, q, last.rightp_) if q < last.rightp_ else None
+        # Parts above and below s, merged across every wall s passes on the other side
+        upper = Trapezoid(first.top_, s, p, q)
+        lower = Trapezoid(s, first.bottom_, p, q)
+        for j, trap in enumerate(crossed):
+            node = trap.node_
+            sub = Node(Y_NODE, s, lower.node_, upper.node_)
+            if trap is last and right is not None:
+                sub = Node(X_NODE, q, sub, right.node_)
+            if j == 0 and left is not None:
+                sub = Node(X_NODE, p, left.node_, sub)
+            node.kind_, node.key_, node.left_, node.right_ = sub.kind_, sub.key_, sub.left_, sub.right_
+
+            if trap is not last:
+                wall = trap.rightp_
+                side = Orient(p, q, wall)
+                if side > 0:
+                    upper.rightp_ = wall
+                    upper = Trapezoid(crossed[j + 1].top_, s, wall, q)
+                elif side < 0:
+                    lower.rightp_ = wall
+                    lower = Trapezoid(s, crossed[j + 1].bottom_, wall, q)
+                else:
+                    raise ValueError("Vertex {} lies inside edge {}.".format(wall, (p, q)))
+
+    def Flatten(self):
+        'Number the DAG nodes into parallel arrays, and drop the node objects'
+        ids = {id(self.root_): 0}
+        nodes = [self.root_]
+        for node in nodes:      # Grows as it goes
+            for child in (node.left_, node.right_):
+                if child is not None and id(child) not in ids:
+                    ids[id(child)] = len(nodes)
+                    nodes.append(child)
+        self.kind_ = [node.kind_ for node in nodes]
+        self.left_ = [ids[id(node.left_)] if node.left_ is not None else -1 for node in nodes]
+        self.right_ = [ids[id(node.right_)] if node.right_ is not None else -1 for node in nodes]
+        # X_NODE: its point; Y_NODE: its segment; LEAF: leaf index of its face, -1 outside
+        self.key_ = [node.key_ if node.kind_ != LEAF else self.faces_[node.key_.top_] for node in nodes]
+        self.root_ = None
+
+        self.kind_np_ = np.array(self.kind_, dtype=np.int8)
+        self.left_np_ = np.array(self.left_, dtype=np.int32)
+        self.right_np_ = np.array(self.right_, dtype=np.int32)
+        points = [key if kind == X_NODE else (0., 0.) for kind, key in zip(self.kind_, self.key_)]
+        self.point_np_ = np.array(points, dtype=np.float64).reshape(-1, 2)
+        self.key_np_ = np.array([key if kind != X_NODE else -1 for kind, key in zip(self.kind_, self.key_)],
+                                dtype=np.int32)
+        self.ends_np_ = np.array(self.ends_, dtype=np.float64).reshape(-1, 2, 2)
+        self.faces_np_ = np.array(self.faces_, dtype=np.int32)
+
+    def getNodeCount(self):
+        return len(self.kind_)
+
+    def Descend(self, q_point, node=0, tie_right=True):
+        """Leaf of the DAG below node holding q_point (2-tuple), and the left branch of the last X_NODE
+        at q_point itself (-1 if none). q_point goes right of its own wall, or left without tie_right.
+        """
+        kind, key = self.kind_, self.key_
+        tie = -1
+        while kind[node] != LEAF:
+            if kind[node] == X_NODE:
+                if key[node] == q_point:
+                    tie = self.left_[node]
+                    node = self.right_[node] if tie_right else tie
+                else:
+                    node = self.right_[node] if key[node] < q_point else self.left_[node]
+            else:
+                t = self.ends_[key[node]]
+                side = Orient(t[0], t[1], q_point) or (self.faces_[key[node]] < 0)  # On t: take a labelled side
+                node = self.right_[node] if side > 0 else self.left_[node]
+        return node, tie
+
+    def Locate(self, q_point):
+        q_point = tuple(q_point)
+        node, tie = self.Descend(q_point)
+        if self.key_[node] < 0 and tie >= 0:    # A vertex with nothing labelled to its right
+            node = self.Descend(q_point, tie, False)[0]
+        return None if self.key_[node] < 0 else self.segments_.leaf_labels_[self.key_[node]]
+
+    def DescendBatch(self, points, node, tie_right=True, trace=None):
+        'Descend for every row of points ((m, 2) array) together, from the nodes node; returns (leaves, ties)'
+        tie = np.full(len(points), -1, dtype=np.int32)
+        level = 0
+        while True:
+            active = np.flatnonzero(self.kind_np_[node] != LEAF)
+            if trace is not None:
+                trace.OnBatchRound(level, len(active), len(active))
+            if not len(active):
+                return node, tie
+            n = node[active]
+            q = points[active]
+            right = np.empty(len(active), dtype=bool)
+            x = np.flatnonzero(self.kind_np_[n] == X_NODE)
+            key = self.point_np_[n[x]]
+            at = (key[:, 0] == q[x, 0]) & (key[:, 1] == q[x, 1])
+            right[x] = (key[:, 0] < q[x, 0]) | ((key[:, 0] == q[x, 0]) & (key[:, 1] < q[x, 1])) | (at & tie_right)
+            tie[active[x[at]]] = self.left_np_[n[x[at]]]
+            y = np.flatnonzero(self.kind_np_[n] == Y_NODE)
+            seg = self.key_np_[n[y]]
+            side = OrientBatch(self.ends_np_[seg, 0], self.ends_np_[seg, 1], q[y])
+            right[y] = (side > 0) | ((side == 0) & (self.faces_np_[seg] < 0))
+            node[active] = np.where(right, self.right_np_[n], self.left_np_[n])
+            level += 1
+
+    def QueryBatch(self, points, trace=None):
+        """As Locate for every row of points ((m, 2) array), descending the DAG together.
+        Returns (m,) array of indices into getLeafLabels(), -1 outside; trace sees each round as a level.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        node, tie = self.DescendBatch(points, np.zeros(len(points), dtype=np.int32), True, trace)
+        retry = np.flatnonzero((self.key_np_[node] < 0) & (tie >= 0))
+        if len(retry):
+            node[retry] = self.DescendBatch(points[retry], tie[retry], False)[0]
+        return self.key_np_[node]
+
+    def getLeafLabels(self):
+        return self.segments_.leaf_labels_
@@ -0,0 +1,68 @@
+'''
+Shared inputs for the tests: seeded sites in KirkPatrick's box, their Delaunay triangulation built
+into either DCEL backend, query points, and brute force answers to check the engines against.
+Run the tests from the repository root:
+
+    python -m unittest discover -s tests -t .
+'''
+import numpy as np
+from scipy.spatial import Delaunay
+import DCEL
+import KirkPatrick
+
+BACKENDS = [DCEL.Triangled_DCEL, DCEL.Array_DCEL]
+SEED = 451
+
+
+def Sites(n=150, seed=SEED, grid=None):
+    """n seeded sites strictly inside KirkPatrick.BBOX, as an (m, 2) array with the box corners first.
+    grid, if given, snaps the sites to multiples of it, so that many are collinear or cocircular.
+    """
+    rng = np.random.RandomState(seed)
+    sites = rng.uniform(1, KirkPatrick.BOXSIZE - 1, size=(n, 2))
+    sites = np.round(sites / grid) * grid if grid is not None else sites.round(3)
+    sites = [pt for pt in map(tuple, sites.tolist()) if 0 < min(pt) and max(pt) < KirkPatrick.BOXSIZE]
+    return np.array(list(KirkPatrick.BBOX) + sorted(set(sites)), dtype=np.float64)
+
+
+def Triangulation(points):
+    'Delaunay simplices and neighbors of points, every point kept'
+    tri = Delaunay(points, qhull_options="Qbb Qc Qz")
+    assert len(tri.coplanar) == 0
+    return tri.simplices, tri.neighbors
+
+
+def Build(backend, n=150, seed=SEED, compact=False, grid=None):
+    'DCEL of the Delaunay triangulation of Sites(n, seed, grid) with the box'
+    points = Sites(n, seed, grid)
+    simplices, neighbors = Triangulation(points)
+    return backend.FromTriangles(points, simplices, neighbors, KirkPatrick.BBOX, compact=compact)
+
+
+def Queries(n=500, seed=SEED, dcel=None):
+    """n seeded query points over and around the box (some outside it); with dcel, also its vertices
+    and the midpoints of its triangle sides, where point location is degenerate.
+    """
+    rng = np.random.RandomState([seed, 1])
+    points = rng.uniform(-20, KirkPatrick.BOXSIZE + 20, size=(n, 2)).tolist()
+    if dcel is not None:
+        table = dcel.getTable()
+        for label in sorted(f for f in dcel.getFaceLabels() if f is not None)[:50]:
+            corners = DCEL.Corners(label, table)
+            points += [list(corners[0]), [(corners[0][0] + corners[1][0]) / 2., (corners[0][1] + corners[1][1]) / 2.]]
+    return np.array(points, dtype=np.float64)
+
+
+def Containing(dcel, q_point):
+    'Set of the Face labels of dcel whose triangles contain q_point, by testing every one'
+    table = dcel.getTable()
+    return set(f for f in dcel.getFaceLabels() if f is not None and DCEL.Contains(q_point, DCEL.Corners(f, table)))
+
+
+def Polygons(dcel):
+    'Labelled faces of dcel by label, each as its corners rotated to start at the least, for comparisons'
+    polys = {}
+    for label, verts in dcel.getLabeledPolys():
+        first = verts.index(min(verts))
+        polys[label] = tuple(verts[first:] + verts[:first])
+    return polys
@@ -0,0 +1,67 @@
+import unittest
+import DCEL
+import KirkPatrick
+from tests import Fixtures
+
+
+class Array_DCEL_Test(unittest.TestCase):
+    'Array_DCEL against Triangled_DCEL over the same triangles'
+
+    def setUp(self):
+        self.dcels = [Fixtures.Build(backend, 80) for backend in Fixtures.BACKENDS]
+
+    def Coords(self, dcel, verts):
+        return set(dcel.getCoords(v) for v in verts)
+
+    def testSameGraph(self):
+        objects, arrays = self.dcels
+        self.assertEqual(Fixtures.Polygons(objects), Fixtures.Polygons(arrays))
+        self.assertEqual(self.Coords(objects, objects.getBox()), set(KirkPatrick.BBOX))
+        self.assertEqual(self.Coords(arrays, arrays.getBox()), set(KirkPatrick.BBOX))
+        for v in objects.getVertices():
+            w = arrays.getVertex(objects.getCoords(v))
+            self.assertEqual(objects.getDegree(v), arrays.getDegree(w))
+            self.assertEqual(self.Coords(objects, objects.getNeighbors(v)), self.Coords(arrays, arrays.getNeighbors(w)))
+
+    def testStarIsCounterClockWise(self):
+        arrays = self.dcels[1]
+        for v in arrays.getVertices() - arrays.getBox():
+            ring = [arrays.getCoords(w) for w in arrays.getStar(v)[1]]
+            for a, b in zip(ring, ring[1:] + ring[:1]):
+                self.assertEqual(DCEL.Predicates.Orient(arrays.getCoords(v), a, b), 1)
+
+    def Area(self, tri):
+        (ax, ay), (bx, by), (cx, cy) = tri
+        return abs((bx - ax) * (cy - ay) - (by - ay) * (cx - ax)) / 2.
+
+    def testRemovalMatches(self):
+        objects, arrays = [dcel.Copy() for dcel in self.dcels]
+        for pt in sorted(objects.getCoords(v) for v in objects.getVertices() - objects.getBox())[::7]:
+            for dcel in (objects, arrays):
+                links = dcel.removeInteriorVertex(dcel.getVertex(pt))
+                old = set(f for linked in links.itervalues() for f in linked)
+                # The hole's retriangulation covers exactly the faces it replaced, each linked to those it overlaps
+                self.assertAlmostEqual(sum(map(self.Area, links)), sum(map(self.Area, old)), 6)
+                for new, linked in links.iteritems():
+                    self.assertTrue(all(DCEL.Overlaps(new, f) for f in linked))
+                self.assertIsNone(dcel.getVertex(pt))
+        self.assertEqual(self.Coords(objects, objects.getVertices()), self.Coords(arrays, arrays.getVertices()))
+        self.assertEqual(len(objects.getFaceLabels()), len(arrays.getFaceLabels()))
+        arrays.Validate()
+        # The originals are untouched by their copies' removals
+        self.assertEqual(Fixtures.Polygons(self.dcels[0]), Fixtures.Polygons(self.dcels[1]))
+        self.assertGreater(len(self.dcels[1].getVertices()), len(arrays.getVertices()))
+
+    def testBoxIsKept(self):
+        arrays = self.dcels[1]
+        self.assertRaises(Exception, arrays.removeInteriorVertex, next(iter(arrays.getBox())))
+
+    def testFromLabeledPolys(self):
+        polys = self.dcels[0].getLabeledPolys()
+        labelled = [x for x in polys if x[0] is not None]
+        arrays = DCEL.Array_DCEL(labelled, KirkPatrick.BBOX)
+        self.assertEqual(Fixtures.Polygons(arrays), Fixtures.Polygons(self.dcels[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import threading
+import DCEL
+import KPBackground
+import PointLocator
+from tests import Fixtures
+
+
+class Background_Locator_Test(unittest.TestCase):
+    'The grid fallback, and its swap for the hierarchy once built'
+
+    def setUp(self):
+        self.gate_ = threading.Event()
+        self.build_ = PointLocator.Build
+
+        def GatedBuild(engine, dcel, **options):
+            self.gate_.wait()
+            return self.build_(engine, dcel, **options)
+        KPBackground.PointLocator.Build = GatedBuild     # Hold the build until the test opens the gate
+
+    def tearDown(self):
+        self.gate_.set()
+        KPBackground.PointLocator.Build = self.build_
+
+    def assertAnswers(self, locator, dcel, queries):
+        leaves = locator.getLeafLabels()
+        for q_point, leaf in zip(map(tuple, queries.tolist()), locator.QueryBatch(queries).tolist()):
+            containing = Fixtures.Containing(dcel, q_point)
+            if containing:
+                self.assertIn(locator.Locate(q_point), containing)
+                self.assertIn(leaves[leaf], containing)
+            else:
+                self.assertIsNone(locator.Locate(q_point))
+                self.assertEqual(leaf, -1)
+
+    def testGrid(self):
+        for backend in Fixtures.BACKENDS:
+            dcel = Fixtures.Build(backend, 200)
+            queries = Fixtures.Queries(300, dcel=dcel)
+            for grid_size in (None, 1, 7):
+                self.assertAnswers(KPBackground.Grid_Locator.FromDCEL(dcel, grid_size), dcel, queries)
+
+    def testSwap(self):
+        for backend in Fixtures.BACKENDS:
+            self.gate_.clear()
+            dcel = Fixtures.Build(backend, 200)
+            queries = Fixtures.Queries(200, dcel=dcel)
+            locator = KPBackground.Background_Locator(dcel, seed=2)
+            self.assertFalse(locator.Wait(0.01))
+            self.assertIsNone(locator.getHierarchy())
+            self.assertAnswers(locator, dcel, queries)
+            stats = locator.getStats()
+            self.assertEqual((stats['live'], stats['switch_seconds'], stats['hierarchy_queries']),
+                             ('fallback', None, 0))
+            self.assertEqual(stats['fallback_queries'], 2 * len(queries))
+            self.assertIsNotNone(stats['first_answer_seconds'])
+
+            self.gate_.set()
+            self.assertTrue(locator.Wait())
+            self.assertIsNotNone(locator.getHierarchy())
+            self.assertAnswers(locator, dcel, queries)
+            stats = locator.getStats()
+            self.assertEqual(stats['live'], 'hierarchy')
+            self.assertEqual(stats['hierarchy_queries'], 2 * len(queries))
+            self.assertGreaterEqual(stats['switch_seconds'], stats['first_answer_seconds'])
+            self.assertIsNone(stats['error'])
+
+    def testBuildError(self):
+        self.gate_.set()
+        dcel = Fixtures.Build(DCEL.Array_DCEL, 100)
+        locator = KPBackground.Background_Locator(dcel, strategy='no such strategy')
+        self.assertRaises(ValueError, locator.Wait)
+        self.assertFalse(locator.isReady())
+        self.assertIsNotNone(locator.getStats()['error'])
+        self.assertAnswers(locator, dcel, Fixtures.Queries(100))   # Still answering from the grid
+
+
+if __name__ == '__main__':
+    unittest.main()
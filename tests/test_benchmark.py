@@ -0,0 +1,65 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import Benchmark
+import KirkPatrick
+
+
+class Benchmark_Test(unittest.TestCase):
+    'Seeded inputs, single runs, sweeps and engine choice of the benchmark'
+
+    def setUp(self):
+        self.saved = Benchmark.SINGLE_QUERIES, Benchmark.BATCH_QUERIES
+        Benchmark.SINGLE_QUERIES, Benchmark.BATCH_QUERIES = 20, 2000
+
+    def tearDown(self):
+        Benchmark.SINGLE_QUERIES, Benchmark.BATCH_QUERIES = self.saved
+
+    def testGenerators(self):
+        for name, generator in Benchmark.GENERATORS.iteritems():
+            sites = generator(500, np.random.RandomState(1))
+            self.assertTrue(len(sites) > 0 and sites.shape[1] == 2, name)
+            self.assertTrue(((sites >= 1) & (sites <= KirkPatrick.BOXSIZE - 1)).all(), name)
+            self.assertTrue(np.array_equal(sites, generator(500, np.random.RandomState(1))), name)
+
+    def testRun(self):
+        for backend in Benchmark.BACKENDS:
+            result = Benchmark.Run('uniform', 100, backend, top_faces='auto')
+            for key in ['dcel_seconds', 'build_seconds', 'depth', 'batch_queries_per_second', 'peak_rss_kb',
+                        'single_query_seconds', 'top_layer_faces']:
+                self.assertIn(key, result)
+            self.assertEqual((result['backend'], result['sites'], result['top_faces']), (backend, 100, 'auto'))
+            json.dumps(result)
+
+    def testChoose(self):
+        runs = [{'distribution': 'uniform', 'sites': 10, 'backend': 'array', 'engine': 'slab',
+                 'batch_queries_per_second': 5.},
+                {'distribution': 'uniform', 'sites': 10, 'backend': 'array', 'engine': 'kirkpatrick',
+                 'top_faces': 64, 'batch_queries_per_second': 7.},
+                {'distribution': 'uniform', 'sites': 10, 'backend': 'array', 'engine': 'walk', 'error': ['boom']}]
+        self.assertEqual(Benchmark.Choose(runs), {'uniform 10 array': 'kirkpatrick top_faces=64'})
+        self.assertEqual(Benchmark.Variant(runs[0]), 'slab')
+
+    def testTopFaces(self):
+        self.assertEqual(map(Benchmark.TopFaces, ['none', 'auto', '64']), [None, 'auto', 64])
+
+    def testSweep(self):
+        folder = tempfile.mkdtemp()
+        try:
+            output = os.path.join(folder, 'bench.json')
+            Benchmark.Sweep([100], ['clustered'], Benchmark.BACKENDS, output=output)
+            with open(output) as f:
+                report = json.load(f)
+            self.assertEqual(len(report['runs']), len(Benchmark.BACKENDS))
+            self.assertTrue(all('error' not in run for run in report['runs']))
+            self.assertEqual(report['choices'], dict(('clustered 100 {}'.format(backend), 'kirkpatrick')
+                                                     for backend in Benchmark.BACKENDS))
+        finally:
+            shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    unittest.main()
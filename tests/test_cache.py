@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+import DCEL
+import KPCache
+import KirkPatrick
+from tests import Fixtures
+
+
+class Coherent_Locator_Test(unittest.TestCase):
+    'The LRU and leaf grid in front of the frozen index'
+
+    def setUp(self):
+        self.dcel = Fixtures.Build(DCEL.Array_DCEL, 200)
+        self.top = KirkPatrick.KP_Layer.FromDCEL(self.dcel)
+        self.index = self.top.Freeze()
+
+    def Track(self, n=500):
+        'A random walk of small steps, as a GPS track'
+        rng = np.random.RandomState(5)
+        return np.clip(300. + np.cumsum(rng.normal(scale=2., size=(n, 2)), axis=0), -10, KirkPatrick.BOXSIZE + 10)
+
+    def Check(self, points, leaves):
+        for q_point, leaf in zip(map(tuple, points.tolist()), leaves.tolist()):
+            containing = Fixtures.Containing(self.dcel, q_point)
+            if containing:
+                self.assertIn(self.index.getLeafLabels()[leaf], containing)
+            else:
+                self.assertEqual(leaf, -1)
+
+    def testAnswers(self):
+        locator = self.top.Accelerate()
+        for points in (self.Track(), Fixtures.Queries(300, dcel=self.dcel)):
+            self.Check(points, locator.QueryStream(points))
+
+    def testCoherentStreamsHit(self):
+        locator = self.top.Accelerate(cache_size=4)
+        locator.QueryStream(self.Track())
+        stats = locator.getStats()
+        self.assertEqual(stats['queries'], 500)
+        self.assertEqual(stats['hits'] + stats['neighbor_hits'] + stats['grid_hits'] + stats['misses'], 500)
+        self.assertGreater(stats['hit_rate'], 0.5)
+        self.assertLessEqual(len(locator.cache_), 4)
+        locator.ResetStats()
+        self.assertEqual(locator.getStats()['queries'], 0)
+
+    def testLeafNeighbors(self):
+        tris = np.asarray(self.index.tris_[:self.index.n_leaves_])
+        neighbors = KPCache.LeafNeighbors(tris)
+        for leaf, across in enumerate(neighbors.tolist()):
+            for i, near in enumerate(across):
+                side = set([tuple(tris[leaf, i]), tuple(tris[leaf, (i + 1) % 3])])
+                if near >= 0:
+                    self.assertTrue(side <= set(map(tuple, tris[near])))
+                    self.assertIn(leaf, neighbors[near])
+        self.assertEqual((neighbors < 0).sum(), len(KirkPatrick.BBOX))     # Only the box sides are on the hull
+
+    def testGridCandidates(self):
+        tris = np.asarray(self.index.tris_[:self.index.n_leaves_])
+        grid = KPCache.Leaf_Grid(tris, 8)
+        for q_point in map(tuple, Fixtures.Queries(200).tolist()):
+            for leaf in range(len(tris)):
+                if DCEL.Contains(q_point, self.index.getLeafTriangle(leaf)):
+                    self.assertIn(leaf, grid.getCandidates(q_point))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+import DCEL
+import KirkPatrick
+from tests import Fixtures
+
+
+class Compact_Test(unittest.TestCase):
+    'Integer Face labels in a shared Face_Table against coordinate labels'
+
+    def testFaceTable(self):
+        table = DCEL.Face_Table(size=2)
+        tri = ((0., 0.), (1., 0.), (0., 1.))
+        self.assertEqual(table.Add(tri), 0)
+        self.assertEqual(list(table.AddMany(np.arange(30.).reshape(5, 3, 2))), range(1, 6))
+        self.assertEqual(len(table), 6)
+        self.assertEqual(table.getCorners(0), tri)
+        self.assertEqual(DCEL.Corners(0, table), tri)
+        self.assertEqual(DCEL.Corners(tri), tri)
+        np.testing.assert_array_equal(table.getTriangles([5, 1]), np.arange(30.).reshape(5, 3, 2)[[4, 0]])
+
+    def testSlots(self):
+        v = DCEL.Vertex((0., 0.))
+        for x in (v, DCEL.Edge(v), DCEL.Face(0)):
+            self.assertFalse(hasattr(x, '__dict__'))
+
+    def testSameTriangulation(self):
+        for backend in Fixtures.BACKENDS:
+            plain = Fixtures.Build(backend)
+            compact = Fixtures.Build(backend, compact=True)
+            table = compact.getTable()
+            self.assertIsNone(plain.getTable())
+            self.assertIsNotNone(table)
+            labels = [f for f in compact.getFaceLabels() if f is not None]
+            self.assertTrue(all(isinstance(f, int) for f in labels))
+            self.assertEqual(set(DCEL.Corners(f, table) for f in labels),
+                             set(f for f in plain.getFaceLabels() if f is not None))
+            self.assertIs(compact.Copy().getTable(), table)
+
+    def testSameAnswers(self):
+        queries = Fixtures.Queries(400)
+        for backend in Fixtures.BACKENDS:
+            plain = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(backend))
+            compact = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(backend, compact=True))
+            table = compact.getDCEL().getTable()
+            for q_point in map(tuple, queries.tolist()):
+                expected = plain.Query(q_point)
+                self.assertEqual(compact.Query(q_point), expected)
+                label = compact.Locate(q_point)
+                self.assertEqual(DCEL.Corners(label, table) if label is not None else None, expected)
+            plain_leaves = plain.getLeafLabels()
+            compact_leaves = compact.getLeafLabels()
+            for a, b in zip(plain.QueryBatch(queries).tolist(), compact.QueryBatch(queries).tolist()):
+                self.assertEqual(a < 0, b < 0)
+                if a >= 0:
+                    self.assertEqual(plain_leaves[a], DCEL.Corners(compact_leaves[b], table))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import numpy as np
+import DCEL
+import KirkPatrick
+import KPDynamic
+from tests import Fixtures
+
+
+def Triangles(dcel):
+    'Corner tuples of every triangle of dcel, the outer face left out'
+    return [tuple(verts) for label, verts in dcel.getLabeledPolys() if label is not None]
+
+
+class KP_Dynamic_Test(unittest.TestCase):
+    'Site insertion and deletion under a live hierarchy'
+
+    def Updated(self, backend, rebuild_fraction=KPDynamic.REBUILD_FRACTION):
+        'A KP_Dynamic over Fixtures.Build(backend, 100), after seeded insertions and deletions'
+        dynamic = KPDynamic.KP_Dynamic(Fixtures.Build(backend, 100), rebuild_fraction, seed=3)
+        rng = np.random.RandomState(9)
+        sites = Fixtures.Sites(100)[len(KirkPatrick.BBOX):]
+        for pt in map(tuple, rng.uniform(5, KirkPatrick.BOXSIZE - 5, size=(30, 2)).round(3).tolist()):
+            dynamic.InsertSite(pt)
+        for i in rng.choice(len(sites), 20, replace=False):
+            dynamic.DeleteSite(tuple(sites[i]))
+        return dynamic
+
+    def assertDelaunay(self, dcel):
+        opposite = {}   # Half edge -> the corner left of it
+        for a, b, c in Triangles(dcel):
+            opposite[(a, b)], opposite[(b, c)], opposite[(c, a)] = c, a, b
+        for (a, b), c in opposite.iteritems():
+            d = opposite.get((b, a))
+            if d is not None:
+                self.assertFalse(DCEL.InCircle(a, b, c, d), (a, b, c, d))
+
+    def testDelaunay(self):
+        for backend in Fixtures.BACKENDS:
+            dcel = self.Updated(backend).getDCEL()
+            dcel.Validate()
+            self.assertDelaunay(dcel)
+
+    def testMatchesFreshBuild(self):
+        queries = Fixtures.Queries(400)
+        for backend in Fixtures.BACKENDS:
+            for fraction in (KPDynamic.REBUILD_FRACTION, 10.):     # Rebuilt along the way, and patched only
+                dynamic = self.Updated(backend, fraction)
+                dcel = dynamic.getDCEL()
+                fresh = KirkPatrick.KP_Layer(None, dcel).ProduceHierarchy()
+                if fraction > 1:
+                    self.assertGreater(dynamic.getPatchSize(), 0)
+                else:
+                    self.assertGreater(dynamic.rebuilds_, 0)
+                table = dcel.getTable()
+                for q_point in map(tuple, queries.tolist()):
+                    label = dynamic.Query(q_point)
+                    if label is None:
+                        self.assertIsNone(fresh.Query(q_point))
+                    else:
+                        self.assertTrue(DCEL.Contains(q_point, DCEL.Corners(label, table)))
+                        self.assertIn(fresh.Query(q_point), Fixtures.Containing(dcel, q_point))
+                leaves = dynamic.getLeafLabels()
+                for q_point, leaf in zip(map(tuple, queries.tolist()), dynamic.QueryBatch(queries).tolist()):
+                    self.assertEqual(leaves[leaf] if leaf >= 0 else None, dynamic.Query(q_point))
+
+    def testInsertDelete(self):
+        for backend in Fixtures.BACKENDS:
+            dynamic = KPDynamic.KP_Dynamic(Fixtures.Build(backend, 50))
+            before = set(map(frozenset, Triangles(dynamic.getDCEL())))
+            dynamic.InsertSite((123.5, 321.25))
+            self.assertIn((123.5, 321.25), DCEL.Corners(dynamic.Query((123.5, 321.25)), dynamic.getDCEL().getTable()))
+            dynamic.DeleteSite((123.5, 321.25))
+            self.assertEqual(set(map(frozenset, Triangles(dynamic.getDCEL()))), before)
+
+    def testErrors(self):
+        for backend in Fixtures.BACKENDS:
+            dynamic = KPDynamic.KP_Dynamic(Fixtures.Build(backend, 50))
+            self.assertRaises(ValueError, dynamic.InsertSite, (-5., 10.))
+            self.assertRaises(ValueError, dynamic.DeleteSite, (1.5, 1.5))
+            self.assertRaises(ValueError, dynamic.InsertSite, tuple(Fixtures.Sites(50)[len(KirkPatrick.BBOX)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import DCEL
+import KirkPatrick
+import PointLocator
+from tests import Fixtures
+
+ENGINES = ['kirkpatrick', 'trapezoid', 'slab', 'walk']
+
+
+class Engines_Test(unittest.TestCase):
+    'Every engine behind PointLocator.Build answers a face containing the point'
+
+    def assertAnswers(self, locator, dcel, queries):
+        table = dcel.getTable()
+        leaves = locator.getLeafLabels()
+        batch = locator.QueryBatch(queries).tolist()
+        for q_point, leaf in zip(map(tuple, queries.tolist()), batch):
+            containing = set(DCEL.Corners(f, table) for f in Fixtures.Containing(dcel, q_point))
+            label = locator.Locate(q_point)
+            if containing:
+                self.assertIn(DCEL.Corners(label, table), containing)
+                self.assertIn(DCEL.Corners(leaves[leaf], table), containing)
+            else:
+                self.assertIsNone(label)
+                self.assertEqual(leaf, -1)
+
+    def testAgree(self):
+        for backend in Fixtures.BACKENDS:
+            for grid in (None, 50.):    # Random sites, and sites sharing x coordinates and lines
+                dcel = Fixtures.Build(backend, 120, grid=grid)
+                queries = Fixtures.Queries(300, dcel=dcel)
+                for engine in ENGINES:
+                    locator = PointLocator.Build(engine, dcel)
+                    self.assertIsInstance(locator, PointLocator.PointLocator)
+                    self.assertAnswers(locator, dcel, queries)
+
+    def testCompact(self):
+        dcel = Fixtures.Build(DCEL.Array_DCEL, 120, compact=True)
+        queries = Fixtures.Queries(200, dcel=dcel)
+        for engine in ENGINES:
+            self.assertAnswers(PointLocator.Build(engine, dcel), dcel, queries)
+
+    def testFromLabeledPolys(self):
+        dcel = Fixtures.Build(DCEL.Triangled_DCEL, 60)
+        polys = [(label, verts) for label, verts in dcel.getLabeledPolys() if label is not None]
+        queries = Fixtures.Queries(200)
+        for engine in ENGINES:
+            locator = PointLocator.FromLabeledPolys(engine, polys, KirkPatrick.BBOX)
+            self.assertAnswers(locator, dcel, queries)
+
+    def testSegments(self):
+        dcel = Fixtures.Build(DCEL.Array_DCEL, 60)
+        segments = PointLocator.Segments(dcel.getLabeledPolys())
+        faces = len([f for f in dcel.getFaceLabels() if f is not None])
+        self.assertEqual(len(segments.leaf_labels_), faces)
+        self.assertEqual(len(segments), (3 * faces + len(KirkPatrick.BBOX)) / 2)   # Every side once
+        for s in range(len(segments)):
+            p, q = segments.getEnds(s)
+            self.assertLess(p, q)
+        self.assertEqual((segments.above_ < 0).sum() + (segments.below_ < 0).sum(), len(KirkPatrick.BBOX))
+
+    def testAbove(self):
+        self.assertTrue(PointLocator.Above((0., 1.), (2., 1.), (0., 0.), (2., 0.)))
+        self.assertFalse(PointLocator.Above((0., 0.), (2., 0.), (0., 1.), (2., 1.)))
+        self.assertTrue(PointLocator.Above((0., 0.), (2., 2.), (0., 0.), (2., 0.)))     # Sharing p
+        self.assertTrue(PointLocator.Above((1., 3.), (3., 1.), (0., 0.), (4., 0.)))
+
+
+if __name__ == '__main__':
+    unittest.main()
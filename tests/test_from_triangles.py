@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+import DCEL
+import KirkPatrick
+from tests import Fixtures
+
+
+class From_Triangles_Test(unittest.TestCase):
+    'Hash and sort twin matching, and DCELs built straight from Delaunay arrays'
+
+    def setUp(self):
+        self.points = Fixtures.Sites(200)
+        self.simplices, self.neighbors = Fixtures.Triangulation(self.points)
+
+    def testTwinsAgree(self):
+        points, simplices, neighbors = DCEL.OrientTriangles(self.points, self.simplices, self.neighbors)
+        from_neighbors = DCEL.TriangleTwins(simplices, neighbors)
+        self.assertTrue(np.array_equal(from_neighbors, DCEL.TriangleTwins(simplices)))
+        inner = np.flatnonzero(from_neighbors >= 0)
+        self.assertTrue(np.array_equal(from_neighbors[from_neighbors[inner]], inner))
+        # A twin runs the other way along the same side
+        origin, dest = simplices.ravel(), simplices[:, [1, 2, 0]].ravel()
+        self.assertTrue(np.array_equal(origin[from_neighbors[inner]], dest[inner]))
+
+    def testOrientTriangles(self):
+        flipped = self.simplices[:, [0, 2, 1]]
+        points, simplices, neighbors = DCEL.OrientTriangles(self.points, flipped)
+        corners = points[simplices]
+        area = (corners[:, 1, 0] - corners[:, 0, 0]) * (corners[:, 2, 1] - corners[:, 0, 1]) - \
+            (corners[:, 1, 1] - corners[:, 0, 1]) * (corners[:, 2, 0] - corners[:, 0, 0])
+        self.assertTrue((area > 0).all())
+        self.assertIsNone(neighbors)
+
+    def testMatchesConstructor(self):
+        labels = DCEL.TriangleLabels(self.points, DCEL.OrientTriangles(self.points, self.simplices)[1])
+        for backend in Fixtures.BACKENDS:
+            polys = [(label, list(label)) for label in labels]
+            expected = Fixtures.Polygons(backend(polys, KirkPatrick.BBOX))
+            with_neighbors = backend.FromTriangles(self.points, self.simplices, self.neighbors, KirkPatrick.BBOX)
+            without = backend.FromTriangles(self.points, self.simplices, None, KirkPatrick.BBOX)
+            self.assertEqual(Fixtures.Polygons(with_neighbors), expected)
+            self.assertEqual(Fixtures.Polygons(without), expected)
+            self.assertEqual(len(with_neighbors.getVertices()), len(self.points))
+
+    def testLabels(self):
+        labels = ['t{}'.format(i) for i in range(len(self.simplices))]
+        dcel = DCEL.Array_DCEL.FromTriangles(self.points, self.simplices, self.neighbors, KirkPatrick.BBOX, labels)
+        self.assertEqual(dcel.getFaceLabels(), set(labels) | set([None]))
+
+
+if __name__ == '__main__':
+    unittest.main()
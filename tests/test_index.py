@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+import DCEL
+import KPIndex
+import KirkPatrick
+from tests import Fixtures
+
+
+class KP_Index_Test(unittest.TestCase):
+    'The flat CSR index Freeze compiles a hierarchy into'
+
+    def setUp(self):
+        self.dcel = Fixtures.Build(DCEL.Array_DCEL, 150)
+        self.top = KirkPatrick.KP_Layer.FromDCEL(self.dcel)
+        self.index = self.top.Freeze()
+
+    def testLayout(self):
+        index = self.index
+        leaves = set(f for f in self.dcel.getFaceLabels() if f is not None)
+        self.assertEqual(index.n_leaves_, len(leaves))
+        self.assertEqual(set(index.getLeafLabels()), leaves)
+        self.assertIs(self.top.Freeze(), index)     # Built once
+        self.assertEqual(len(index.child_off_), index.getFaceCount() + 1)
+        self.assertTrue((np.diff(index.child_off_) >= 0).all())
+        self.assertTrue((index.child_off_[1:index.n_leaves_ + 1] == 0).all())   # Leaves have no children
+        self.assertEqual(index.child_off_[-1], len(index.children_))
+        # Every face's children overlap it, and were made before it
+        for f in range(index.n_leaves_, index.getFaceCount()):
+            children = index.children_[index.child_off_[f]:index.child_off_[f + 1]]
+            self.assertTrue(len(children) > 0 and (children < f).all())
+            for g in children.tolist():
+                self.assertTrue(DCEL.Overlaps(index.getLeafTriangle(f), index.getLeafTriangle(g)))
+        top = set(f for f in self.top.getFaceLabels() if f is not None)
+        self.assertEqual(len(index.top_), len(top))
+
+    def testLeafTriangles(self):
+        for leaf, label in enumerate(self.index.getLeafLabels()):
+            self.assertEqual(self.index.getLeafTriangle(leaf), label)
+
+    def testQueryBatch(self):
+        points = Fixtures.Queries(300, dcel=self.dcel)
+        leaves = self.index.QueryBatch(points)
+        for q_point, leaf in zip(map(tuple, points.tolist()), leaves.tolist()):
+            containing = Fixtures.Containing(self.dcel, q_point)
+            if containing:
+                self.assertIn(self.index.getLeafLabels()[leaf], containing)
+            else:
+                self.assertEqual(leaf, -1)
+
+    def testFreezeIndexIsReusable(self):
+        'An index frozen by KPIndex.Freeze directly answers as the cached one'
+        points = Fixtures.Queries(100)
+        self.assertTrue((KPIndex.Freeze(self.top).QueryBatch(points) == self.index.QueryBatch(points)).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import DCEL
+import KirkPatrick
+from tests import Fixtures
+
+
+class Delta_Layers_Test(unittest.TestCase):
+    'Hierarchies whose middle layers hold only what changed from the layer below'
+
+    def Layers(self, top):
+        layers = [top]
+        while layers[-1].getNext() is not None:
+            layers.append(layers[-1].getNext())
+        return layers
+
+    def testLayersAreDeltas(self):
+        for backend in Fixtures.BACKENDS:
+            dcel = Fixtures.Build(backend, 200)
+            polys = Fixtures.Polygons(dcel)
+            top = KirkPatrick.KP_Layer.FromDCEL(dcel)
+            layers = self.Layers(top)
+            self.assertGreater(len(layers), 2)
+            self.assertIs(layers[-1].getDCEL(), dcel)
+            self.assertEqual(Fixtures.Polygons(dcel), polys)    # The bottom layer is never modified
+            self.assertIsNotNone(top.getDCEL())
+            for layer in layers[1:-1]:
+                self.assertIsNone(layer.getDCEL())
+            for layer in layers[:-1]:
+                below = layer.getNext().getFaceLabels()
+                faces = layer.getFaceLabels()
+                self.assertEqual(faces, (below - layer.dead_) | set(layer.links_))
+                for new, linked in layer.links_.iteritems():
+                    self.assertTrue(set(linked) <= below)
+                    self.assertTrue(all(DCEL.Overlaps(layer.getCorners(new), layer.getCorners(f)) for f in linked))
+            self.assertLessEqual(len(top.getDCEL().getVertices()), len(KirkPatrick.BBOX) + 2)
+
+    def testQuery(self):
+        for backend in Fixtures.BACKENDS:
+            dcel = Fixtures.Build(backend, 120)
+            top = KirkPatrick.KP_Layer.FromDCEL(dcel)
+            for q_point in map(tuple, Fixtures.Queries(200, dcel=dcel).tolist()):
+                containing = Fixtures.Containing(dcel, q_point)
+                label = top.Locate(q_point)
+                if containing:
+                    self.assertIn(label, containing)
+                    self.assertEqual(top.Query(q_point), label)
+                else:
+                    self.assertIsNone(label)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+import DCEL
+import KirkPatrick
+import KPNearest
+from tests import Fixtures
+
+
+class Nearest_Test(unittest.TestCase):
+    'Nearest sites through the hierarchy against a brute force numpy search'
+
+    def Nearest2(self, sites, points):
+        'Squared distance from each row of points to its nearest row of sites'
+        delta = sites[np.newaxis, :, :] - points[:, np.newaxis, :]
+        return (delta * delta).sum(axis=-1).min(axis=1)
+
+    def Distance2(self, found, points):
+        delta = np.asarray(found, dtype=np.float64) - points
+        return (delta * delta).sum(axis=-1)
+
+    def testNearestSite(self):
+        for backend in Fixtures.BACKENDS:
+            for grid in (None, 50.):    # Many sites equally near
+                sites = Fixtures.Sites(200, grid=grid)[len(KirkPatrick.BBOX):]
+                top = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(backend, 200, grid=grid))
+                points = Fixtures.Queries(300)
+                found = [top.NearestSite(q_point) for q_point in map(tuple, points.tolist())]
+                self.assertTrue(set(found) <= set(map(tuple, sites.tolist())))
+                np.testing.assert_array_equal(self.Distance2(found, points), self.Nearest2(sites, points))
+
+    def testNearestSiteBatch(self):
+        for backend in Fixtures.BACKENDS:
+            for grid in (None, 50.):
+                sites = Fixtures.Sites(200, grid=grid)[len(KirkPatrick.BBOX):]
+                top = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(backend, 200, grid=grid, compact=True))
+                points = np.concatenate([Fixtures.Queries(300), sites, np.array(KirkPatrick.BBOX)])
+                found = top.NearestSiteBatch(points)
+                self.assertEqual(found.shape, points.shape)
+                np.testing.assert_array_equal(self.Distance2(found, points), self.Nearest2(sites, points))
+                np.testing.assert_array_equal(found[300:300 + len(sites)], sites)   # A site is its own nearest
+
+    def testNoSites(self):
+        dcel = DCEL.Array_DCEL.FromTriangles(np.array(KirkPatrick.BBOX), np.array([[0, 1, 2], [0, 2, 3]]),
+                                             bbox=KirkPatrick.BBOX)
+        self.assertIsNone(KPNearest.NearestSite(dcel, (10., 20.)))
+        graph = KPNearest.Site_Graph(np.array([[KirkPatrick.BBOX[i] for i in tri] for tri in ([0, 1, 2], [0, 2, 3])]),
+                                     KirkPatrick.BBOX)
+        self.assertEqual(graph.NearestBatch(np.array([[10., 20.], [-5., -5.]]), np.array([0, -1])).tolist(), [-1, -1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import DCEL
+import KirkPatrick
+import KPParallel
+from tests import Fixtures
+
+
+class Parallel_Executor_Test(unittest.TestCase):
+    'Process pool answers against the index it maps'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.index_ = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(DCEL.Array_DCEL, 150)).Freeze()
+        cls.executor_ = KPParallel.Parallel_Executor(cls.index_, 2, chunk=100)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor_.Close()
+
+    def setUp(self):
+        self.dir_ = tempfile.mkdtemp()
+        self.points_ = Fixtures.Queries(1050)
+        self.executor_.ResetStats()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_)
+
+    def testQueryBatch(self):
+        found = self.executor_.QueryBatch(self.points_)
+        np.testing.assert_array_equal(found, self.index_.QueryBatch(self.points_))
+        self.assertEqual(len(self.executor_.QueryBatch(np.zeros((0, 2)))), 0)
+        self.assertEqual(self.executor_.getLeafLabels(), self.index_.getLeafLabels())
+
+    def testQueryFile(self):
+        path = os.path.join(self.dir_, 'points.npy')
+        out = os.path.join(self.dir_, 'answers.npy')
+        np.save(path, self.points_)
+        expected = self.index_.QueryBatch(self.points_)
+        np.testing.assert_array_equal(self.executor_.QueryFile(path), expected)
+        self.executor_.QueryFile(path, out)
+        np.testing.assert_array_equal(np.load(out), expected)
+
+    def testStats(self):
+        self.executor_.QueryBatch(self.points_)
+        stats = self.executor_.getStats()
+        self.assertEqual((stats['processes'], stats['batches'], stats['points']), (2, 1, 1050))
+        self.assertEqual(sum(w['points'] for w in stats['workers'].itervalues()), 1050)
+        self.assertLessEqual(len(stats['workers']), 2)
+
+    def testIndexFile(self):
+        path = os.path.join(self.dir_, 'index.kp')
+        self.index_.Save(path)
+        executor = KPParallel.Parallel_Executor(path, 2)
+        try:
+            np.testing.assert_array_equal(executor.QueryBatch(self.points_), self.index_.QueryBatch(self.points_))
+            self.assertEqual(len(executor.getLeafLabels()), len(self.index_.getLeafLabels()))
+        finally:
+            executor.Close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+import KirkPatrick
+from tests import Fixtures
+
+
+class Parallel_Build_Test(unittest.TestCase):
+    'Layers retriangulated in a process pool are the layers a serial build makes'
+
+    def setUp(self):
+        self.min_stars = KirkPatrick.PARALLEL_MIN_STARS
+        KirkPatrick.PARALLEL_MIN_STARS = 1     # Send every layer to the pool
+
+    def tearDown(self):
+        KirkPatrick.PARALLEL_MIN_STARS = self.min_stars
+
+    def Layers(self, top):
+        layers = []
+        while top is not None:
+            layers.append(top.getFaceLabels())
+            top = top.getNext()
+        return layers
+
+    def testSameHierarchy(self):
+        for backend in Fixtures.BACKENDS:
+            serial = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(backend, 150), strategy='random', seed=7)
+            parallel = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(backend, 150), workers=2, strategy='random',
+                                                     seed=7)
+            self.assertEqual(self.Layers(serial), self.Layers(parallel))
+            points = Fixtures.Queries(200)
+            self.assertEqual(serial.QueryBatch(points).tolist(), parallel.QueryBatch(points).tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+from fractions import Fraction
+import numpy as np
+import Predicates
+
+
+def Sign(x):
+    return (x > 0) - (x < 0)
+
+
+def OrientFraction(a, b, c):
+    a, b, c = [map(Fraction, pt) for pt in (a, b, c)]
+    return Sign((a[0] - c[0]) * (b[1] - c[1]) - (a[1] - c[1]) * (b[0] - c[0]))
+
+
+def InCircleFraction(a, b, c, d):
+    rows = [[Fraction(pt[0]) - Fraction(d[0]), Fraction(pt[1]) - Fraction(d[1])] for pt in (a, b, c)]
+    rows = [(x, y, x * x + y * y) for x, y in rows]
+    (ax, ay, al), (bx, by, bl), (cx, cy, cl) = rows
+    return Sign(al * (bx * cy - cx * by) + bl * (cx * ay - ax * cy) + cl * (ax * by - bx * ay))
+
+
+def NearLine(n=64):
+    'Shewchuk\'s grid of points a hair from the line through (12, 12) and (24, 24), where floating point fails'
+    step = 2. ** -53
+    return [(0.5 + i * step, 0.5 + j * step) for i in range(n) for j in range(n)]
+
+
+class Predicates_Test(unittest.TestCase):
+    'Filtered predicates against exact rational arithmetic'
+
+    def testOrient(self):
+        for a in NearLine():
+            for b, c in (((12., 12.), (24., 24.)), ((24., 24.), (12., 12.))):
+                self.assertEqual(Predicates.Orient(a, b, c), OrientFraction(a, b, c))
+        rng = np.random.RandomState(1)
+        for a, b, c in rng.uniform(-1e3, 1e3, size=(500, 3, 2)).tolist():
+            self.assertEqual(Predicates.Orient(a, b, c), OrientFraction(a, b, c))
+
+    def testOrientBatch(self):
+        a = np.array(NearLine())
+        np.testing.assert_array_equal(Predicates.OrientBatch(a, (12., 12.), (24., 24.)),
+                                      [OrientFraction(pt, (12., 12.), (24., 24.)) for pt in NearLine()])
+        self.assertEqual(Predicates.OrientBatch(a, (12., 12.), (24., 24.)).dtype, np.int8)
+
+    def testCCW(self):
+        rng = np.random.RandomState(2)
+        for a, b, c in rng.randint(0, 4, size=(500, 3, 2)).astype(float).tolist():    # Many collinear
+            a, b, c = tuple(a), tuple(b), tuple(c)
+            sign = OrientFraction(a, b, c)
+            between = all(min(a[j], c[j]) <= b[j] <= max(a[j], c[j]) for j in range(2))
+            self.assertEqual(Predicates.CCW(a, b, c), -sign if sign else 2 if between else 0)
+
+    def testContains(self):
+        tri = [(0.5, 0.5), (24., 24.), (24., 0.)]
+        for pt in NearLine():
+            expected = all(OrientFraction(tri[i - 1], tri[i], pt) <= 0 for i in range(3))
+            self.assertEqual(Predicates.Contains(pt, tri), expected)
+            self.assertEqual(Predicates.Contains(pt, tri[::-1]), expected)
+        flat = [(0., 0.), (1., 1.), (2., 2.)]
+        self.assertTrue(Predicates.Contains((1.5, 1.5), flat))
+        self.assertFalse(Predicates.Contains((3., 3.), flat))
+
+    def testContainsBatch(self):
+        points = np.array(NearLine() + [(1.5, 1.5), (3., 3.), (30., 1.)])
+        tris = [[(0.5, 0.5), (24., 24.), (24., 0.)], [(0., 0.), (1., 1.), (2., 2.)]]
+        for tri in tris:
+            expected = [Predicates.Contains(tuple(pt), tri) for pt in points.tolist()]
+            np.testing.assert_array_equal(Predicates.ContainsBatch(points, np.array(tri)), expected)
+        self.assertEqual(Predicates.ContainsBatch(np.zeros((0, 2)), np.zeros((0, 3, 2))).shape, (0, ))
+
+    def testInCircle(self):
+        a, b, c = (0., 0.), (1., 0.), (0., 1.)
+        self.assertEqual(Predicates.InCircle(a, b, c, (1., 1.)), 0)     # Cocircular
+        self.assertEqual(Predicates.InCircle(a, b, c, (0.5, 0.5)), 1)
+        self.assertEqual(Predicates.InCircle(a, b, c, (2., 2.)), -1)
+        step = 2. ** -52
+        for i in range(-8, 9):
+            for j in range(-8, 9):
+                d = (1. + i * step, 1. + j * step)
+                self.assertEqual(Predicates.InCircle(a, b, c, d), InCircleFraction(a, b, c, d))
+        rng = np.random.RandomState(3)
+        for a, b, c, d in rng.uniform(-1e3, 1e3, size=(500, 4, 2)).tolist():
+            if OrientFraction(a, b, c) > 0:
+                self.assertEqual(Predicates.InCircle(a, b, c, d), InCircleFraction(a, b, c, d))
+
+    def testIntegers(self):
+        self.assertEqual(Predicates.Integers(0.5, 3, 0.25), [2, 12, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import pstats
+import shutil
+import tempfile
+import unittest
+import subprocess
+import DCEL
+import KirkPatrick
+import KPProfile
+import Predicates
+from tests import Fixtures
+
+
+class Build_Profile_Test(unittest.TestCase):
+    'Phase timings, layer counts and predicate call counts of profiled builds'
+
+    def Profiled(self, backend, **options):
+        'Build profile and top layer of a profiled build of Fixtures.Sites(150) over backend'
+        profile = KPProfile.Build_Profile(**options)
+        points = Fixtures.Sites()
+        simplices, neighbors = Fixtures.Triangulation(points)
+        with profile:
+            dcel = backend.FromTriangles(points, simplices, neighbors, KirkPatrick.BBOX, profile=profile)
+            top = KirkPatrick.KP_Layer(None, dcel).ProduceHierarchy(profile=profile)
+        return profile, top
+
+    def testReport(self):
+        for backend in Fixtures.BACKENDS:
+            profile, top = self.Profiled(backend)
+            report = profile.getReport()
+            self.assertEqual(len(report['layers']), top.Depth() - 1)
+            self.assertEqual([layer['layer'] for layer in report['layers']], range(1, top.Depth()))
+            self.assertIn('objects' if backend is DCEL.Triangled_DCEL else 'twins', report['phases'])
+            for phases in [report['phases']] + [layer['phases'] for layer in report['layers']]:
+                for total in phases.itervalues():
+                    self.assertGreaterEqual(total['seconds'], 0.)
+                    self.assertGreater(total['laps'], 0)
+            self.assertEqual(report['dcel']['vertices'], len(Fixtures.Sites()))
+            self.assertGreater(report['calls']['Orient'] + report['calls']['OrientBatch'], 0)
+            self.assertEqual(Predicates.Orient.__name__, 'Orient')     # Unpatched once stopped
+
+    def testCounts(self):
+        dcel = Fixtures.Build(DCEL.Triangled_DCEL, 50)
+        counts = KPProfile.Counts(dcel)
+        self.assertEqual(2 * counts['edges'], len(dcel.getEdges()))     # Half edges
+        self.assertEqual(counts['faces'], len(dcel.getFaceLabels()))
+        self.assertEqual(counts['vertices'] - counts['edges'] + counts['faces'], 2)
+
+    def testLayerCounts(self):
+        profile, top = self.Profiled(DCEL.Array_DCEL)
+        report = profile.getReport()
+        verts = report['dcel']['vertices']
+        for record in report['layers']:
+            self.assertGreater(record['removed'], 0)
+            verts -= record['removed']
+            self.assertEqual(record['vertices'], verts)
+            self.assertEqual(record['vertices'] - record['edges'] + record['faces'], 2)
+            self.assertEqual(2 * record['edges'], 3 * (record['faces'] - 1) + len(KirkPatrick.BBOX))
+        self.assertEqual(verts, len(top.getDCEL().getVertices()))
+
+    def testCProfile(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'build.prof')
+            profile = self.Profiled(DCEL.Array_DCEL, counters=False, cprofile=path)[0]
+            self.assertIsNone(profile.getReport()['calls'])
+            self.assertGreater(pstats.Stats(path).total_calls, 0)
+        finally:
+            shutil.rmtree(directory)
+
+    def testUnprofiled(self):
+        self.assertIsNone(KPProfile.Lap(None, 'phase'))
+        self.assertIsNone(DCEL.Laps(None)('phase'))
+        code = "import sys, DCEL; sys.exit('KPProfile' in sys.modules)"
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(subprocess.call([sys.executable, '-c', code], cwd=root), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+import DCEL
+import KirkPatrick
+from tests import Fixtures
+
+
+class Query_Batch_Test(unittest.TestCase):
+    'KP_Layer.QueryBatch against scalar queries'
+
+    def testAgreesWithQuery(self):
+        for backend in Fixtures.BACKENDS:
+            dcel = Fixtures.Build(backend, 150)
+            top = KirkPatrick.KP_Layer.FromDCEL(dcel)
+            points = Fixtures.Queries(400, dcel=dcel)
+            leaves = top.QueryBatch(points)
+            self.assertEqual(leaves.shape, (len(points), ))
+            labels = top.getLeafLabels()
+            for q_point, leaf in zip(map(tuple, points.tolist()), leaves.tolist()):
+                label = top.Locate(q_point)
+                if label is None:
+                    self.assertEqual(leaf, -1)
+                    self.assertFalse(Fixtures.Containing(dcel, q_point))
+                else:   # On a shared side or corner either answer may be any containing face
+                    self.assertGreaterEqual(leaf, 0)
+                    self.assertTrue(DCEL.Contains(q_point, top.getCorners(labels[leaf])))
+                    if len(Fixtures.Containing(dcel, q_point)) == 1:
+                        self.assertEqual(labels[leaf], label)
+
+    def testTrace(self):
+        top = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(DCEL.Array_DCEL, 100))
+        trace = KirkPatrick.CountingTrace()
+        top.QueryBatch(Fixtures.Queries(50), trace)
+        self.assertEqual(trace.queries_, 50)
+        self.assertGreater(trace.contains_calls_, 0)
+
+    def testEmpty(self):
+        top = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(DCEL.Array_DCEL, 20))
+        self.assertEqual(len(top.QueryBatch(np.zeros((0, 2)))), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import math
+import unittest
+import numpy as np
+import KirkPatrick
+import KPRegions
+from tests import Fixtures
+
+L_SHAPE = [(100., 100.), (300., 100.), (300., 150.), (150., 150.), (150., 300.), (100., 300.)]
+U_SHAPE = [(350., 100.), (500., 100.), (500., 300.), (450., 300.), (450., 150.), (400., 150.), (400., 300.),
+           (350., 300.)]
+NOTCH = [(200., 150.), (300., 150.), (300., 250.), (200., 250.)]    # On part of an L edge, through its vertex
+STAR = [(250. + (100. if i % 2 == 0 else 40.) * math.cos(math.pi * i / 5),
+         450. + (100. if i % 2 == 0 else 40.) * math.sin(math.pi * i / 5)) for i in range(10)]
+TAB = [(520., 90.), (580., 90.), (580., 50.), (520., 50.)]      # ClockWise, labelled as the U
+
+
+def RayCast(pt, verts):
+    'Is pt inside polygon verts, by the crossings of a ray to its right?'
+    inside = False
+    for (ax, ay), (bx, by) in zip(verts, verts[1:] + verts[:1]):
+        if (ay > pt[1]) != (by > pt[1]) and pt[0] < ax + (pt[1] - ay) * (bx - ax) / (by - ay):
+            inside = not inside
+    return inside
+
+
+class Region_Map_Test(unittest.TestCase):
+    'Region labels of points among non-convex polygons'
+
+    def setUp(self):
+        self.polys_ = [('L', L_SHAPE), ('U', U_SHAPE), ('notch', NOTCH), ('star', STAR), ('U', TAB)]
+
+    def Expected(self, q_point):
+        labels = [label for label, verts in self.polys_ if RayCast(q_point, verts)]
+        self.assertLessEqual(len(labels), 1)
+        return labels[0] if labels else None
+
+    def testTriangulate(self):
+        points, simplices, regions, labels = KPRegions.Triangulate(self.polys_, KirkPatrick.BBOX)
+        self.assertEqual(labels, ['L', 'U', 'notch', 'star'])
+        self.assertEqual(map(tuple, points[:len(KirkPatrick.BBOX)].tolist()), KirkPatrick.BBOX)
+        areas = dict((label, 0.) for label in labels + [None])
+        for tri, region in zip(simplices.tolist(), regions.tolist()):
+            corners = [tuple(points[v]) for v in tri]
+            self.assertGreater(KPRegions.Area2(corners), 0)
+            areas[labels[region] if region >= 0 else None] += KPRegions.Area2(corners) / 2.
+        for label in labels:
+            expected = sum(abs(KPRegions.Area2(verts)) / 2. for l, verts in self.polys_ if l == label)
+            self.assertAlmostEqual(areas[label], expected)
+        self.assertAlmostEqual(sum(areas.values()), KirkPatrick.BOXSIZE ** 2)
+
+    def testQuery(self):
+        rng = np.random.RandomState(4)
+        points = rng.uniform(0, KirkPatrick.BOXSIZE, size=(2000, 2))
+        for backend in Fixtures.BACKENDS:
+            for engine in ('kirkpatrick', 'trapezoid', 'slab', 'walk'):
+                regions = KPRegions.Region_Map.FromLabeledPolys(self.polys_, KirkPatrick.BBOX, backend, engine)
+                labels = regions.getLeafLabels()
+                batch = regions.QueryBatch(points).tolist()
+                for q_point, region in zip(map(tuple, points.tolist()), batch):
+                    expected = self.Expected(q_point)
+                    self.assertEqual(regions.Query(q_point), expected)
+                    self.assertEqual(labels[region] if region >= 0 else None, expected)
+
+    def testOutside(self):
+        regions = KPRegions.Region_Map.FromLabeledPolys(self.polys_, KirkPatrick.BBOX)
+        self.assertIsNone(regions.Query((-10., 10.)))
+        self.assertIsNone(regions.Query((250., 280.)))     # In the L's crook, above the notch
+        self.assertEqual(regions.QueryBatch(np.array([[-10., 10.], [620., 5.]])).tolist(), [-1, -1])
+        self.assertEqual(regions.Query((125., 200.)), 'L')
+        self.assertEqual(regions.Query((250., 200.)), 'notch')
+        locator = regions.getLocator()
+        self.assertEqual(regions.getRegion(locator.Locate((550., 70.))), regions.getLeafLabels().index('U'))
+
+    def testErrors(self):
+        crossing = [('a', [(100., 100.), (200., 100.), (200., 200.)]), ('b', [(150., 50.), (250., 50.), (150., 150.)])]
+        self.assertRaises(ValueError, KPRegions.Triangulate, crossing, KirkPatrick.BBOX)
+        overlapping = [('a', L_SHAPE), ('b', [(110., 100.), (140., 100.), (140., 140.)])]     # On an L edge
+        self.assertRaises(ValueError, KPRegions.Triangulate, overlapping, KirkPatrick.BBOX)
+        boundary = [('a', [(0., 100.), (100., 100.), (100., 200.)])]
+        self.assertRaises(ValueError, KPRegions.Triangulate, boundary, KirkPatrick.BBOX)
+
+
+if __name__ == '__main__':
+    unittest.main()
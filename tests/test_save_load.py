@@ -0,0 +1,52 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import numpy as np
+import DCEL
+import KPIndex
+import KirkPatrick
+from tests import Fixtures
+
+
+class Save_Load_Test(unittest.TestCase):
+    'The on-disk index format and its memory mapped loading'
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'index.kp')
+        self.index = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(DCEL.Array_DCEL, 150)).Freeze()
+        self.index.Save(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testRoundTrip(self):
+        loaded = KPIndex.Load(self.path)
+        for name in ['tris_', 'child_off_', 'children_', 'top_']:
+            self.assertTrue(np.array_equal(getattr(loaded, name), getattr(self.index, name)))
+        self.assertEqual(loaded.n_leaves_, self.index.n_leaves_)
+        self.assertIsInstance(loaded.tris_.base, np.memmap)     # Mapped, not read
+        self.assertFalse(loaded.tris_.flags.writeable)
+        points = Fixtures.Queries(500)
+        self.assertTrue(np.array_equal(loaded.QueryBatch(points), self.index.QueryBatch(points)))
+        # Leaf labels are not saved; coordinate labels come back as they were
+        self.assertEqual(loaded.getLeafLabels(), self.index.getLeafLabels())
+
+    def Corrupt(self, offset, data):
+        with open(self.path, 'r+b') as f:
+            f.seek(offset)
+            f.write(data)
+
+    def testBadMagic(self):
+        self.Corrupt(0, 'NOTANIDX')
+        self.assertRaisesRegexp(ValueError, 'not a KP index', KPIndex.Load, self.path)
+
+    def testBadVersion(self):
+        self.Corrupt(8, struct.pack('<I', KPIndex.FORMAT_VERSION + 1))
+        self.assertRaisesRegexp(ValueError, 'format version', KPIndex.Load, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
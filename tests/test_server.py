@@ -0,0 +1,96 @@
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+import threading
+import numpy as np
+import DCEL
+import KirkPatrick
+import KPClient
+import KPServer
+from tests import Fixtures
+
+
+class Failing_Index:
+    'Index whose first QueryBatch raises'
+
+    def __init__(self):
+        self.calls_ = 0
+
+    def QueryBatch(self, points):
+        self.calls_ += 1
+        if self.calls_ == 1:
+            raise RuntimeError("Corrupt index")
+        return np.zeros(len(points), dtype=np.int64)
+
+
+class KPServer_Test(unittest.TestCase):
+    'The micro-batching service over a Unix socket'
+
+    def setUp(self):
+        self.dir_ = tempfile.mkdtemp()
+        self.address_ = os.path.join(self.dir_, 'kp.sock')
+        self.index_ = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(DCEL.Array_DCEL, 100)).Freeze()
+        self.server_ = None
+
+    def tearDown(self):
+        if self.server_ is not None:
+            self.server_.shutdown()
+            self.server_.server_close()
+            self.server_.batcher_.Stop()
+        shutil.rmtree(self.dir_)
+
+    def Start(self, index, **options):
+        self.server_ = KPServer.Serve(index, self.address_, **options)
+        thread = threading.Thread(target=self.server_.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return KPClient.KP_Client(self.address_)
+
+    def testParseAddress(self):
+        self.assertEqual(KPServer.ParseAddress('127.0.0.1:4510'), (socket.AF_INET, ('127.0.0.1', 4510)))
+        self.assertEqual(KPServer.ParseAddress(':80'), (socket.AF_INET, ('127.0.0.1', 80)))
+        self.assertEqual(KPServer.ParseAddress('/tmp/kp.sock'), (socket.AF_UNIX, '/tmp/kp.sock'))
+
+    def testAnswers(self):
+        client = self.Start(self.index_, batch_size=16)
+        points = Fixtures.Queries(300)
+        expected = self.index_.QueryBatch(points)
+        np.testing.assert_array_equal(client.QueryMany(points), expected)
+        self.assertEqual(client.Query(tuple(points[0])), expected[0])
+        stats = client.getStats()
+        self.assertEqual(stats['requests'], 301)
+        self.assertEqual(stats['failed_batches'], 0)
+        self.assertGreater(stats['batches'], 1)
+        client.Close()
+
+    def testMalformedLines(self):
+        client = self.Start(self.index_)
+        client.wfile_.write('1 2\nfoo bar\n3\nnan 4\n\n5 6\n')
+        client.wfile_.flush()
+        answers = [client.rfile_.readline().strip() for i in range(5)]
+        self.assertEqual(answers[1:4], ['error'] * 3)
+        expected = self.index_.QueryBatch(np.array([[1., 2.], [5., 6.]]))
+        self.assertEqual([int(answers[0]), int(answers[4])], expected.tolist())
+        client.Close()
+
+    def testFailingBatch(self):
+        client = self.Start(Failing_Index())
+        self.assertRaises(ValueError, client.Query, (1., 2.))
+        self.assertEqual(client.Query((1., 2.)), 0)     # Still serving
+        stats = client.getStats()
+        self.assertEqual((stats['failed_batches'], stats['requests']), (1, 2))
+        client.Close()
+
+    def testLoadTest(self):
+        self.Start(Failing_Index()).Close()
+        result = KPClient.LoadTest(self.address_, clients=2, requests=50, window=4)    # Returns despite errors
+        self.assertEqual(result['requests'], 100)
+        self.assertGreater(result['failed_requests'], 0)
+        self.assertLess(result['failed_requests'], 100)
+        self.assertIn('latency_p50', result)
+
+
+if __name__ == '__main__':
+    unittest.main()
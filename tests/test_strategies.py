@@ -0,0 +1,62 @@
+import random
+import unittest
+import DCEL
+import KirkPatrick
+from tests import Fixtures
+
+STRATEGIES = ['arbitrary', 'lowest_degree', 'random']
+
+
+class Strategies_Test(unittest.TestCase):
+    'Independent set selection strategies and build reports'
+
+    def testIndependentSets(self):
+        layer = KirkPatrick.KP_Layer(None, Fixtures.Build(DCEL.Array_DCEL, 200))
+        dcel = layer.getDCEL()
+        interior = dcel.getVertices() - dcel.getBox()
+        for strategy in STRATEGIES:
+            for max_degree in (6, 8):
+                chosen = layer.FindIndieSet(strategy, max_degree, random.Random(3))
+                self.assertTrue(chosen <= interior)
+                for v in chosen:
+                    self.assertLessEqual(dcel.getDegree(v), max_degree)
+                    self.assertTrue(chosen.isdisjoint(dcel.getNeighbors(v)))
+                # Maximal: every other low degree vertex has a chosen neighbour
+                for v in interior - chosen:
+                    if dcel.getDegree(v) <= max_degree:
+                        self.assertFalse(chosen.isdisjoint(dcel.getNeighbors(v)))
+
+    def testUnknownStrategy(self):
+        layer = KirkPatrick.KP_Layer(None, Fixtures.Build(DCEL.Array_DCEL, 20))
+        self.assertRaises(ValueError, layer.FindIndieSet, 'largest')
+
+    def testSmallMaxDegree(self):
+        for backend in Fixtures.BACKENDS:
+            for strategy in STRATEGIES:
+                layer = KirkPatrick.KP_Layer(None, Fixtures.Build(backend, 200))
+                self.assertRaises(ValueError, layer.ProduceHierarchy, strategy=strategy, max_degree=4, seed=1)
+        top = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(DCEL.Array_DCEL, 200), max_degree=6)
+        self.assertTrue(all(layer['removed'] > 0 for layer in top.BuildReport()['layers']))
+
+    def testSeededRandomIsReproducible(self):
+        tops = [KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(DCEL.Array_DCEL, 150), strategy='random', seed=11)
+                for i in range(2)]
+        self.assertEqual(tops[0].getLeafLabels(), tops[1].getLeafLabels())
+        self.assertEqual(tops[0].BuildReport(), tops[1].BuildReport())
+
+    def testBuildReport(self):
+        for strategy in STRATEGIES:
+            top = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(DCEL.Array_DCEL, 200), strategy=strategy, seed=1)
+            report = top.BuildReport()
+            self.assertEqual(report['depth'], top.Depth())
+            self.assertEqual(len(report['layers']), report['depth'] - 1)
+            for layer in report['layers']:
+                self.assertGreater(layer['removed'], 0)
+                self.assertAlmostEqual(layer['ratio'], layer['removed'] / float(layer['interior']))
+            points = Fixtures.Queries(100)
+            for q_point, leaf in zip(map(tuple, points.tolist()), top.QueryBatch(points).tolist()):
+                self.assertEqual(leaf >= 0, top.Locate(q_point) is not None)
+
+
+if __name__ == '__main__':
+    unittest.main()
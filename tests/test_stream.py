@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+import StringIO
+import numpy as np
+import DCEL
+import KirkPatrick
+import KPStream
+from tests import Fixtures
+
+
+class KPStream_Test(unittest.TestCase):
+    'Chunked readers and the three stage pipeline'
+
+    def setUp(self):
+        self.index_ = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(DCEL.Array_DCEL, 100)).Freeze()
+        self.points_ = Fixtures.Queries(250)
+        self.dir_ = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_)
+
+    def testReadText(self):
+        text = '\n'.join('{!r},{!r}'.format(*pt) if i % 2 else '{!r} {!r}'.format(*pt)
+                         for i, pt in enumerate(self.points_.tolist())) + '\n'
+        chunks = list(KPStream.ReadText(StringIO.StringIO(text), 100))
+        self.assertEqual([len(c) for c in chunks], [100, 100, 50])
+        np.testing.assert_array_equal(np.concatenate(chunks), self.points_)
+        self.assertRaises(ValueError, list, KPStream.ReadText(StringIO.StringIO('1 2\n3\n'), 100))
+
+    def testReadTextSkips(self):
+        text = 'x,y\n\n1.5,2\n  \n# comment\n-3 .5\n+4,5e1\n\n'
+        chunks = list(KPStream.ReadText(StringIO.StringIO(text), 3))
+        np.testing.assert_array_equal(np.concatenate(chunks), [[1.5, 2.], [-3., .5], [4., 50.]])
+        self.assertEqual(list(KPStream.ReadText(StringIO.StringIO('x,y\n\n'))), [])
+
+    def testReadNpy(self):
+        path = os.path.join(self.dir_, 'points.npy')
+        np.save(path, self.points_)
+        chunks = list(KPStream.ReadNpy(path, 100))
+        self.assertEqual([len(c) for c in chunks], [100, 100, 50])
+        np.testing.assert_array_equal(np.concatenate(chunks), self.points_)
+        np.save(path, self.points_.ravel())
+        self.assertRaises(ValueError, list, KPStream.ReadNpy(path))
+
+    def testStreamText(self):
+        out = StringIO.StringIO()
+        chunks = (self.points_[i:i + 64] for i in range(0, len(self.points_), 64))
+        self.assertEqual(KPStream.Stream(self.index_, chunks, out), len(self.points_))
+        answers = [int(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(answers, self.index_.QueryBatch(self.points_).tolist())
+
+    def testStreamLabels(self):
+        out = StringIO.StringIO()
+        KPStream.Stream(self.index_, [self.points_], out, labels=True, binary=True)
+        corners = np.fromstring(out.getvalue(), dtype='<f8').reshape(-1, 6)
+        leaves = self.index_.QueryBatch(self.points_)
+        self.assertTrue(np.isnan(corners[leaves < 0]).all())
+        for q_point, row in zip(map(tuple, self.points_[leaves >= 0].tolist()), corners[leaves >= 0].tolist()):
+            self.assertTrue(DCEL.Contains(q_point, [tuple(row[0:2]), tuple(row[2:4]), tuple(row[4:6])]))
+
+    def testStreamBinary(self):
+        out = StringIO.StringIO()
+        KPStream.Stream(self.index_, [self.points_[:100], self.points_[100:]], out, binary=True)
+        np.testing.assert_array_equal(np.fromstring(out.getvalue(), dtype='<i4'), self.index_.QueryBatch(self.points_))
+
+    def testStreamError(self):
+        def Chunks():
+            yield self.points_
+            raise IOError("Disk gone")
+        self.assertRaises(IOError, KPStream.Stream, self.index_, Chunks(), StringIO.StringIO())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import sys
+import subprocess
+import unittest
+import DCEL
+import KirkPatrick
+from tests import Fixtures
+
+HEADLESS = '''
+import sys
+import KirkPatrick
+from tests import Fixtures
+top = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(KirkPatrick.DCEL.Array_DCEL, 50))
+top.Query((300., 300.), KirkPatrick.CountingTrace())
+top.QueryBatch(Fixtures.Queries(20))
+print 'pygame' in sys.modules, 'KPDisplay' in sys.modules
+'''
+
+
+class Recording_Trace(KirkPatrick.QueryTrace):
+
+    def __init__(self):
+        self.events_ = []
+
+    def OnQuery(self, q_point):
+        self.events_.append(('query', q_point))
+
+    def OnLayer(self, layer, candidates, hit, contains_calls):
+        self.events_.append(('layer', layer, hit, contains_calls))
+
+    def OnResult(self, q_point, tri):
+        self.events_.append(('result', q_point, tri))
+
+
+class Trace_Test(unittest.TestCase):
+    'Headless queries and the per-query trace hooks'
+
+    def setUp(self):
+        self.top = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(DCEL.Array_DCEL, 120))
+
+    def testHeadless(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        out = subprocess.check_output([sys.executable, '-c', HEADLESS], cwd=root, stderr=open(os.devnull, 'w'))
+        self.assertEqual(out.split()[-2:], ['False', 'False'])
+
+    def testHooks(self):
+        trace = Recording_Trace()
+        tri = self.top.Query((300.5, 299.5), trace)
+        events = trace.events_
+        self.assertEqual(events[0], ('query', (300.5, 299.5)))
+        self.assertEqual(events[-1], ('result', (300.5, 299.5), tri))
+        layers = [x for x in events if x[0] == 'layer']
+        self.assertEqual(len(layers), self.top.Depth())
+        self.assertIs(layers[0][1], self.top)
+        self.assertEqual(self.top.getCorners(layers[-1][2]), tri)
+        self.assertTrue(all(x[3] > 0 for x in layers))
+
+    def testOutside(self):
+        trace = Recording_Trace()
+        self.assertIsNone(self.top.Query((-5., 10.), trace))
+        self.assertEqual(len([x for x in trace.events_ if x[0] == 'layer']), 1)
+        self.assertEqual(trace.events_[-1][2], None)
+
+    def testCounting(self):
+        trace = KirkPatrick.CountingTrace()
+        for q_point in map(tuple, Fixtures.Queries(50).tolist()):
+            self.top.Query(q_point, trace)
+        self.assertEqual(trace.queries_, 50)
+        self.assertEqual(sum(trace.level_calls_), trace.contains_calls_)
+        self.assertEqual(len(trace.level_calls_), self.top.Depth())
+
+
+if __name__ == '__main__':
+    unittest.main()
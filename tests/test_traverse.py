@@ -0,0 +1,82 @@
+import unittest
+import numpy as np
+import KirkPatrick
+from Predicates import Orient
+from tests import Fixtures
+
+
+def Clear(tri, q_point, margin=1e-6):
+    'Is q_point at least margin inside each side line of triangle tri, so that rounding cannot move it out?'
+    for i in range(3):
+        (px, py), (rx, ry) = tri[i - 1], tri[i]
+        cross = (rx - px) * (q_point[1] - py) - (ry - py) * (q_point[0] - px)
+        if abs(cross) <= margin * np.hypot(rx - px, ry - py):
+            return False
+    return True
+
+
+def Meets(tri, a, b):
+    'Do triangle tri (3 CounterClockWise 2-tuples) and the closed segment a - b share a point? Exact.'
+    if all(Orient(a, b, pt) > 0 for pt in tri) or all(Orient(a, b, pt) < 0 for pt in tri):
+        return False
+    return not any(Orient(tri[i - 1], tri[i], a) < 0 and Orient(tri[i - 1], tri[i], b) < 0 for i in range(3))
+
+
+class Traverse_Test(unittest.TestCase):
+    'Faces crossed by polylines, walked through the bottom layer'
+
+    def Polylines(self, grid=None, n=20):
+        'Seeded polylines inside the box; with grid, along grid lines and through grid sites'
+        rng = np.random.RandomState(6)
+        polylines = []
+        for i in range(n):
+            verts = rng.uniform(1, KirkPatrick.BOXSIZE - 1, size=(rng.randint(2, 5), 2))
+            if grid is not None:
+                verts = np.clip(np.round(verts / grid) * grid, grid, KirkPatrick.BOXSIZE - grid)
+            polylines.append(map(tuple, verts.tolist()))
+        return polylines
+
+    def assertTraversal(self, top, polyline, faces):
+        dcel = top.getBottom().getDCEL()
+        for f, g in zip(faces, faces[1:]):      # Each face entered from the one before
+            self.assertIn(g, [across for p, r, across in dcel.getSides(f)])
+        for f in faces:
+            self.assertTrue(any(Meets(top.getCorners(f), a, b) for a, b in zip(polyline, polyline[1:])))
+        samples = [tuple(a + t * (np.array(b) - a)) for a, b in zip(np.array(polyline), polyline[1:])
+                   for t in np.linspace(0, 1, 25)]
+        sampled = []
+        for q_point in samples:
+            containing = Fixtures.Containing(dcel, q_point)
+            if len(containing) == 1:
+                f = containing.pop()
+                if Clear(top.getCorners(f), q_point) and (not sampled or sampled[-1] != f):
+                    sampled.append(f)
+        it = iter(faces)
+        self.assertTrue(all(f in it for f in sampled), (polyline, sampled, faces))     # A subsequence
+
+    def testTraverse(self):
+        for backend in Fixtures.BACKENDS:
+            for grid in (None, 50.):
+                top = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(backend, 150, grid=grid))
+                for polyline in self.Polylines(grid):
+                    self.assertTraversal(top, polyline, top.Traverse(polyline))
+
+    def testBatch(self):
+        for backend in Fixtures.BACKENDS:
+            top = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(backend, 150, grid=50., compact=True))
+            polylines = self.Polylines() + self.Polylines(50.)
+            self.assertEqual(top.TraverseBatch(polylines), [top.Traverse(polyline) for polyline in polylines])
+
+    def testEnds(self):
+        top = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(Fixtures.BACKENDS[0], 150))
+        self.assertEqual(top.Traverse([(-10., 5.), (100., 100.)]), [])    # Starts outside
+        inside = top.Traverse([(100., 100.), (100., 100.)])
+        self.assertEqual(inside, [top.Locate((100., 100.))])
+        leaving = top.Traverse([(100., 100.), (700., 100.), (100., 300.)])
+        self.assertEqual(leaving, top.Traverse([(100., 100.), (700., 100.)]))   # Stops at the box
+        side = KirkPatrick.BBOX[1], KirkPatrick.BBOX[2]
+        self.assertTrue(Meets(top.getCorners(leaving[-1]), *side))
+
+
+if __name__ == '__main__':
+    unittest.main()
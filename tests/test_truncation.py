@@ -0,0 +1,56 @@
+import unittest
+import DCEL
+import KirkPatrick
+from tests import Fixtures
+
+
+class Truncation_Test(unittest.TestCase):
+    'Hierarchies cut short at top_faces, with a packed top layer'
+
+    def TopFaces(self, layer):
+        return len([f for f in layer.getFaceLabels() if f is not None])
+
+    def testAnswers(self):
+        for backend in Fixtures.BACKENDS:
+            full = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(backend, 300))
+            queries = Fixtures.Queries(300, dcel=Fixtures.Build(backend, 300))
+            for top_faces in (40, 'auto'):
+                dcel = Fixtures.Build(backend, 300)
+                top = KirkPatrick.KP_Layer.FromDCEL(dcel, top_faces=top_faces)
+                self.assertLess(top.Depth(), full.Depth())
+                self.assertIsNotNone(top.top_tris_)
+                self.assertEqual(len(top.top_tris_), self.TopFaces(top))
+                leaves = top.getLeafLabels()
+                for q_point, leaf in zip(map(tuple, queries.tolist()), top.QueryBatch(queries).tolist()):
+                    containing = Fixtures.Containing(dcel, q_point)
+                    if containing:
+                        self.assertIn(top.Locate(q_point), containing)
+                        self.assertIn(leaves[leaf], containing)
+                    else:
+                        self.assertIsNone(top.Locate(q_point))
+                        self.assertEqual(leaf, -1)
+
+    def testTopSize(self):
+        dcel = Fixtures.Build(DCEL.Array_DCEL, 300)
+        for top_faces in (10, 40, 160):
+            top = KirkPatrick.KP_Layer.FromDCEL(dcel.Copy(), top_faces=top_faces)
+            self.assertLessEqual(self.TopFaces(top), top_faces)
+            below = top.getNext()
+            self.assertGreater(self.TopFaces(below), top_faces)     # Peeling stopped at the first small enough layer
+        top = KirkPatrick.KP_Layer.FromDCEL(dcel.Copy(), top_faces=10 ** 6)
+        self.assertEqual(top.Depth(), 1)
+
+    def testAuto(self):
+        top = KirkPatrick.KP_Layer.FromDCEL(Fixtures.Build(DCEL.Array_DCEL, 300), top_faces='auto')
+        layer, faces = top, []
+        while layer is not None:
+            faces.append(self.TopFaces(layer))
+            layer = layer.getNext()
+        self.assertGreater(len(faces), 2)
+        # The top is the first layer whose next hop would save at most HOP_TRIANGLES triangle tests
+        self.assertLessEqual(faces[0] * (1. - faces[0] / float(faces[1])), KirkPatrick.HOP_TRIANGLES)
+        self.assertGreater(faces[1] * (1. - faces[1] / float(faces[2])), KirkPatrick.HOP_TRIANGLES)
+
+
+if __name__ == '__main__':
+    unittest.main()
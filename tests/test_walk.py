@@ -0,0 +1,64 @@
+import unittest
+import numpy as np
+import DCEL
+import KirkPatrick
+import KPWalk
+from tests import Fixtures
+
+
+class Walk_Locator_Test(unittest.TestCase):
+    'The visibility walk, its hints, counters and fallback'
+
+    def Track(self, n=300):
+        'A seeded random walk of small steps within the box'
+        rng = np.random.RandomState(8)
+        return np.clip(300. + np.cumsum(rng.normal(scale=5., size=(n, 2)), axis=0), 1, KirkPatrick.BOXSIZE - 1)
+
+    def testAnswers(self):
+        for backend in Fixtures.BACKENDS:
+            dcel = Fixtures.Build(backend, 200)
+            locator = KPWalk.Walk_Locator.FromDCEL(dcel, seed=1)
+            for points in (self.Track(), Fixtures.Queries(300, dcel=dcel)):
+                for q_point in map(tuple, points.tolist()):
+                    containing = Fixtures.Containing(dcel, q_point)
+                    label = locator.Locate(q_point)
+                    if containing:
+                        self.assertIn(label, containing)
+                    else:
+                        self.assertIsNone(label)
+
+    def testStats(self):
+        dcel = Fixtures.Build(DCEL.Array_DCEL, 200)
+        locator = KPWalk.Walk_Locator.FromDCEL(dcel, seed=1)
+        locator.QueryBatch(self.Track())
+        stats = locator.getStats()
+        self.assertEqual(stats['queries'], 300)
+        self.assertEqual(stats['fallbacks'], 1)     # Only the first query has no previous answer
+        self.assertLess(stats['mean_walk'], 3)
+        locator.ResetStats()
+        self.assertEqual(locator.getStats()['queries'], 0)
+
+    def testHints(self):
+        dcel = Fixtures.Build(DCEL.Array_DCEL, 200)
+        locator = KPWalk.Walk_Locator.FromDCEL(dcel, seed=1)
+        points = Fixtures.Queries(200)
+        points = points[(points > 0).all(axis=1) & (points < KirkPatrick.BOXSIZE).all(axis=1)]
+        hints = [locator.fallback_.Locate(tuple(pt)) for pt in points.tolist()]
+        leaves = locator.QueryBatch(points, hints=hints)
+        self.assertEqual([locator.getLeafLabels()[leaf] for leaf in leaves.tolist()], hints)
+        stats = locator.getStats()
+        self.assertEqual((stats['fallbacks'], stats['mean_walk']), (0, 0))
+
+    def testFallback(self):
+        dcel = Fixtures.Build(DCEL.Array_DCEL, 200)
+        locator = KPWalk.Walk_Locator.FromDCEL(dcel, max_steps=0, seed=1)
+        far = (590., 590.)
+        self.assertIsNone(locator.Walk(far, locator.Locate((10., 10.)))[0])
+        self.assertEqual(locator.Walk(far, 'gone'), (None, -1))     # Not a face
+        self.assertIn(locator.Locate(far), Fixtures.Containing(dcel, far))
+        self.assertEqual(locator.getStats()['fallbacks'], 2)
+        self.assertIsNone(locator.Walk((-5., 300.), locator.Locate((1., 300.)))[0])
+
+
+if __name__ == '__main__':
+    unittest.main()